@@ -1,7 +1,14 @@
 # -*- coding: utf-8 -*-
+import functools
+import json
 import logging
+import os
+import tempfile
+import time
 import traceback
 
+import werkzeug.wrappers
+
 import openerp
 import openerp.addons.hw_proxy.controllers.main as hw_proxy
 from openerp import http
@@ -9,20 +16,95 @@ from openerp.http import request
 from openerp.tools.translate import _
 
 try:
-  from .. scale import *
-  from .. scale.scale import Scale
+  from .. scale.registry import ScaleRegistry
+  from .. scale.discovery import DiscoveryService
+  from .. scale.stability import StabilityFilter
+  from .. scale.scheduler import PollScheduler
+  from .. scale.reconnect import ReconnectPolicy
+  from .. scale.status_history import StatusHistory
+  from .. scale import metrics
+  from .. scale import profiling
+  from .. scale.readings import monotonic
+  from .. scale.shared import OwnerLock, SharedSnapshots, SharedPublisher
+  from .. scale.transfers import TransferQueue
+  from .. scale.buffers import BufferPool
 except ImportError:
-  scalepos = scale = None
+  ScaleRegistry = DiscoveryService = StabilityFilter = PollScheduler = None
+  ReconnectPolicy = StatusHistory = metrics = profiling = None
+  OwnerLock = SharedSnapshots = SharedPublisher = TransferQueue = None
+  BufferPool = None
 
 from threading import Thread, Lock
 
-try:
-  import usb.core
-except ImportError:
-  usb = None
-
 _logger = logging.getLogger(__name__)
 
+# How often the bus is checked for scales being plugged in or out, in seconds,
+# when libusb hotplug callbacks are not available.
+SCALE_DISCOVERY_INTERVAL = 5
+
+# Device nodes whose listing tells the polling fallback whether the bus changed.
+USB_DEVICE_NODES = '/dev/bus/usb'
+
+# A weight counts as stable, whatever the scale itself reports, once the last
+# SCALE_STABILITY_WINDOW readings differ by at most SCALE_STABILITY_TOLERANCE
+# times the scale's smallest increment.
+SCALE_STABILITY_WINDOW = 5
+SCALE_STABILITY_TOLERANCE = 1
+
+# Scales are read at their own rate while the weight moves and for
+# SCALE_ACTIVE_PERIOD seconds after any request for a weight. Otherwise the
+# wait between reads doubles from SCALE_IDLE_BACKOFF up to SCALE_IDLE_MAX_INTERVAL
+# seconds, and is cut short by the next request.
+SCALE_ACTIVE_PERIOD = 10
+SCALE_IDLE_BACKOFF = 0.05
+SCALE_IDLE_MAX_INTERVAL = 1.0
+
+# After a failure, a scale (or the bus scan) is retried after a delay that
+# starts at SCALE_RETRY_BASE_DELAY seconds and doubles, with jitter, up to
+# SCALE_RETRY_MAX_DELAY. After SCALE_RETRY_THRESHOLD failures in a row, it is
+# left alone for SCALE_RETRY_RESET_TIMEOUT seconds before a single new try.
+SCALE_RETRY_BASE_DELAY = 0.5
+SCALE_RETRY_MAX_DELAY = 60
+SCALE_RETRY_THRESHOLD = 5
+SCALE_RETRY_RESET_TIMEOUT = 60
+
+# How many distinct status messages are remembered, and how many of the
+# current status's most recent ones get_status returns.
+SCALE_STATUS_HISTORY = 50
+SCALE_STATUS_MESSAGES = 5
+
+# While profiling is on, the stacks of iterations running longer than the
+# slow threshold are sampled every SCALE_PROFILE_SAMPLE_INTERVAL seconds, and
+# the last SCALE_PROFILE_KEEP slow iterations are dumped into SCALE_PROFILE_DIR.
+SCALE_PROFILE_SAMPLE_INTERVAL = 0.05
+SCALE_PROFILE_KEEP = 20
+SCALE_PROFILE_DIR = tempfile.gettempdir()
+
+# Every Odoo worker process imports this module, but only the one holding
+# SCALE_OWNER_LOCK reads the scales. It publishes their snapshots into
+# SCALE_SHARED_PATH, with room for SCALE_SHARED_SLOTS scales, where the other
+# processes read them, polling every SCALE_SHARED_POLL_INTERVAL seconds when
+# waiting for a new weight. They try to take over every
+# SCALE_ELECTION_INTERVAL seconds, in case the owner died, and stop serving
+# its snapshots once it has not beaten for SCALE_SHARED_STALE_AFTER seconds,
+# in case it hangs instead. The owner beats every 0.05 seconds.
+SCALE_SHARED_DIR = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+SCALE_SHARED_PATH = os.path.join(SCALE_SHARED_DIR, 'hw_scale.snapshots')
+SCALE_OWNER_LOCK = os.path.join(SCALE_SHARED_DIR, 'hw_scale.lock')
+SCALE_SHARED_SLOTS = 8
+SCALE_SHARED_POLL_INTERVAL = 0.01
+SCALE_ELECTION_INTERVAL = 1
+SCALE_SHARED_STALE_AFTER = 1
+
+# With python-libusb1 installed, SCALE_TRANSFER_DEPTH interrupt transfers are
+# kept submitted on each scale, so reports arriving while the previous one is
+# being handled wait in the queue instead of in the scale.
+SCALE_TRANSFER_DEPTH = 4
+
+# Otherwise scales read into buffers from a pool of SCALE_REPORT_BUFFERS,
+# taken when they connect, instead of a new one per read.
+SCALE_REPORT_BUFFERS = 8
+
 class ScaleDriver(Thread):
 
   def __init__(self):
@@ -30,42 +112,41 @@ class ScaleDriver(Thread):
     Thread.__init__(self)
 
     self.lock = Lock()
-    self.tare = 0
-    self.lastreading = None
-    self.status = { 'status' : 'connecting', 'messages' : [] }
-
-  def connected_usb_devices(self):
-    connected = []
-
-    class FindUsbClass(object):
-      def __init__(self, usb_class):
-        self._class = usb_class
-
-      def __call(self, device):
-        if device.bDeviceClass == self._class:
-          return True
-
-        for cfg in devices:
-          inft = usb.util.find_descriptor(cfg, bInterfaceClass=self._class)
-
-          if intf is not None:
-            return True
-
-        return False
-
-    scales = usb.core.find(find_all=True, custom_match=FindUsbClass(3))
-
-    if not scales:
-      scales = usb.core.find(find_all=True, idVendor=0x0922)
-
-    for scale in scales:
-      connected.append({
-        'vendor' : scale.idVendor,
-        'product' : scale.idProduct,
-        'name' : "%s %s" % usb.util.get_string(scale, 256, scale.iManufacturer) + " " +usb.util.get_string(scale, 256, scale.iProduct)
-        })
-
-    return connected
+    self.history = StatusHistory('connecting', SCALE_STATUS_HISTORY) if StatusHistory else None
+    # One acquisition worker per connected scale, keyed by device id. Each
+    # worker keeps its scale claimed across readings and reads reports back
+    # to back into its own ring buffer, so HTTP handlers never touch USB.
+    self.registry = ScaleRegistry(retry_delay=5,
+      on_status=self.set_device_status, on_error=self.log_error,
+      stability=self.make_stability_filter,
+      scheduler=self.make_poll_scheduler,
+      reconnect=self.make_reconnect_policy,
+      on_publish=self.publish,
+      transfers=self.make_transfer_queue
+        if TransferQueue and TransferQueue.available() else None,
+      buffers=BufferPool(count=SCALE_REPORT_BUFFERS) if BufferPool else None
+      ) if ScaleRegistry else None
+    self.discovery = None
+    self.owner_lock = OwnerLock(SCALE_OWNER_LOCK) if OwnerLock else None
+    self.shared = None
+    self.reconnect = self.make_reconnect_policy() if ReconnectPolicy else None
+    self.last_error = None
+
+  def make_stability_filter(self):
+    return StabilityFilter(window=SCALE_STABILITY_WINDOW,
+      tolerance=SCALE_STABILITY_TOLERANCE)
+
+  def make_poll_scheduler(self):
+    return PollScheduler(backoff=SCALE_IDLE_BACKOFF,
+      max_interval=SCALE_IDLE_MAX_INTERVAL, active_period=SCALE_ACTIVE_PERIOD)
+
+  def make_reconnect_policy(self):
+    return ReconnectPolicy(base_delay=SCALE_RETRY_BASE_DELAY,
+      max_delay=SCALE_RETRY_MAX_DELAY, failure_threshold=SCALE_RETRY_THRESHOLD,
+      reset_timeout=SCALE_RETRY_RESET_TIMEOUT)
+
+  def make_transfer_queue(self, device, endpoint):
+    return TransferQueue(device, endpoint, depth=SCALE_TRANSFER_DEPTH).open()
 
   def lockedstart(self):
     _logger.error("Starting thread with lockedstart()")
@@ -74,110 +155,436 @@ class ScaleDriver(Thread):
         self.daemon = True
         self.start()
 
-  def get_scale(self):
+  @property
+  def follower(self):
+    """
+    Whether another process reads the scales, and this one reads its snapshots;
+    they read as None once that process stops beating.
+    """
+    return self.shared is not None and not self.owner_lock.held
+
+  def map_shared(self, reset=False):
+    try:
+      return SharedSnapshots(SCALE_SHARED_PATH, SCALE_SHARED_SLOTS, reset=reset,
+        stale_after=SCALE_SHARED_STALE_AFTER)
+    except Exception as e:
+      self.log_error(e)
+      return None
 
-    scales = self.connected_usb_devices()
+  def elect(self):
+    """
+    Blocks until this process owns the scales, following the owner's shared
+    snapshots meanwhile. Only the owner reads the scales, whether or not the
+    snapshots can be mapped; the owner makes over a file it cannot map.
+    """
+    if not self.owner_lock:
+      return
 
-    if len(scales) > 0:
-      self.set_status('connected', 'Connected to ' + scales[0]['name'])
-      return Scale(None, scales[0]['vendor'], scales[0]['product'])
-    else:
-      self.set_status('disconnected', 'Scale not found')
+    self.shared = self.map_shared()
+    if not self.owner_lock.acquire():
+      self.set_status('connected', 'Scales are read by another process')
+      while not self.owner_lock.acquire():
+        time.sleep(SCALE_ELECTION_INTERVAL)
+        if self.shared is None:
+          self.shared = self.map_shared()
+
+    if self.shared is None:
+      self.shared = self.map_shared(reset=True)
+    if self.shared is not None:
+      self.shared.claim()
+      SharedPublisher(self.registry, self.shared).start()
+
+  def publish(self, device_id, snapshot):
+    if self.shared is not None and self.owner_lock.held:
+      self.shared.publish(device_id, snapshot)
+
+  def get_worker(self, device_id=None):
+    """Returns the worker of scale `device_id`, or of the first scale found if None"""
+    if not self.registry:
       return None
+    return self.registry.get(device_id)
+
+  def get_scales(self):
+    scales = []
+    if self.follower:
+      for device_id in self.shared.ids():
+        snapshot = self.shared.get(device_id)
+        if snapshot:
+          scales.append({ 'id': device_id, 'name': None, 'status': snapshot.status })
+      return scales
+    for device_id in (self.registry.ids() if self.registry else []):
+      worker = self.registry.get(device_id)
+      if worker:
+        scale = worker.session.scale
+        scales.append({
+          'id': device_id,
+          'name': scale.name if scale else None,
+          'status': worker.session.state,
+        })
+    return scales
 
   def get_status(self):
-    return self.status
+    """Returns the current status, its latest messages and retry states"""
+    if not self.history:
+      return { 'status': 'error', 'messages': ['Scale not initialized, please verify system dependencies.'] }
+    status = self.history.snapshot(SCALE_STATUS_MESSAGES)
+    if self.reconnect:
+      reconnect = { 'discovery': self.reconnect.status() }
+      for device_id in self.registry.ids():
+        worker = self.registry.get(device_id)
+        if worker and worker.reconnect:
+          reconnect[device_id] = worker.reconnect.status()
+      status['reconnect'] = reconnect
+    return status
+
+  def get_status_history(self):
+    """Returns every remembered status message with its count and first and last times seen"""
+    return self.history.entries() if self.history else []
+
+  def get_tare(self, device_id=None):
+    if self.follower:
+      snapshot = self.shared.get(device_id)
+      return snapshot.tare if snapshot else 0
+    worker = self.get_worker(device_id)
+    return worker.tare if worker else 0
+
+  def set_tare(self, device_id=None):
+    if self.follower:
+      return self.shared.request_tare(device_id)
+    worker = self.get_worker(device_id)
+    if worker:
+      worker.set_tare()
+    return worker is not None
+
+  def clear_tare(self, device_id=None):
+    if self.follower:
+      return self.shared.request_clear_tare(device_id)
+    worker = self.get_worker(device_id)
+    if worker:
+      worker.clear_tare()
+    return worker is not None
+
+  def get_worker_awake(self, device_id=None):
+    """Like get_worker, but also has the worker read at full rate for a while"""
+    worker = self.get_worker(device_id)
+    if worker:
+      worker.wake()
+    return worker
+
+  def get_weight(self, device_id=None):
+    if self.follower:
+      snapshot = self.get_snapshot(device_id)
+      return snapshot.report if snapshot else None
+    worker = self.get_worker_awake(device_id)
+    return worker.latest() if worker else None
+
+  def get_snapshot(self, device_id=None):
+    """Returns the ScaleSnapshot of scale `device_id`: its weight, tare and status as of one moment"""
+    if self.follower:
+      self.shared.wake(device_id)
+      return self.shared.get(device_id)
+    worker = self.get_worker_awake(device_id)
+    return worker.snapshot if worker else None
+
+  def wait_for_weight(self, seq=0, timeout=None, device_id=None):
+    """
+    Blocks until the weight differs from reading `seq`, see ReadingBuffer.wait_for_change,
+    and returns a ScaleSnapshot of the new reading, or None if there is no reading at all.
+    """
+    if self.follower:
+      self.shared.wake(device_id)
+      snapshot = self.shared.wait_for_change(device_id, seq, timeout,
+        SCALE_SHARED_POLL_INTERVAL) or self.shared.get(device_id)
+      return snapshot if snapshot and snapshot.report else None
+    worker = self.get_worker_awake(device_id)
+    if not worker:
+      return None
+    reading = worker.readings.wait_for_change(seq, timeout) or worker.readings.latest()
+    return worker.view(reading) if reading else None
+
+  def stream_weights(self, seq=0, keepalive=15, device_id=None):
+    """
+    Yields a ScaleSnapshot of every reading newer than `seq` as it arrives, or None when
+    `keepalive` seconds pass without one. A `seq` of 0 (or one from before
+    a restart) starts from the newest reading.
+    """
+    if self.follower:
+      for snapshot in self.stream_shared(seq, keepalive, device_id):
+        yield snapshot
+      return
 
-  def set_tare(self):
-    if self.lastreading is not None:
-      self.tare = self.lastreading.weight
+    worker = self.get_worker(device_id)
+    if not worker:
+      return
+    readings = worker.readings
+
+    if not seq or seq > readings.seq:
+      seq = max(readings.seq - 1, 0)
+
+    while worker.id in self.registry:
+      worker.wake()
+      batch = readings.wait_since(seq, keepalive)
+      if not batch:
+        yield None
+      for reading in batch:
+        seq = reading.seq
+        yield worker.view(reading)
+
+  def stream_shared(self, seq=0, keepalive=15, device_id=None):
+    """Like stream_weights, from the owner's snapshots, skipping readings overwritten between polls"""
+    snapshot = self.shared.get(device_id)
+    if not snapshot:
+      return
 
-  def clear_tare(self):
-    self.tare = 0
+    if not seq or seq > snapshot.seq:
+      seq = max(snapshot.seq - 1, 0)
 
-  def get_weight(self):
-    return self.lastreading
+    while self.follower and self.shared.get(device_id):
+      self.shared.wake(device_id)
+      snapshot = self.shared.wait_since(device_id, seq, keepalive,
+        SCALE_SHARED_POLL_INTERVAL)
+      if not snapshot:
+        yield None
+        continue
+      seq = snapshot.seq
+      yield snapshot
+
+  def set_device_status(self, device_id, status, message = None):
+    if status == 'connected':
+      self.last_error = None
+    self.set_status(status, message and '%s: %s' % (device_id, message))
 
   def set_status(self, status, message = None):
     _logger.info(status+ ' : ' + (message or 'no message'))
-    if status == self.status['status']:
-      if message != None and (len(self.status['messages']) == 0 or message != self.status['messages'][-1]):
-          self.status['messages'].append(message)
-    else:
-      self.status['status'] = status
-      if message:
-        self.status['messages'] = [message]
-      else:
-        self.status['messages'] = []
+    if self.history:
+      self.history.record(status, message)
 
     if status == 'error' and message:
       _logger.error('Scale Error: ' + message)
     elif status == 'disconnected' and message:
       _logger.warning('Scale Device Disconnected: ' + message)
 
-  def run(self):
+  def start_profiling(self, slow=0.25, profile=False):
+    """Attaches a Profiler to the hot path, replacing any attached one"""
+    if not profiling:
+      return False
+    profiling.attach(profiling.Profiler(slow=slow, keep=SCALE_PROFILE_KEEP,
+      profile=profile), sample_interval=SCALE_PROFILE_SAMPLE_INTERVAL)
+    return True
+
+  def stop_profiling(self):
+    """Detaches the Profiler, if any, and returns the path it was dumped to"""
+    profiler = profiling.detach() if profiling else None
+    return self.dump_profile(profiler)
+
+  def dump_profile(self, profiler=None):
+    """Dumps the attached Profiler to a file and returns its path, or None"""
+    if not profiling:
+      return None
+    profiler = profiler or profiling.hooks
+    if not isinstance(profiler, profiling.Profiler):
+      return None
+    path = os.path.join(SCALE_PROFILE_DIR,
+      time.strftime('scale-profile-%Y%m%d-%H%M%S.json'))
+    return profiler.dump(path)
+
+  def log_error(self, e):
+    # A failing scale keeps raising the same error on every retry; only the
+    # first occurrence gets a traceback.
+    if str(e) == self.last_error:
+      _logger.warning('Scale error (repeated): ' + str(e))
+      return
+    self.last_error = str(e)
+    errmsg = str(e) + '\n' + '-'*60 + '\n' + traceback.format_exc() + '-'*60 + '\n'
+    _logger.error(errmsg)
 
-    scalepos = None
+  def run(self):
 
-    if not scale: #scale refers to the module here
+    if not self.registry:
       _logger.error('Scale not initialized, please verify system dependencies.')
       return
 
-    while True:
-
-      try:
-        error = True
+    # Only one process may claim the scales; the others wait here.
+    self.elect()
 
-        if scalepos == None:
-          scalepos = self.get_scale()
-          scalepos.connect()
+    # Scales are attached as hotplug events report them, and every worker
+    # is handed its device directly, so nothing enumerates the bus while
+    # the set of connected devices stays the same.
+    self.discovery = DiscoveryService(self.registry.device_manager,
+      self.on_scale_arrived, self.on_scale_left,
+      interval=SCALE_DISCOVERY_INTERVAL, bus_path=USB_DEVICE_NODES,
+      on_error=self.log_error)
 
-        #if still none, we found no scale. Sleep for a while then check again
-        if scalepos == None:
-            time.sleep(5)
-            continue
+    while True:
+      try:
+        self.discovery.scan()
+        self.reconnect.success()
+        break
+      except Exception as e:
+        self.set_status('error', str(e))
+        self.log_error(e)
+        self.reconnect.failure(e)
+        time.sleep(self.reconnect.delay())
 
-        self.lastreading = scalepos.weigh()
+    if not len(self.registry):
+      self.set_status('disconnected', 'Scale not found')
 
-        time.sleep(0.5)
+    self.discovery.run(scan=False)
 
-        error = False
+  def on_scale_arrived(self, device, device_id):
+    self.registry.add(device, device_id)
 
-      except Exception as e:
-        self.set_status('error', str(e))
-        errmsg = str(e) + '\n' + '-'*60 + '\n' + traceback.format_exc() + '-'*60 + '\n'
-        _logger.error(errmsg)
+  def on_scale_left(self, device_id):
+    self.registry.remove(device_id, 0)
+    if not len(self.registry):
+      self.set_status('disconnected', 'Scale not found')
 
+# Upper bound on how long a /hw_proxy/scale_wait/ request may block, in seconds.
+SCALE_WAIT_MAX_TIMEOUT = 30
+
+def sse_event(snapshot):
+  """Formats a ScaleSnapshot as a Server-Sent Event, or a keepalive comment for None"""
+  if snapshot is None:
+    return ': keepalive\n\n'
+  data = json.dumps({
+    'seq': snapshot.seq,
+    'timestamp': snapshot.timestamp,
+    'weight': snapshot.weight,
+    'unit': snapshot.report.unit,
+    'info': snapshot.report.status,
+  })
+  return 'id: %d\nevent: reading\ndata: %s\n\n' % (snapshot.seq, data)
+
+def parse_seq(*values):
+  """Returns the first of `values` that is a sequence number, or 0"""
+  for value in values:
+    try:
+      return max(0, int(value))
+    except (TypeError, ValueError):
+      pass
+  return 0
+
+def parse_float(value, default):
+  """Returns `value` as a float, or `default` if it is not a number"""
+  try:
+    value = float(value)
+  except (TypeError, ValueError):
+    return default
+  return value if value == value else default
+
+def parse_flag(value):
+  """Returns whether `value` turns a flag on: only True, 1, '1' and 'true' do"""
+  return value == 1 or str(value).lower() in ('1', 'true')
+
+def instrumented(name):
+  """Counts and times the requests a route answers, under `name`"""
+  def decorator(route):
+    if not metrics:
+      return route
+    requests = metrics.HTTP_REQUESTS.labels(name)
+    latency = metrics.HTTP_REQUEST_SECONDS.labels(name)
+
+    @functools.wraps(route)
+    def wrapper(*args, **kwargs):
+      requests.inc()
+      started = monotonic()
+      try:
+        return route(*args, **kwargs)
       finally:
-        if scalepos:
-          scalepos.disconnect()
-          scalepos = None
+        latency.observe(monotonic() - started)
+    return wrapper
+  return decorator
 
 driver = ScaleDriver()
 driver.lockedstart()
 hw_proxy.drivers['scale'] = driver
 
 class ScaleProxy(hw_proxy.Proxy):
-    @http.route('/hw_proxy/scale_read/', type='json', auth='none', cors='*')
-    def scale_read(self):
+    @http.route('/hw_proxy/scales/', type='json', auth='none', cors='*')
+    @instrumented('scale_list')
+    def scale_list(self):
+        if driver:
+          return driver.get_scales()
+        return []
+
+    @http.route('/hw_proxy/scale_status/', type='json', auth='none', cors='*')
+    @instrumented('scale_status')
+    def scale_status(self):
         if driver:
-          reading = driver.get_weight()
-          return { 'weight': reading.weight - driver.tare, 'unit': reading.unit, 'info': reading.status }
+          return { 'status': driver.get_status(), 'history': driver.get_status_history() }
+        return None
+
+    @http.route(['/hw_proxy/scale_read/', '/hw_proxy/scale_read/<string:device_id>'], type='json', auth='none', cors='*')
+    @instrumented('scale_read')
+    def scale_read(self, device_id=None):
+        # One snapshot holds the weight and the tare it is net of, so a
+        # concurrent tare never pairs an old weight with a new tare.
+        snapshot = driver.get_snapshot(device_id) if driver else None
+        if snapshot and snapshot.report:
+          return { 'weight': snapshot.weight, 'unit': snapshot.report.unit, 'info': snapshot.report.status }
         return None
 
+    @http.route(['/hw_proxy/scale_wait/', '/hw_proxy/scale_wait/<string:device_id>'], type='json', auth='none', cors='*')
+    @instrumented('scale_wait')
+    def scale_wait(self, seq=0, timeout=10, device_id=None):
+        if driver:
+          timeout = max(0, min(parse_float(timeout, 10), SCALE_WAIT_MAX_TIMEOUT))
+          snapshot = driver.wait_for_weight(parse_seq(seq), timeout, device_id)
+          if snapshot:
+            return { 'seq': snapshot.seq, 'weight': snapshot.weight, 'unit': snapshot.report.unit, 'info': snapshot.report.status }
+        return None
+
+    @http.route(['/hw_proxy/scale_stream/', '/hw_proxy/scale_stream/<string:device_id>'], type='http', auth='none', cors='*')
+    @instrumented('scale_stream')
+    def scale_stream(self, seq=0, device_id=None):
+        if not driver or not driver.get_snapshot(device_id):
+          return werkzeug.wrappers.Response(status=503)
+
+        # EventSource sends the id of the last event it saw when it reconnects.
+        seq = parse_seq(request.httprequest.headers.get('Last-Event-ID'), seq)
+
+        def events():
+          for snapshot in driver.stream_weights(seq, device_id=device_id):
+            yield sse_event(snapshot)
+
+        return werkzeug.wrappers.Response(events(),
+          mimetype='text/event-stream', direct_passthrough=True,
+          headers=[('Cache-Control', 'no-cache'), ('X-Accel-Buffering', 'no')])
+
     @http.route('/hw_proxy/scale_zero/', type='json', auth='none', cors='*')
+    @instrumented('scale_zero')
     def scale_zero(self):
         return True
 
-    @http.route('/hw_proxy/scale_tare/', type='json', auth='none', cors='*')
-    def scale_tare(self):
+    @http.route(['/hw_proxy/scale_tare/', '/hw_proxy/scale_tare/<string:device_id>'], type='json', auth='none', cors='*')
+    @instrumented('scale_tare')
+    def scale_tare(self, device_id=None):
       if driver:
-        driver.set_tare()
-        return True
+        return driver.set_tare(device_id)
 
-    @http.route('/hw_proxy/scale_clear_tare/', type='json', auth='none', cors='*')
-    def scale_clear_tare(self):
+    @http.route(['/hw_proxy/scale_clear_tare/', '/hw_proxy/scale_clear_tare/<string:device_id>'], type='json', auth='none', cors='*')
+    @instrumented('scale_clear_tare')
+    def scale_clear_tare(self, device_id=None):
       if driver:
-        driver.clear_tare()
-        return True
-
+        return driver.clear_tare(device_id)
+
+    @http.route('/hw_proxy/scale_metrics/', type='http', auth='none', cors='*')
+    def scale_metrics(self):
+        if not metrics:
+          return werkzeug.wrappers.Response(status=503)
+        return werkzeug.wrappers.Response(metrics.REGISTRY.exposition(),
+          mimetype='text/plain; version=0.0.4')
+
+    @http.route('/hw_proxy/scale_profile/<string:action>', type='json', auth='none', cors='*')
+    def scale_profile(self, action, slow=0.25, profile=False):
+        # 'start' attaches a profiler, 'dump' writes what it has gathered so
+        # far to a file and 'stop' dumps it one last time and detaches it.
+        if not driver:
+          return None
+        if action == 'start':
+          return driver.start_profiling(parse_float(slow, 0.25), parse_flag(profile))
+        if action == 'dump':
+          return { 'path': driver.dump_profile() }
+        if action == 'stop':
+          return { 'path': driver.stop_profiling() }
+        return None
@@ -0,0 +1,188 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# vim: set fileencoding=utf-8 :
+from threading import Event
+import metrics
+import profiling
+from readings import ReadingBuffer, monotonic
+from reports import DATA_REPORT, STATUSES, IN_MOTION
+from transfers import ETIMEDOUT
+
+_IN_MOTION = STATUSES[IN_MOTION]
+
+class AcquisitionEngine(object):
+    """Continuously reads a scale's reports into a ReadingBuffer."""
+
+    def __init__(self, session, buffer=None, endpoint=None, retry_delay=5,
+            on_error=None, stability=None, scheduler=None, reconnect=None,
+            on_reading=None):
+        """
+        `session` should be a ScaleSession (or anything with the same
+        `open`, `read` and `read_latest` methods). The engine reads from it
+        back to back, so readings arrive as fast as the scale emits reports.
+
+        `buffer` is the ReadingBuffer data reports are pushed into. A new
+        one is created if omitted.
+
+        `endpoint` is passed through to `Scale.read`.
+
+        `retry_delay` is how many seconds to wait before trying again when
+        no scale is connected or a read fails.
+
+        `on_error` is an optional callable taking the exception raised by
+        a failed read.
+
+        `stability` is an optional StabilityFilter. Data reports are passed
+        through it before being pushed, so their status says whether the
+        weight has settled by its measure rather than the scale's.
+
+        `scheduler` is an optional PollScheduler deciding how long to wait
+        between data reports. After waiting, the engine reads the newest
+        report the scale sent rather than the oldest; see
+        `Scale.read_latest`. Without one, reads follow each other back to
+        back.
+
+        `reconnect` is an optional ReconnectPolicy. If given, it decides how
+        long to wait after a failure instead of `retry_delay`, backing off
+        while the scale keeps failing.
+
+        `on_reading` is an optional callable taking every new Reading once
+        it is in the buffer.
+
+        """
+        self._session = session
+        self._buffer = buffer if buffer is not None else ReadingBuffer()
+        self._endpoint = endpoint
+        self._retry_delay = retry_delay
+        self._on_error = on_error
+        self._stability = stability
+        self._scheduler = scheduler
+        self._reconnect = reconnect
+        self._on_reading = on_reading
+        self._failing_since = None
+        self._waited = False
+        self._stop = Event()
+
+
+    ### Read-only public properties ###
+
+    @property
+    def session(self):
+        return self._session
+
+    @property
+    def buffer(self):
+        return self._buffer
+
+    @property
+    def reconnect(self):
+        return self._reconnect
+
+
+    ### Public methods ###
+
+    def latest(self):
+        """Returns the newest data report read, or None."""
+        reading = self._buffer.latest()
+        return reading.report if reading else None
+
+    def poll(self, latest=False):
+        """
+        Reads one report from the scale. Returns the new Reading if it
+        was a data report, None otherwise.
+
+        If `latest` is True, reads the newest data report instead of the
+        next one, skipping any the scale sent in the meantime.
+
+        """
+        if latest:
+            report = self._session.read_latest(endpoint=self._endpoint).report
+        else:
+            report = self._session.read(endpoint=self._endpoint)
+
+        if report and report.type == DATA_REPORT:
+            if self._stability is not None:
+                report = self._stability.filter(report)
+            reading = self._buffer.push(report)
+            if self._on_reading:
+                self._on_reading(reading)
+
+            hooks = profiling.hooks
+            if hooks is not None:
+                hooks.post_publish(self._session.scale, reading)
+
+            return reading
+
+        return None
+
+    def wake(self):
+        """
+        Tells the scheduler, if any, that a client wants fresh readings,
+        so the engine goes back to reading at full rate right away.
+
+        """
+        if self._scheduler is not None:
+            self._scheduler.touch()
+
+    def run(self):
+        """Polls the scale until `stop` is called."""
+        while not self._stop.is_set():
+            metrics.ACQUISITION_ITERATIONS.inc()
+            try:
+                if not self._session.open():
+                    self._retry()
+                    continue
+
+                previous = self.latest()
+                reading = self.poll(latest=self._waited)
+                self._waited = False
+
+                if self._failing_since is not None:
+                    self._recovered()
+
+                # Status reports come in between data reports; read on.
+                if reading is not None and self._scheduler is not None:
+                    report = reading.report
+                    self._scheduler.update(
+                        report.status == _IN_MOTION or report != previous
+                    )
+                    # Reports sent while waiting are stale by the next poll.
+                    self._waited = bool(self._scheduler.interval)
+                    self._scheduler.wait()
+
+            except Exception as e:
+                if getattr(e, "errno", None) == ETIMEDOUT:
+                    continue # A quiet scale, not a failing one.
+                if self._on_error:
+                    self._on_error(e)
+                self._retry(e)
+
+    def stop(self):
+        """Makes `run` return after the current read."""
+        self._stop.set()
+        if self._scheduler is not None:
+            self._scheduler.wake()
+
+
+    ### Private methods ###
+
+    def _recovered(self):
+        # The scale was read again after failing.
+        metrics.RECONNECTS.inc()
+        metrics.DISCONNECTED_SECONDS.inc(monotonic() - self._failing_since)
+        self._failing_since = None
+
+        if self._reconnect is not None:
+            self._reconnect.success()
+
+    def _retry(self, error=None):
+        # Waits before trying to reach the scale again after a failure.
+        if self._failing_since is None:
+            self._failing_since = monotonic()
+
+        if self._reconnect is None:
+            self._stop.wait(self._retry_delay)
+            return
+
+        self._reconnect.failure(error)
+        self._stop.wait(self._reconnect.delay())
@@ -0,0 +1,235 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# vim: set fileencoding=utf-8 :
+"""
+An asyncio counterpart of Scale. It needs Python 3.5 or later, and nothing
+else in this package imports it, so the rest still runs on Python 2.
+
+    scale = AsyncScale(Scale())
+    report = await scale.weigh()
+
+    async with scale.readings() as readings:
+        async for reading in readings:
+            print(reading.report.weight)
+
+"""
+import asyncio
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from readings import Reading, monotonic
+from reports import DATA_REPORT, STATUSES, ZERO_WEIGHT, STABLE_WEIGHT
+from scale import ConnectionError
+
+_WEIGHED = (STATUSES[STABLE_WEIGHT], STATUSES[ZERO_WEIGHT])
+
+# The executor every AsyncScale created without one shares. PyUSB transfers
+# block, so each read in progress holds one of its threads for as long as
+# the transfer takes, and a ReadingStream always has a read in progress. So
+# the executor has a thread for every AsyncScale alive that shares it, and
+# at least `_default_workers`.
+_executor = None
+_executor_workers = 0
+_default_workers = 4
+_sharing = 0
+_lock = Lock()
+
+def set_default_workers(workers):
+    """
+    Sets the fewest threads the executor AsyncScales share by default
+    keeps, 4 unless set. It takes effect the next time the executor is
+    needed.
+
+    """
+    global _default_workers
+    if workers < 1:
+        raise ValueError("workers must be at least 1")
+    with _lock:
+        _default_workers = workers
+
+def default_executor():
+    """
+    Returns the executor AsyncScales share by default, creating it, or
+    replacing it with a larger one once more AsyncScales share it than it
+    has threads. Reads already handed to the one replaced still run.
+
+    """
+    global _executor, _executor_workers
+    with _lock:
+        workers = max(_default_workers, _sharing)
+        if _executor is None or _executor_workers < workers:
+            previous = _executor
+            _executor = ThreadPoolExecutor(max_workers=workers)
+            _executor_workers = workers
+            if previous is not None:
+                previous.shutdown(wait=False)
+        return _executor
+
+def _share(count):
+    global _sharing
+    with _lock:
+        _sharing += count
+
+class AsyncScale(object):
+    """Reads a Scale from an asyncio event loop."""
+
+    def __init__(self, scale, executor=None):
+        """
+        Wraps `scale`, a Scale (or anything with the same `read` method).
+        Its transfers run in `executor`, a concurrent.futures executor, so
+        the event loop never blocks on USB. By default it is the one
+        `default_executor` returns, which keeps a thread for every
+        AsyncScale sharing it.
+
+        Only one transfer is in progress at a time: concurrent calls on
+        the same AsyncScale take turns.
+
+        """
+        self._scale = scale
+        self._executor = executor
+        self._lock = None
+
+        if executor is None:
+            _share(1)
+            weakref.finalize(self, _share, -1)
+
+
+    ### Read-only public properties ###
+
+    @property
+    def scale(self):
+        return self._scale
+
+
+    ### Public methods ###
+
+    async def read(self, endpoint=None, max_attempts=10):
+        """Like `Scale.read`."""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+
+        # A transfer cannot be interrupted, so the next one waits for it to
+        # end even if the task that started it is cancelled.
+        await self._lock.acquire()
+        try:
+            future = asyncio.get_event_loop().run_in_executor(
+                self._executor or default_executor(),
+                self._scale.read, endpoint, max_attempts
+            )
+        except Exception:
+            self._lock.release()
+            raise
+        future.add_done_callback(lambda future: self._lock.release())
+        return await asyncio.shield(future)
+
+    async def weigh(self, endpoint=None, max_attempts=10, stability=None):
+        """
+        Like `Scale.weigh`. The event loop runs between reads, and
+        cancelling the task stops weighing after the current read.
+
+        """
+        for attempt in range(max_attempts):
+            report = await self.read(endpoint=endpoint)
+
+            if not report:
+                raise ConnectionError("Scale not found!")
+
+            if stability is not None:
+                report = stability.filter(report)
+
+            if report.type == DATA_REPORT and report.status in _WEIGHED:
+                return report
+
+        return None
+
+    def readings(self, endpoint=None, buffer_size=16, stability=None):
+        """
+        Returns a ReadingStream of the scale's data reports; see there.
+        Nothing is read until the stream is iterated.
+
+        """
+        return ReadingStream(self, endpoint, buffer_size, stability)
+
+class ReadingStream(object):
+    """An asynchronous iterator of Readings, reading ahead of its consumer."""
+
+    def __init__(self, scale, endpoint=None, buffer_size=16, stability=None):
+        """
+        Iterating reads `scale`, an AsyncScale, in a background task and
+        yields a Reading for every data report, numbered from 1. Up to
+        `buffer_size` readings wait for the consumer; once that many are
+        waiting the task stops reading until the consumer catches up, so
+        a slow consumer slows the reads down rather than piling readings
+        up. `stability` is an optional StabilityFilter reports go through.
+
+        A failed read ends the iteration by raising its error. `close`
+        stops the task and ends the iteration, dropping readings not yet
+        consumed; using the stream in an `async with` block closes it on
+        the way out.
+
+        """
+        self._scale = scale
+        self._endpoint = endpoint
+        self._buffer_size = buffer_size
+        self._stability = stability
+        self._queue = None
+        self._task = None
+        self._seq = 0
+
+
+    ### Public methods ###
+
+    async def close(self):
+        """Stops reading and waits for the current read to end."""
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self._task is None:
+            self._queue = asyncio.Queue(self._buffer_size)
+            self._task = asyncio.ensure_future(self._produce())
+
+        item = await self._queue.get()
+        if isinstance(item, BaseException):
+            # Put it back so that the next call raises it again.
+            self._queue.put_nowait(item)
+            raise item
+        return item
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, type, value, traceback):
+        await self.close()
+
+
+    ### Private methods ###
+
+    async def _produce(self):
+        try:
+            while True:
+                report = await self._scale.read(endpoint=self._endpoint)
+                if not report:
+                    raise ConnectionError("Scale not found!")
+                if report.type != DATA_REPORT:
+                    continue
+                if self._stability is not None:
+                    report = self._stability.filter(report)
+
+                self._seq += 1
+                await self._queue.put(Reading(self._seq, monotonic(), report))
+        except asyncio.CancelledError:
+            # Closed: readings still waiting no longer matter.
+            while not self._queue.empty():
+                self._queue.get_nowait()
+            self._queue.put_nowait(StopAsyncIteration())
+            raise
+        except Exception as e:
+            await self._queue.put(e)
@@ -0,0 +1,64 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# vim: set fileencoding=utf-8 :
+"""
+Runs the benchmarks and prints their results as JSON, every time in
+seconds. Run from the directory containing `reports.py`:
+
+    python -m benchmarks [--quick] [--output results.json] [name ...]
+
+Compare two runs with:
+
+    python -m benchmarks.compare before.json after.json
+
+"""
+import argparse
+import json
+import sys
+from collections import OrderedDict
+from . import decode, find, imports, instrumentation, read, shared_read, weigh
+from .harness import environment
+
+SUITES = OrderedDict([
+    ("decode", decode),
+    ("weigh", weigh),
+    ("find", find),
+    ("imports", imports),
+    ("read", read),
+    ("instrumentation", instrumentation),
+    ("shared_read", shared_read),
+])
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks")
+    parser.add_argument("names", nargs="*", metavar="name",
+        help="benchmarks to run: %s (default: all)" % ", ".join(SUITES))
+    parser.add_argument("--quick", action="store_true",
+        help="take fewer samples")
+    parser.add_argument("--url",
+        help="time this scale_read URL instead of an in-process registry")
+    parser.add_argument("--output", help="write the results to this file")
+    args = parser.parse_args(argv)
+
+    for name in args.names:
+        if name not in SUITES:
+            parser.error("unknown benchmark: %s" % name)
+
+    results = OrderedDict()
+    for name in args.names or SUITES:
+        sys.stderr.write("Running %s...\n" % name)
+        results[name] = SUITES[name].run(quick=args.quick, url=args.url)
+
+    output = json.dumps(
+        {"environment": environment(), "results": results},
+        indent=2, sort_keys=True
+    )
+
+    if args.output:
+        with open(args.output, "w") as handle:
+            handle.write(output + "\n")
+    else:
+        print(output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# vim: set fileencoding=utf-8 :
+"""
+Compares two sets of results written by `python -m benchmarks`:
+
+    python -m benchmarks.compare before.json after.json
+
+Prints every number found in both, with the ratio of after to before.
+
+"""
+import json
+import sys
+
+# Results where a bigger number is better.
+HIGHER_IS_BETTER = ("per_second",)
+
+def flatten(results, prefix=""):
+    """Yields (dotted path, value) for every number in `results`."""
+    for key, value in sorted(results.items()):
+        path = prefix + key
+        if isinstance(value, dict):
+            for item in flatten(value, path + "."):
+                yield item
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            yield path, value
+
+def compare(before, after):
+    """
+    Returns (path, before, after, ratio) for every number in both
+    results, the ratio being None when `before` is zero.
+
+    """
+    old = dict(flatten(before["results"]))
+    return [
+        (path, old[path], value, value / float(old[path]) if old[path] else None)
+        for path, value in flatten(after["results"])
+        if path in old
+    ]
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) != 2:
+        sys.exit("usage: python -m benchmarks.compare before.json after.json")
+
+    with open(argv[0]) as before, open(argv[1]) as after:
+        rows = compare(json.load(before), json.load(after))
+
+    for path, old, new, ratio in rows:
+        if ratio is None:
+            change = ""
+        elif path.endswith(HIGHER_IS_BETTER):
+            change = "%6.2fx faster" % ratio if ratio >= 1 \
+                    else "%6.2fx slower" % (1 / ratio)
+        else:
+            change = "%6.2fx slower" % ratio if ratio > 1 \
+                    else "%6.2fx faster" % (1 / ratio if ratio else float("inf"))
+        print("%-50s %12.6g %12.6g  %s" % (path, old, new, change))
+
+if __name__ == "__main__":
+    main()
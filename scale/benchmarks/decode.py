@@ -0,0 +1,68 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# vim: set fileencoding=utf-8 :
+"""
+Compares `reports.decode` with `ReportFactory.build` and with decoding
+the same report again through a `reports.ReportCache`, and, if NumPy is
+installed, with `reports.decode_batch` over a large capture.
+
+Run from the directory containing `reports.py`:
+
+    python -m benchmarks.decode
+
+"""
+from array import array
+from reports import ReportCache, ReportFactory, decode, decode_batch
+from .harness import per_call
+
+# A data report recorded from a Mettler Toledo PS60 (5.10 lb).
+REPORT = array('B', [3, 4, 12, 254, 254, 1])
+
+def run(quick=False, **options):
+    """Returns the time per report of each way of decoding it."""
+    number = 10000 if quick else 100000
+    # The same report read into an 8-byte packet buffer over and over.
+    cache = ReportCache()
+    buffer = REPORT + array('B', [0, 0])
+    results = {
+        "ReportFactory.build": per_call(
+            lambda: ReportFactory.build(REPORT), number
+        ),
+        "ReportFactory.calc_weight": per_call(
+            lambda: ReportFactory.calc_weight(254, 254, 1), number
+        ),
+        "decode": per_call(lambda: decode(REPORT), number),
+        "ReportCache.decode": per_call(lambda: cache.decode(buffer, 6), number),
+    }
+
+    try:
+        import numpy
+    except ImportError:
+        return results
+
+    # array.tostring was renamed tobytes in Python 3.
+    data = REPORT.tobytes() if hasattr(REPORT, "tobytes") else REPORT.tostring()
+    count = number * 10
+    capture = data * count
+    batch = per_call(lambda: decode_batch(capture), 1, 3)
+    results["decode_batch"] = {
+        "best": batch["best"] / count,
+        "median": batch["median"] / count,
+        "per_second": batch["per_second"] * count,
+    }
+
+    return results
+
+def main():
+    results = run()
+    build = results["ReportFactory.build"]["best"]
+    print("ReportFactory.build  %8.3f us/report" % (build * 1e6))
+
+    for name in ("decode", "ReportCache.decode", "decode_batch"):
+        if name in results:
+            best = results[name]["best"]
+            print("%-20s %8.3f us/report" % (name, best * 1e6))
+            print("speedup              %8.1fx" % (build / best))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# vim: set fileencoding=utf-8 :
+"""
+Measures `ScaleManager.find` and `find_all` against mock buses of 10 to
+500 devices drawn from the full `USB_IDS` table, both with the dictionary
+itself and with the compiled `usb_ids.bin`.
+
+    python -m benchmarks.find
+
+"""
+import random
+import usb_ids
+import usb_ids_db
+from readings import monotonic
+from scale_manager import ScaleManager
+from tests.mocks.usb_lib import MockDevice, MockUSBLib
+from .harness import per_call
+
+SIZES = (10, 50, 100, 500)
+
+# A Mettler Toledo PS60, the one scale on every bus.
+SCALE = (0x0eb8, 0xf000)
+
+def bus(size, seed=0):
+    """
+    Returns `size` mock devices with ids picked at random from `USB_IDS`,
+    the last of which is a scale.
+
+    """
+    ids = sorted(
+        (vendor_id, product_id)
+        for vendor_id, products in usb_ids.USB_IDS.items()
+        for product_id in products
+        if product_id != "name" and " Scale" not in str(products[product_id])
+    )
+    chosen = random.Random(seed).sample(ids, size - 1) + [SCALE]
+    return [
+        MockDevice(vendor_id, product_id, bus=1 + i // 127, address=1 + i % 127)
+        for i, (vendor_id, product_id) in enumerate(chosen)
+    ]
+
+def run(quick=False, sizes=SIZES, **options):
+    """Returns lookup times per table and bus size."""
+    number = 20 if quick else 200
+    lookups = {
+        "dict": usb_ids.USB_IDS,
+        "compiled": usb_ids_db.load(),
+    }
+    results = {}
+
+    for name, lookup in lookups.items():
+        result = results[name] = {}
+
+        start = monotonic()
+        ScaleManager(lookup=lookup, usb_lib=MockUSBLib(devices=[])).index
+        result["index"] = monotonic() - start
+
+        for size in sizes:
+            manager = ScaleManager(
+                lookup=lookup, usb_lib=MockUSBLib(devices=bus(size))
+            )
+            result[str(size)] = {
+                "find": per_call(manager.find, number),
+                "find_manufacturer": per_call(
+                    lambda: manager.find(manufacturer="Mettler Toledo"), number
+                ),
+                "find_all": per_call(manager.find_all, number),
+            }
+
+    return results
+
+def main():
+    for name, result in sorted(run().items()):
+        print("%-9s index  %10.3f ms" % (name, result["index"] * 1e3))
+        for size in SIZES:
+            print("%-9s %5d  %10.3f us/find" % (
+                name, size, result[str(size)]["find"]["best"] * 1e6
+            ))
+
+if __name__ == "__main__":
+    main()
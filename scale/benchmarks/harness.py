@@ -0,0 +1,59 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# vim: set fileencoding=utf-8 :
+"""
+Timing helpers shared by the benchmarks. Every time they return is in
+seconds.
+
+"""
+import platform
+import sys
+import time
+import timeit
+
+def summarize(samples):
+    """Returns the count, extremes, mean and percentiles of `samples`."""
+    samples = sorted(samples)
+    count = len(samples)
+    if not count:
+        return {"count": 0}
+
+    def percentile(fraction):
+        return samples[int(round(fraction * (count - 1)))]
+
+    return {
+        "count": count,
+        "min": samples[0],
+        "mean": sum(samples) / count,
+        "median": percentile(0.5),
+        "p90": percentile(0.9),
+        "p99": percentile(0.99),
+        "max": samples[-1],
+    }
+
+def per_call(function, number=10000, repeat=5):
+    """
+    Times `repeat` batches of `number` calls to `function` and returns the
+    best and median time per call, and the best rate in calls per second.
+
+    """
+    times = sorted(
+        total / number
+        for total in timeit.Timer(function).repeat(repeat, number)
+    )
+    return {
+        "best": times[0],
+        "median": times[len(times) // 2],
+        "per_second": 1 / times[0] if times[0] else None,
+    }
+
+def environment():
+    """Describes the interpreter and machine the benchmarks ran on."""
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "executable": sys.executable,
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+    }
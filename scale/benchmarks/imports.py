@@ -0,0 +1,51 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# vim: set fileencoding=utf-8 :
+"""
+Measures how long it takes a fresh interpreter to import `usb_ids` and,
+for comparison, to open the compiled `usb_ids.bin`.
+
+    python -m benchmarks.imports
+
+"""
+import os
+import subprocess
+import sys
+import reports
+from .harness import summarize
+
+DIRECTORY = os.path.dirname(os.path.abspath(reports.__file__))
+
+STATEMENTS = {
+    "usb_ids": "import usb_ids",
+    "usb_ids_db": "import usb_ids_db; usb_ids_db.load()",
+}
+
+TIMER = "import time; start = time.time(); %s; print(time.time() - start)"
+
+def time_import(statement):
+    """Returns the time `statement` takes in a new interpreter."""
+    output = subprocess.check_output(
+        [sys.executable, "-c", TIMER % statement], cwd=DIRECTORY
+    )
+    return float(output)
+
+def run(quick=False, **options):
+    """Returns the import times of each statement."""
+    repeat = 3 if quick else 10
+    results = {}
+
+    for name, statement in STATEMENTS.items():
+        time_import(statement) # Compile bytecode and build usb_ids.bin.
+        results[name] = summarize(
+            [time_import(statement) for i in range(repeat)]
+        )
+
+    return results
+
+def main():
+    for name, result in sorted(run().items()):
+        print("%-12s %8.3f ms" % (name, result["median"] * 1e3))
+
+if __name__ == "__main__":
+    main()
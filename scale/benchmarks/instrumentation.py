@@ -0,0 +1,36 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# vim: set fileencoding=utf-8 :
+"""
+Times recording one event in each kind of metric, which must stay well
+under a microsecond for the instrumentation to stay on in production.
+
+Run from the directory containing `reports.py`:
+
+    python -m benchmarks.instrumentation
+
+"""
+from metrics import Counter, Histogram
+from .harness import per_call
+
+def run(quick=False, **options):
+    """Returns the time per event of each kind of metric."""
+    number = 100000 if quick else 1000000
+    counter = Counter("benchmark_total", "Counter")
+    labelled = Counter("benchmark_errors_total", "Labelled", ["type"])
+    histogram = Histogram("benchmark_seconds", "Histogram")
+
+    return {
+        "Counter.inc": per_call(counter.inc, number),
+        "Counter.labels.inc": per_call(
+            lambda: labelled.labels("USBError").inc(), number
+        ),
+        "Histogram.observe": per_call(lambda: histogram.observe(0.003), number),
+    }
+
+def main():
+    for name, result in sorted(run().items()):
+        print("%-20s %8.3f us/event" % (name, result["best"] * 1e6))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# vim: set fileencoding=utf-8 :
+"""
+Measures read latency under concurrent clients.
+
+Without a URL, clients read the newest weight the way the `scale_read`
+route does, from the first of a ScaleRegistry's workers, all of which
+poll replaying mock scales in real time. Given the URL of a running
+proxy's `scale_read` route, they post JSON-RPC requests to it instead:
+
+    python -m benchmarks.read [http://localhost:8069/hw_proxy/scale_read/]
+
+"""
+import json
+import sys
+from threading import Thread
+from readings import monotonic
+from registry import ScaleRegistry
+from scale_manager import ScaleManager
+from tests.mocks import usb_ids
+from tests.mocks.replay import replay_bus, waveform
+from tests.mocks.usb_lib import MockEndpoint
+from .harness import summarize
+
+try:
+    from urllib2 import Request, urlopen
+except ImportError:
+    from urllib.request import Request, urlopen
+
+CLIENTS = (1, 4, 16)
+
+def clients(count, duration, request):
+    """
+    Calls `request` from `count` threads for `duration` seconds and
+    returns the latencies of the calls and the number that raised.
+
+    """
+    samples = []
+    errors = []
+    deadline = monotonic() + duration
+
+    def client():
+        while monotonic() < deadline:
+            start = monotonic()
+            try:
+                request()
+            except Exception:
+                errors.append(1)
+                continue
+            samples.append(monotonic() - start)
+
+    threads = [Thread(target=client) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return samples, len(errors)
+
+def registry_reader(scales):
+    """Returns a ScaleRegistry polling `scales` replaying mock scales."""
+    manager = ScaleManager(
+        lookup=usb_ids.USB_IDS,
+        usb_lib=replay_bus(scales, waveform(), speed=1)
+    )
+    registry = ScaleRegistry(
+        manager, endpoint=MockEndpoint(0x81, 8), retry_delay=0.1
+    )
+    registry.sync()
+
+    deadline = monotonic() + 5
+    while monotonic() < deadline and not all(
+            registry.get(id).latest() for id in registry.ids()):
+        pass
+
+    return registry
+
+def http_reader(url):
+    """Returns a callable posting a JSON-RPC call to `url`."""
+    body = json.dumps({"jsonrpc": "2.0", "method": "call", "params": {}})
+    headers = {"Content-Type": "application/json"}
+
+    def request():
+        response = urlopen(Request(url, body.encode("utf-8"), headers))
+        try:
+            result = json.loads(response.read().decode("utf-8"))
+        finally:
+            response.close()
+        if "error" in result:
+            raise Exception(result["error"])
+
+    return request
+
+def run(quick=False, url=None, scales=4, counts=CLIENTS, **options):
+    """Returns read latencies per number of concurrent clients."""
+    duration = 0.5 if quick else 3
+    registry = None
+
+    if url:
+        request = http_reader(url)
+    else:
+        registry = registry_reader(scales)
+
+        def request():
+            registry.get().snapshot.weight
+
+    results = {"target": url or "registry"}
+    if registry:
+        results["scales"] = len(registry)
+
+    try:
+        for count in counts:
+            samples, errors = clients(count, duration, request)
+            result = summarize(samples)
+            result["errors"] = errors
+            result["per_second"] = len(samples) / float(duration)
+            results[str(count)] = result
+    finally:
+        if registry:
+            registry.stop(timeout=5)
+
+    return results
+
+def main():
+    results = run(url=sys.argv[1] if len(sys.argv) > 1 else None)
+    for count in CLIENTS:
+        result = results[str(count)]
+        print("%3d clients  %8.3f us median, %8.3f us p99, %d errors" % (
+            count, result["median"] * 1e6, result["p99"] * 1e6, result["errors"]
+        ))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# vim: set fileencoding=utf-8 :
+"""
+Times reading a scale's snapshot from the shared memory other processes
+read it from, against reading it from the worker in-process.
+
+Run from the directory containing `reports.py`:
+
+    python -m benchmarks.shared_read
+
+"""
+import os
+import shutil
+import tempfile
+from registry import ScaleSnapshot
+from reports import DataReport, DATA_REPORT, STATUSES, STABLE_WEIGHT
+from session import CONNECTED
+from shared import SharedSnapshots
+from .harness import per_call
+
+def run(quick=False, **options):
+    """Returns the time per read of a snapshot, shared or not."""
+    number = 10000 if quick else 100000
+    report = DataReport(DATA_REPORT, None, STATUSES[STABLE_WEIGHT],
+            "kilogram", 1.94)
+    snapshot = ScaleSnapshot(report, 0, CONNECTED, 1, 1000.0)
+
+    directory = tempfile.mkdtemp()
+    try:
+        path = os.path.join(directory, "snapshots")
+        owner = SharedSnapshots(path)
+        owner.claim()
+        owner.publish("001-004", snapshot)
+        reader = SharedSnapshots(path)
+
+        results = {
+            "SharedSnapshots.get": per_call(reader.get, number),
+            "SharedSnapshots.get(id)": per_call(
+                lambda: reader.get("001-004"), number
+            ),
+            "SharedSnapshots.publish": per_call(
+                lambda: owner.publish("001-004", snapshot), number
+            ),
+        }
+        owner.close()
+        reader.close()
+        return results
+    finally:
+        shutil.rmtree(directory)
+
+def main():
+    for name, result in sorted(run().items()):
+        print("%-26s %8.3f us" % (name, result["best"] * 1e6))
+
+if __name__ == "__main__":
+    main()
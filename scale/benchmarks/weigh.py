@@ -0,0 +1,78 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# vim: set fileencoding=utf-8 :
+"""
+Measures `Scale.weigh` latency against a replaying mock scale that sends
+a given share of in-motion reports before settling.
+
+    python -m benchmarks.weigh
+
+"""
+from readings import monotonic
+from reports import IN_MOTION, STABLE_WEIGHT
+from scale import Scale
+from scale_manager import ScaleManager
+from tests.mocks import usb_ids
+from tests.mocks.replay import READY, ReplayDevice, data_report
+from tests.mocks.usb_lib import MockEndpoint, MockUSBLib
+from .harness import summarize
+
+# Shares of in-motion data reports to weigh through.
+RATIOS = (0.0, 0.5, 0.9)
+
+# Data reports per placed item.
+CYCLE = 10
+
+def reports(ratio, cycle=CYCLE):
+    """
+    Returns `cycle` data reports, the first `ratio` of them in motion and
+    the rest stable, each preceded by a status report.
+
+    """
+    unstable = int(round(ratio * cycle))
+    result = []
+    for i in range(cycle):
+        status = IN_MOTION if i < unstable else STABLE_WEIGHT
+        result.append((i, READY))
+        result.append((i, data_report(1.94, status)))
+    return result
+
+def weigh(ratio, number):
+    """Returns the latencies of `number` weighings and the reads they took."""
+    device = ReplayDevice(usb_ids.FAKE_VDR, usb_ids.SCALE, reports(ratio))
+    manager = ScaleManager(
+        lookup=usb_ids.USB_IDS, usb_lib=MockUSBLib(devices=[device])
+    )
+    endpoint = MockEndpoint(0x81, 8)
+    samples = []
+
+    with Scale(device_manager=manager) as scale:
+        for i in range(number):
+            start = monotonic()
+            scale.weigh(endpoint=endpoint, max_attempts=2 * CYCLE + 2)
+            samples.append(monotonic() - start)
+
+    return samples, device.reads
+
+def run(quick=False, ratios=RATIOS, **options):
+    """Returns weighing latencies per share of in-motion reports."""
+    number = 1000 if quick else 10000
+    results = {}
+
+    for ratio in ratios:
+        samples, reads = weigh(ratio, number)
+        result = summarize(samples)
+        result["reads_per_weigh"] = reads / float(number)
+        results["%.2f" % ratio] = result
+
+    return results
+
+def main():
+    for ratio, result in sorted(run().items()):
+        print("%s in motion  %8.3f us/weigh (p99 %.3f us, %.1f reads)" % (
+            ratio, result["mean"] * 1e6, result["p99"] * 1e6,
+            result["reads_per_weigh"]
+        ))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# vim: set fileencoding=utf-8 :
+from array import array
+
+class BufferPool(object):
+    """Preallocated report buffers, shared by the scales reading into them."""
+
+    def __init__(self, count=4, size=8):
+        """
+        Allocates `count` buffers of `size` bytes up front. `size` should
+        be the scales' endpoint packet size; HID scales mostly send 8-byte
+        packets.
+
+        A Scale given the pool takes a buffer exactly as long as its
+        endpoint's packet size when it connects, reads every report into
+        it and gives it back when it disconnects. PyUSB asks for as many
+        bytes as the buffer holds, and an interrupt transfer only ends on
+        a short packet or a full buffer, so a longer buffer would run
+        reports of a full packet together.
+
+        Buffers of another size, or more than the pool has, are allocated
+        when taken, and the pool keeps up to `count` of each size once
+        they are given back.
+
+        """
+        if count < 0:
+            raise ValueError("count must not be negative")
+
+        self._count = count
+        self._size = size
+        self._free = {size: [self._allocate(size) for i in range(count)]}
+
+
+    ### Read-only public properties ###
+
+    @property
+    def count(self):
+        return self._count
+
+    @property
+    def size(self):
+        return self._size
+
+    @property
+    def available(self):
+        """How many buffers, of any size, are waiting to be taken."""
+        return sum(len(free) for free in self._free.values())
+
+
+    ### Public methods ###
+
+    def acquire(self, size=None):
+        """
+        Takes a buffer of `size` bytes, the pool's size if None, out of
+        the pool, allocating one if there is none left.
+
+        """
+        if size is None:
+            size = self._size
+        try:
+            return self._free[size].pop()
+        except (KeyError, IndexError):
+            return self._allocate(size)
+
+    def release(self, buffer):
+        """Gives `buffer`, taken with `acquire`, back to the pool."""
+        free = self._free.setdefault(len(buffer), [])
+        if len(free) < self._count:
+            free.append(buffer)
+
+
+    ### Private methods ###
+
+    def _allocate(self, size):
+        return array('B', [0]) * size
@@ -0,0 +1,294 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# vim: set fileencoding=utf-8 :
+"""
+Append-only binary log of raw scale reports.
+
+A capture file is laid out as follows, all integers little-endian:
+
+    header      "HWSCAP1\\0", record size and maximum data size (uint16),
+                index interval (uint32)
+    records     one per report: monotonic timestamp (float64), data
+                length (uint8), data padded to the maximum data size
+    footer      (record number, timestamp) for every index-interval-th
+                record, as uint64 and float64 pairs
+    trailer     "HWSIDX1\\0", number of index entries and of records
+                (uint64)
+
+The footer and trailer are rewritten every index interval records and on
+close. A file cut short by a crash has no valid trailer; its complete
+records are still read, and the index is rebuilt when it is reopened for
+writing.
+
+"""
+import mmap
+import os
+import struct
+from bisect import bisect_right
+from readings import monotonic
+from reports import decode
+
+MAGIC = b"HWSCAP1\0"
+INDEX_MAGIC = b"HWSIDX1\0"
+HEADER = struct.Struct("<8sHHI")
+TRAILER = struct.Struct("<8sQQ")
+INDEX_ENTRY = struct.Struct("<Qd")
+TIMESTAMP = struct.Struct("<d")
+
+# Scales are low-speed HID devices: reports are at most 8 bytes long.
+DATA_SIZE = 8
+RECORD = struct.Struct("<dB%ds" % DATA_SIZE)
+
+class CaptureWriter(object):
+    """Appends raw reports to a capture file."""
+
+    def __init__(self, path, index_interval=1024, clock=monotonic):
+        """
+        Opens the capture at `path` for appending, creating it if needed.
+
+        Every `index_interval`-th record is indexed, and the index footer
+        is rewritten (and the file flushed) after every `index_interval`
+        records.
+
+        `clock` is called for timestamps when `write` is not given one.
+
+        """
+        self._path = path
+        self._clock = clock
+        self._file = open(path, "a+b")
+        self._index = []
+        self._count = 0
+
+        self._file.seek(0, os.SEEK_END)
+        if self._file.tell():
+            reader = CaptureReader(path)
+            try:
+                index_interval = reader.index_interval
+                self._count = len(reader)
+                self._index = reader.index()
+            finally:
+                reader.close()
+        else:
+            self._file.write(HEADER.pack(
+                MAGIC, RECORD.size, DATA_SIZE, index_interval
+            ))
+
+        self._interval = index_interval
+        self._end = HEADER.size + self._count * RECORD.size
+        self._truncate()
+
+
+    ### Read-only public properties ###
+
+    @property
+    def path(self):
+        return self._path
+
+    @property
+    def count(self):
+        """The number of records in the capture."""
+        return self._count
+
+
+    ### Public methods ###
+
+    def write(self, data, timestamp=None):
+        """Appends the report `data`, a sequence of byte values."""
+        if len(data) > DATA_SIZE:
+            raise ValueError(
+                "reports are at most %d bytes long, got %d" % (DATA_SIZE, len(data))
+            )
+
+        if timestamp is None:
+            timestamp = self._clock()
+
+        if self._end != self._file.tell():
+            self._truncate()
+
+        if self._count % self._interval == 0:
+            self._index.append((self._count, timestamp))
+
+        self._file.write(RECORD.pack(timestamp, len(data), bytes(bytearray(data))))
+        self._count += 1
+        self._end += RECORD.size
+
+        if self._count % self._interval == 0:
+            self.flush()
+
+    def flush(self):
+        """Writes the index footer after the records and flushes the file."""
+        self._file.seek(0, os.SEEK_END)
+        for entry in self._index:
+            self._file.write(INDEX_ENTRY.pack(*entry))
+        self._file.write(TRAILER.pack(INDEX_MAGIC, len(self._index), self._count))
+        self._file.flush()
+
+    def close(self):
+        if self._file.closed:
+            return
+        self.flush()
+        self._file.close()
+
+
+    ### Private methods ###
+
+    def _truncate(self):
+        # Drops the footer (or a partial record) so records can follow.
+        self._file.flush()
+        self._file.truncate(self._end)
+        self._file.seek(0, os.SEEK_END)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.close()
+
+class CaptureRecord(object):
+    """
+    One record of a capture. Iterating a CaptureReader yields the same
+    CaptureRecord over and over, moved to each record in turn, so fields
+    are only read from the mapped file when asked for.
+
+    """
+
+    __slots__ = ("_map", "_offset", "number")
+
+    def __init__(self, map, number=0):
+        self._map = map
+        self.move(number)
+
+    def move(self, number):
+        self.number = number
+        self._offset = HEADER.size + number * RECORD.size
+
+    @property
+    def timestamp(self):
+        return TIMESTAMP.unpack_from(self._map, self._offset)[0]
+
+    @property
+    def length(self):
+        return struct.unpack_from("<B", self._map, self._offset + 8)[0]
+
+    @property
+    def data(self):
+        """The report's bytes, as a new bytearray."""
+        start = self._offset + 9
+        return bytearray(self._map[start:start + self.length])
+
+    @property
+    def report(self):
+        """The report, decoded by `reports.decode`."""
+        return decode(self.data)
+
+class CaptureReader(object):
+    """Reads a capture file through `mmap`."""
+
+    def __init__(self, path):
+        with open(path, "rb") as handle:
+            self._map = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, record_size, data_size, interval = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or record_size != RECORD.size or data_size != DATA_SIZE:
+            self._map.close()
+            raise ValueError("%s is not a capture file" % path)
+
+        self.index_interval = interval
+        self._index = None
+        size = len(self._map)
+
+        # Trust the footer only if it sits right where the records end.
+        if size >= HEADER.size + TRAILER.size:
+            magic, entries, records = TRAILER.unpack_from(self._map, size - TRAILER.size)
+            footer = HEADER.size + records * RECORD.size
+            if magic == INDEX_MAGIC and footer + entries * INDEX_ENTRY.size \
+                    + TRAILER.size == size:
+                self._count = records
+                self._index = [
+                    INDEX_ENTRY.unpack_from(self._map, footer + i * INDEX_ENTRY.size)
+                    for i in range(entries)
+                ]
+                return
+
+        self._count = (size - HEADER.size) // RECORD.size
+
+
+    ### Public methods ###
+
+    def index(self):
+        """
+        Returns the list of (record number, timestamp) pairs for every
+        index-interval-th record, rebuilding it if the footer is missing.
+
+        """
+        if self._index is None:
+            record = CaptureRecord(self._map)
+            index = []
+            for number in range(0, self._count, self.index_interval):
+                record.move(number)
+                index.append((number, record.timestamp))
+            self._index = index
+        return list(self._index)
+
+    def find(self, timestamp):
+        """
+        Returns the number of the first record at or after `timestamp`
+        (or the number of records if there is none), narrowing the search
+        down with the index before bisecting the records themselves.
+
+        """
+        index = self.index()
+        block = bisect_right([entry[1] for entry in index], timestamp) - 1
+        first = index[block][0] if block >= 0 else 0
+        last = index[block + 1][0] if block + 1 < len(index) else self._count
+
+        record = CaptureRecord(self._map)
+        while first < last:
+            middle = (first + last) // 2
+            record.move(middle)
+            if record.timestamp < timestamp:
+                first = middle + 1
+            else:
+                last = middle
+        return first
+
+    def records(self, start=0, stop=None):
+        """Yields a single CaptureRecord moved to each record in turn."""
+        if stop is None or stop > self._count:
+            stop = self._count
+
+        record = CaptureRecord(self._map)
+        for number in range(start, stop):
+            record.move(number)
+            yield record
+
+    def array(self):
+        """
+        Returns the records as a NumPy structured array with fields
+        `timestamp`, `length` and `data`, viewing the mapped file rather
+        than copying it. Requires NumPy.
+
+        """
+        import numpy
+
+        dtype = numpy.dtype([
+            ("timestamp", "<f8"), ("length", "u1"), ("data", "u1", (DATA_SIZE,))
+        ])
+        return numpy.frombuffer(
+            self._map, dtype=dtype, count=self._count, offset=HEADER.size
+        )
+
+    def close(self):
+        self._map.close()
+
+    def __iter__(self):
+        return self.records()
+
+    def __len__(self):
+        return self._count
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.close()
@@ -0,0 +1,277 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# vim: set fileencoding=utf-8 :
+import os
+from collections import namedtuple
+from threading import Event, Lock, Thread
+from registry import device_id
+
+ARRIVED = "arrived"
+LEFT = "left"
+
+# Stands in for a device that has already left the bus.
+UsbAddress = namedtuple("UsbAddress", ["bus", "address"])
+
+class PollingHotplug(object):
+    """Reports devices plugged in or out by diffing snapshots of the bus."""
+
+    def __init__(self, usb_lib, interval=5, bus_path=None):
+        """
+        `usb_lib` should be an object that implements PyUSB's
+        usb.core.find method. The bus is snapshotted every `interval`
+        seconds.
+
+        If `bus_path` names a directory of device nodes, like Linux's
+        /dev/bus/usb, the bus is only enumerated through `usb_lib` when
+        the set of nodes in it changes, which costs a couple of
+        `listdir` calls per interval instead of a full enumeration.
+
+        """
+        self._usb = usb_lib
+        self._interval = interval
+        self._bus_path = bus_path
+        self._callbacks = []
+        self._devices = {}
+        self._signature = None
+
+    def register(self, callback):
+        """Calls `callback(event, device)` for every arrival or removal."""
+        self._callbacks.append(callback)
+
+    def poll(self):
+        """Takes a snapshot and reports how it differs from the last one."""
+        signature = self._bus_signature()
+        if signature is not None and signature == self._signature:
+            return
+        self._signature = signature
+
+        devices = {}
+        for device in self._usb.find(find_all=True) or []:
+            devices[(device.bus, device.address)] = device
+
+        previous, self._devices = self._devices, devices
+
+        for address, device in previous.items():
+            if address not in devices:
+                self._emit(LEFT, device)
+
+        for address, device in devices.items():
+            if address not in previous:
+                self._emit(ARRIVED, device)
+
+    def run(self, stop):
+        """Polls until the `stop` event is set."""
+        while not stop.is_set():
+            self.poll()
+            stop.wait(self._interval)
+
+    def _emit(self, event, device):
+        for callback in self._callbacks:
+            callback(event, device)
+
+    def _bus_signature(self):
+        if not self._bus_path:
+            return None
+
+        try:
+            return frozenset(
+                os.path.join(bus, node)
+                for bus in os.listdir(self._bus_path)
+                for node in os.listdir(os.path.join(self._bus_path, bus))
+            )
+        except OSError:
+            return None
+
+class LibusbHotplug(object):
+    """Reports devices plugged in or out through libusb hotplug callbacks."""
+
+    def __init__(self, usb_lib, timeout=1):
+        """
+        Requires python-libusb1 and a libusb built with hotplug support;
+        see `available`. Arriving devices are looked up through `usb_lib`
+        by bus and address, so callbacks get the same PyUSB device objects
+        everything else uses.
+
+        `timeout` is how many seconds `run` blocks waiting for libusb
+        events before checking whether it should stop.
+
+        """
+        self._usb = usb_lib
+        self._timeout = timeout
+        self._callbacks = []
+
+    @staticmethod
+    def available():
+        """Returns True if libusb hotplug callbacks can be used."""
+        try:
+            import usb1
+        except ImportError:
+            return False
+        return bool(usb1.hasCapability(usb1.CAP_HAS_HOTPLUG))
+
+    def register(self, callback):
+        """Calls `callback(event, device)` for every arrival or removal."""
+        self._callbacks.append(callback)
+
+    def run(self, stop):
+        """Waits for libusb events until the `stop` event is set."""
+        import usb1
+
+        pending = []
+
+        # libusb must not be called back into from its own callbacks,
+        # so events are only queued here and handled once it returns.
+        def queue(context, device, event):
+            pending.append(
+                (event, device.getBusNumber(), device.getDeviceAddress())
+            )
+            return False # Stay registered.
+
+        context = usb1.USBContext()
+        handle = context.hotplugRegisterCallback(queue, events=(
+            usb1.HOTPLUG_EVENT_DEVICE_ARRIVED | usb1.HOTPLUG_EVENT_DEVICE_LEFT
+        ))
+
+        try:
+            while not stop.is_set():
+                context.handleEventsTimeout(self._timeout)
+
+                while pending:
+                    event, bus, address = pending.pop(0)
+                    if event == usb1.HOTPLUG_EVENT_DEVICE_ARRIVED:
+                        device = self._usb.find(bus=bus, address=address)
+                        if device:
+                            self._emit(ARRIVED, device)
+                    else:
+                        self._emit(LEFT, UsbAddress(bus, address))
+        finally:
+            context.hotplugDeregisterCallback(handle)
+            context.close()
+
+    def _emit(self, event, device):
+        for callback in self._callbacks:
+            callback(event, device)
+
+class DiscoveryService(object):
+    """Tells listeners when scales are plugged in or unplugged."""
+
+    def __init__(self, device_manager, on_arrived, on_left, key=device_id,
+            hotplug=None, interval=5, bus_path=None, on_error=None):
+        """
+        `device_manager` should be a ScaleManager; only devices it
+        `matches` are reported.
+
+        `on_arrived` is called with a newly plugged-in scale and the id
+        `key` returns for it. `on_left` is called with the id of a scale
+        that was unplugged. ScaleRegistry's `add` and `remove` methods
+        fit these signatures.
+
+        `hotplug` is the event source. It defaults to LibusbHotplug when
+        libusb supports hotplug and to PollingHotplug otherwise, which is
+        given `interval` and `bus_path`.
+
+        `on_error` is an optional callable taking any exception raised
+        by the event source. The source is restarted `interval` seconds
+        later.
+
+        """
+        if hotplug is None:
+            if LibusbHotplug.available():
+                hotplug = LibusbHotplug(device_manager.usb)
+            else:
+                hotplug = PollingHotplug(device_manager.usb, interval, bus_path)
+
+        self._manager = device_manager
+        self._on_arrived = on_arrived
+        self._on_left = on_left
+        self._key = key
+        self._hotplug = hotplug
+        self._interval = interval
+        self._on_error = on_error
+        self._known = {}
+        self._lock = Lock()
+        self._stop = Event()
+        self._thread = None
+
+        hotplug.register(self._on_event)
+
+
+    ### Read-only public properties ###
+
+    @property
+    def hotplug(self):
+        return self._hotplug
+
+
+    ### Public methods ###
+
+    def ids(self):
+        """Returns the ids of the scales currently plugged in."""
+        with self._lock:
+            return list(self._known)
+
+    def scan(self):
+        """Enumerates the bus once and reports every scale not known yet."""
+        for device in self._manager.find_all():
+            self._on_event(ARRIVED, device)
+
+    def run(self, scan=True):
+        """
+        Reports scales as they come and go until `stop` is called,
+        starting with a `scan` unless told otherwise.
+
+        """
+        if scan:
+            self.scan()
+
+        while not self._stop.is_set():
+            try:
+                self._hotplug.run(self._stop)
+            except Exception as e:
+                if self._on_error:
+                    self._on_error(e)
+                self._stop.wait(self._interval)
+
+    def start(self, scan=True):
+        """Calls `run` in a daemon thread."""
+        self._stop.clear()
+        self._thread = Thread(
+            target=self.run, args=(scan,), name="scale-discovery"
+        )
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        """Makes `run` return and waits up to `timeout` seconds for it."""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+
+    ### Private methods ###
+
+    def _on_event(self, event, device):
+        if event == ARRIVED:
+            if not self._manager.matches(device):
+                return
+
+            id = self._key(device)
+            with self._lock:
+                if id in self._known:
+                    return
+                self._known[id] = device
+
+            self._on_arrived(device, id)
+
+        elif event == LEFT:
+            address = (device.bus, device.address)
+            with self._lock:
+                left = [
+                    id for id, known in self._known.items()
+                    if (known.bus, known.address) == address
+                ]
+                for id in left:
+                    del self._known[id]
+
+            for id in left:
+                self._on_left(id)
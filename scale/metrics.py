@@ -0,0 +1,224 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# vim: set fileencoding=utf-8 :
+"""
+Counters, gauges and histograms exposed in the Prometheus text format.
+
+Recording an event costs a few attribute updates, well under a microsecond,
+so the metrics below stay on in production. Updates take no lock: a thread
+switch in the middle of one could lose another thread's update to the same
+metric, which is rare enough not to matter for monitoring and much cheaper
+than locking every event. They live in the module-level REGISTRY:
+
+    import metrics
+    metrics.USB_READ_ERRORS.labels("USBError").inc()
+    print(metrics.REGISTRY.exposition())
+
+"""
+import math
+from bisect import bisect_left
+from threading import Lock
+
+# Upper bounds, in seconds, suiting USB transfers and HTTP requests.
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+        0.25, 0.5, 1, 2.5, 5, 10)
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n") \
+            .replace('"', '\\"')
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and math.isnan(value):
+        return "NaN"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{%s}" % ",".join('%s="%s"' % (name, _escape(value))
+            for name, value in pairs)
+
+class _Metric(object):
+    """A metric with no labels, or one of a labelled metric's children."""
+
+    type = None
+
+    def __init__(self, name, help, label_names=(), label_values=()):
+        self.name = name
+        self.help = help
+        self._label_names = tuple(label_names)
+        self._label_values = tuple(label_values)
+        self._lock = Lock()
+        self._children = {}
+
+    def labels(self, *values):
+        """Returns the child metric for the given label values."""
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self._label_names):
+                raise ValueError("%s takes labels %s" % (self.name,
+                        ", ".join(self._label_names)))
+            with self._lock:
+                child = self._children.get(values)
+                if child is None:
+                    child = self._child(values)
+                    self._children[values] = child
+        return child
+
+    def samples(self):
+        """Yields (name suffix, label pairs, value) for every sample."""
+        if self._label_names:
+            for values, child in sorted(self._children.items()):
+                for sample in child._samples(values):
+                    yield sample
+        else:
+            for sample in self._samples(()):
+                yield sample
+
+    def exposition(self):
+        """Returns the metric in the Prometheus text format."""
+        lines = [
+            "# HELP %s %s" % (self.name, self.help.replace("\n", " ")),
+            "# TYPE %s %s" % (self.name, self.type),
+        ]
+        for suffix, values, extra, value in self.samples():
+            lines.append("%s%s%s %s" % (self.name, suffix,
+                    _labels(self._label_names, values, extra), _number(value)))
+        return "\n".join(lines)
+
+    def _child(self, values):
+        return type(self)(self.name, self.help, self._label_names, values)
+
+class Counter(_Metric):
+    """A count that only goes up."""
+
+    type = "counter"
+
+    def __init__(self, *args, **kwargs):
+        _Metric.__init__(self, *args, **kwargs)
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def _samples(self, values):
+        yield "", values, (), self.value
+
+class Gauge(_Metric):
+    """A value that goes up and down."""
+
+    type = "gauge"
+
+    def __init__(self, *args, **kwargs):
+        _Metric.__init__(self, *args, **kwargs)
+        self.value = 0
+
+    def set(self, value):
+        self.value = value
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def _samples(self, values):
+        yield "", values, (), self.value
+
+class Histogram(_Metric):
+    """Counts observations into buckets and sums them."""
+
+    type = "histogram"
+
+    def __init__(self, name, help, label_names=(), label_values=(),
+            buckets=LATENCY_BUCKETS):
+        _Metric.__init__(self, name, help, label_names, label_values)
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0
+
+    @property
+    def count(self):
+        return sum(self._counts)
+
+    def observe(self, value):
+        # Bucket i counts values in (buckets[i - 1], buckets[i]]; they are
+        # made cumulative on exposition.
+        self._counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def _child(self, values):
+        return Histogram(self.name, self.help, self._label_names, values,
+                self.buckets)
+
+    def _samples(self, values):
+        counts, total = list(self._counts), self.sum
+
+        cumulative = 0
+        for bound, bucket in zip(self.buckets + (float("inf"),), counts):
+            cumulative += bucket
+            yield "_bucket", values, (("le", _number(bound)),), cumulative
+        yield "_sum", values, (), total
+        yield "_count", values, (), cumulative
+
+class MetricsRegistry(object):
+    """A set of metrics exposed together."""
+
+    def __init__(self):
+        self._metrics = []
+        self._names = set()
+
+    def register(self, metric):
+        if metric.name in self._names:
+            raise ValueError("%s is already registered" % metric.name)
+        self._names.add(metric.name)
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help, labels=()):
+        return self.register(Counter(name, help, labels))
+
+    def gauge(self, name, help, labels=()):
+        return self.register(Gauge(name, help, labels))
+
+    def histogram(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, help, labels, buckets=buckets))
+
+    def exposition(self):
+        """Returns every metric in the Prometheus text format."""
+        return "\n".join(metric.exposition() for metric in self._metrics) + "\n"
+
+REGISTRY = MetricsRegistry()
+
+### Scale ###
+
+USB_READ_SECONDS = REGISTRY.histogram("scale_usb_read_seconds",
+        "Time taken by each USB read of a scale report.")
+USB_READ_RETRIES = REGISTRY.counter("scale_usb_read_retries_total",
+        "USB reads retried because the previous one failed or returned nothing.")
+USB_READ_ERRORS = REGISTRY.counter("scale_usb_read_errors_total",
+        "USB reads that raised, by exception type.", ["type"])
+STALE_REPORTS = REGISTRY.counter("scale_stale_reports_total",
+        "Reports Scale.read_latest read and discarded for a newer one.")
+WEIGH_ATTEMPTS = REGISTRY.histogram("scale_weigh_attempts",
+        "Reports read by Scale.weigh before it found a stable weight.",
+        buckets=(1, 2, 3, 5, 10, 20, 50, 100))
+WEIGH_SECONDS = REGISTRY.histogram("scale_weigh_seconds",
+        "Time taken by Scale.weigh to find a stable weight.")
+
+### Acquisition ###
+
+ACQUISITION_ITERATIONS = REGISTRY.counter("scale_acquisition_iterations_total",
+        "Iterations of the acquisition loops of every scale.")
+RECONNECTS = REGISTRY.counter("scale_reconnects_total",
+        "Times a scale was read again after failing.")
+DISCONNECTED_SECONDS = REGISTRY.counter("scale_disconnected_seconds_total",
+        "Time scales spent failing before being read again.")
+
+### HTTP ###
+
+HTTP_REQUESTS = REGISTRY.counter("scale_http_requests_total",
+        "Requests to the scale routes, by route.", ["route"])
+HTTP_REQUEST_SECONDS = REGISTRY.histogram("scale_http_request_seconds",
+        "Time taken to answer requests to the scale routes, by route.",
+        ["route"])
@@ -0,0 +1,102 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# vim: set fileencoding=utf-8 :
+from bisect import bisect_left
+
+def _text(name):
+    # A handful of entries in USB_IDS are integer literals; see usb_ids_db.
+    if isinstance(name, int):
+        return "%x" % name
+    return name
+
+def _search(entries, name):
+    """
+    Returns the ids of the `entries` whose name equals `name`, ignoring
+    case, or else those whose name starts with it.
+
+    """
+    key = name.lower()
+    first = bisect_left(entries, (key,))
+    exact = []
+    prefixed = []
+
+    while first < len(entries):
+        entry = entries[first]
+        if entry[0] == key:
+            exact.append(entry[1:])
+        elif entry[0].startswith(key):
+            prefixed.append(entry[1:])
+        else:
+            break
+        first += 1
+
+    return exact or prefixed
+
+class NameIndex(object):
+    """Maps manufacturer and model names back to USB vendor and product ids."""
+
+    def __init__(self, lookup):
+        """
+        `lookup` is a table in the format ScaleManager takes. It is read
+        once, up front, into sorted lists of lowercased names.
+
+        """
+        manufacturers = []
+        models = []
+        scales = set()
+
+        for vendor_id, products in lookup.items():
+            for key, name in products.items():
+                name = _text(name)
+                if key == "name":
+                    manufacturers.append((name.lower(), vendor_id))
+                    continue
+
+                models.append((name.lower(), vendor_id, key))
+                if " Scale" in name:
+                    scales.add((vendor_id, key))
+
+        manufacturers.sort()
+        models.sort()
+
+        self._manufacturers = manufacturers
+        self._models = models
+        self._scales = frozenset(scales)
+
+
+    ### Public methods ###
+
+    def vendors(self, manufacturer):
+        """Returns the set of vendor ids named `manufacturer`."""
+        return set(entry[0] for entry in _search(self._manufacturers, manufacturer))
+
+    def products(self, model):
+        """Returns the set of (vendor id, product id) pairs named `model`."""
+        return set(_search(self._models, model))
+
+    def candidates(self, manufacturer=None, model=None):
+        """
+        Returns a tuple of a set of (vendor id, product id) pairs and a set
+        of vendor ids. A device matches `manufacturer` and `model` if its
+        ids are one of the pairs or its vendor id is one of the vendors.
+
+        Names are compared ignoring case. A name that matches nothing
+        exactly matches every name it is a prefix of instead.
+
+        Without arguments, the pairs are those of every model with
+        " Scale" in its name.
+
+        """
+        if not manufacturer and not model:
+            return self._scales, frozenset()
+
+        if not model:
+            return frozenset(), self.vendors(manufacturer)
+
+        pairs = self.products(model)
+
+        if manufacturer:
+            vendors = self.vendors(manufacturer)
+            pairs = set(pair for pair in pairs if pair[0] in vendors)
+
+        return pairs, frozenset()
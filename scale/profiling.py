@@ -0,0 +1,347 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# vim: set fileencoding=utf-8 :
+"""
+Hook points around the acquisition hot path.
+
+`Scale.read`, `Scale.weigh` and `AcquisitionEngine.poll` call the hooks
+attached with `attach` at these points:
+
+    pre_read(scale)               before each USB read
+    post_read(scale, data)        after a USB read returned data
+    read_timeout(scale)           instead, if a read given a timeout ran
+                                  out of it, as draining reads do
+    read_error(scale, error)      instead, if the read raised `error`
+    post_decode(scale, report)    after the data was decoded
+    post_publish(scale, result)   once a weight was handed on
+
+A read calls the hooks that were attached when it started until it ends,
+with `post_decode`, `read_timeout` or `read_error`, even if they are
+detached meanwhile.
+While nothing is attached, each point costs a single check of the module's
+`hooks` attribute.
+
+"""
+import cProfile
+import json
+import pstats
+import sys
+import time
+import traceback
+from collections import deque
+from threading import Event, Lock, Thread
+from readings import monotonic
+
+try:
+    from cStringIO import StringIO
+except ImportError:
+    from io import StringIO
+
+try:
+    from thread import get_ident
+except ImportError:
+    from threading import get_ident
+
+# The attached Hooks, or None.
+hooks = None
+
+_sampler = None
+
+def attach(new_hooks, sample_interval=None):
+    """
+    Attaches `new_hooks`, replacing any hooks already attached.
+
+    If `sample_interval` is given and the hooks are a Profiler, a thread
+    calls its `sample` method every `sample_interval` seconds until they
+    are detached.
+
+    """
+    global hooks, _sampler
+    detach()
+    hooks = new_hooks
+    if sample_interval:
+        _sampler = _Sampler(new_hooks, sample_interval)
+        _sampler.start()
+
+def detach():
+    """Detaches the hooks, if any, closes them and returns them."""
+    global hooks, _sampler
+    detached, hooks = hooks, None
+    if _sampler is not None:
+        _sampler.stop()
+        _sampler = None
+    if detached is not None:
+        detached.close()
+    return detached
+
+class Hooks(object):
+    """Hooks that do nothing, to be overridden."""
+
+    def pre_read(self, scale):
+        pass
+
+    def post_read(self, scale, data):
+        pass
+
+    def read_timeout(self, scale):
+        pass
+
+    def read_error(self, scale, error):
+        pass
+
+    def post_decode(self, scale, report):
+        pass
+
+    def post_publish(self, scale, result):
+        pass
+
+    def close(self):
+        """Called by `detach`."""
+        pass
+
+class StageStats(object):
+    """How often a stage ran and how long it took."""
+
+    __slots__ = ("count", "total", "max")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, duration):
+        self.count += 1
+        self.total += duration
+        if duration > self.max:
+            self.max = duration
+
+    def as_dict(self):
+        return {
+            "count": self.count,
+            "total": self.total,
+            "mean": self.total / self.count if self.count else None,
+            "max": self.max,
+        }
+
+class _Iteration(object):
+    # One thread's way from its first read to a published weight.
+
+    __slots__ = ("thread", "scale", "started", "stage_started", "stages",
+            "profile", "stack", "reading", "closed")
+
+    def __init__(self, thread, scale, now):
+        self.thread = thread
+        self.scale = scale
+        self.started = now
+        self.stage_started = now
+        self.stages = {}
+        self.profile = None
+        self.stack = None
+        self.reading = False
+        self.closed = False
+
+    def stage(self, name, now):
+        duration = now - self.stage_started
+        self.stages[name] = self.stages.get(name, 0) + duration
+        self.stage_started = now
+        return duration
+
+class Profiler(Hooks):
+    """Times each stage of the hot path and keeps a record of slow iterations."""
+
+    def __init__(self, slow=0.25, keep=20, profile=False, clock=monotonic):
+        """
+        An iteration runs from a thread's first read after it last
+        published a weight to the next weight it publishes, so it
+        includes the status reports read in between.
+
+        Iterations longer than `slow` seconds are kept, at most `keep` of
+        them, newest last, with the time spent in each stage. If `profile`
+        is True, the reads and decoding of every iteration run under
+        cProfile and slow ones keep its statistics; this slows the hot
+        path down noticeably. cProfile is only ever enabled for the span
+        of a read, so detaching the profiler cannot leave it behind.
+
+        Iterations whose read raised are dropped, but not those whose read
+        merely ran out of the timeout it was given, and so are those still
+        open when the profiler is closed.
+
+        `clock` is there for testing.
+
+        """
+        self._slow = slow
+        self._profile = profile
+        self._clock = clock
+        self._stages = {}
+        self._iterations = {}
+        self._slow_iterations = deque(maxlen=keep)
+        self._lock = Lock()
+
+
+    ### Public methods ###
+
+    def pre_read(self, scale):
+        now = self._clock()
+        iteration = self._iterations.get(get_ident())
+        if iteration is None:
+            iteration = _Iteration(get_ident(), str(scale), now)
+            if self._profile:
+                iteration.profile = cProfile.Profile()
+            self._iterations[iteration.thread] = iteration
+        else:
+            iteration.stage_started = now
+
+        iteration.reading = True
+        if iteration.profile is not None:
+            iteration.profile = self._enable(iteration.profile)
+
+    def post_read(self, scale, data):
+        self._stage("read")
+
+    def read_timeout(self, scale):
+        # The iteration goes on to the next read.
+        iteration = self._iterations.get(get_ident())
+        if iteration is None:
+            return
+
+        self._end_read(iteration)
+        if iteration.closed:
+            self._iterations.pop(iteration.thread, None)
+
+    def read_error(self, scale, error):
+        iteration = self._iterations.pop(get_ident(), None)
+        if iteration is not None:
+            self._end_read(iteration)
+
+    def post_decode(self, scale, report):
+        iteration = self._iterations.get(get_ident())
+        if iteration is None:
+            return
+
+        self._add("decode", iteration.stage("decode", self._clock()))
+        self._end_read(iteration)
+        if iteration.closed:
+            self._iterations.pop(iteration.thread, None)
+
+    def post_publish(self, scale, result):
+        iteration = self._iterations.pop(get_ident(), None)
+        if iteration is None:
+            return
+
+        now = self._clock()
+        self._add("publish", iteration.stage("publish", now))
+        duration = now - iteration.started
+        self._add("iteration", duration)
+
+        if duration >= self._slow:
+            self._slow_iterations.append(self._describe(iteration, duration))
+
+    def sample(self):
+        """
+        Records the stack of every thread whose current iteration has
+        already run longer than `slow` seconds, once per iteration, so a
+        read that hangs shows where it is stuck.
+
+        """
+        now = self._clock()
+        frames = sys._current_frames()
+        for iteration in list(self._iterations.values()):
+            frame = frames.get(iteration.thread)
+            if (iteration.stack is None and frame is not None
+                    and now - iteration.started >= self._slow):
+                iteration.stack = "".join(traceback.format_stack(frame))
+
+    def stats(self):
+        """Returns the count, total, mean and maximum time of each stage."""
+        with self._lock:
+            return dict(
+                (name, stage.as_dict()) for name, stage in self._stages.items()
+            )
+
+    def close(self):
+        """
+        Drops the iterations in progress. Those in the middle of a read are
+        dropped by the thread reading once the read ends, since cProfile
+        can only be disabled from the thread it profiles.
+
+        """
+        for iteration in list(self._iterations.values()):
+            if iteration.reading:
+                iteration.closed = True
+            else:
+                self._iterations.pop(iteration.thread, None)
+
+    def slow_iterations(self):
+        """Returns the slow iterations kept, oldest first."""
+        return list(self._slow_iterations)
+
+    def dump(self, path):
+        """Writes the stage statistics and slow iterations to `path` as JSON."""
+        with open(path, "w") as handle:
+            json.dump({
+                "time": time.time(),
+                "slow": self._slow,
+                "stages": self.stats(),
+                "slow_iterations": self.slow_iterations(),
+            }, handle, indent=2, sort_keys=True)
+        return path
+
+
+    ### Private methods ###
+
+    def _stage(self, name):
+        iteration = self._iterations.get(get_ident())
+        if iteration is not None:
+            self._add(name, iteration.stage(name, self._clock()))
+
+    def _add(self, name, duration):
+        with self._lock:
+            stage = self._stages.get(name)
+            if stage is None:
+                stage = self._stages[name] = StageStats()
+            stage.add(duration)
+
+    def _enable(self, profile):
+        try:
+            profile.enable()
+        except ValueError:
+            # Another thread's iteration holds the only profiler Python
+            # allows at a time.
+            return None
+        return profile
+
+    def _end_read(self, iteration):
+        iteration.reading = False
+        if iteration.profile is not None:
+            iteration.profile.disable()
+
+    def _describe(self, iteration, duration):
+        description = {
+            "scale": iteration.scale,
+            "duration": duration,
+            "stages": iteration.stages,
+            "stack": iteration.stack,
+        }
+        if iteration.profile is not None:
+            stream = StringIO()
+            stats = pstats.Stats(iteration.profile, stream=stream)
+            stats.sort_stats("cumulative").print_stats(25)
+            description["profile"] = stream.getvalue()
+        return description
+
+class _Sampler(Thread):
+    # Calls a Profiler's `sample` method periodically.
+
+    def __init__(self, profiler, interval):
+        Thread.__init__(self)
+        self.daemon = True
+        self._profiler = profiler
+        self._interval = interval
+        self._stop_event = Event()
+
+    def run(self):
+        while not self._stop_event.wait(self._interval):
+            self._profiler.sample()
+
+    def stop(self):
+        self._stop_event.set()
@@ -0,0 +1,157 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# vim: set fileencoding=utf-8 :
+import time
+from collections import namedtuple
+from threading import Condition, Lock
+
+# time.monotonic only exists on Python 3.3+.
+monotonic = getattr(time, "monotonic", time.time)
+
+Reading = namedtuple("Reading", ["seq", "timestamp", "report"])
+
+class ReadingBuffer(object):
+    """Fixed-size ring buffer of the most recent scale readings."""
+
+    def __init__(self, size=64):
+        """
+        `size` is the number of readings kept. All slots are allocated up
+        front; pushing a reading overwrites the oldest one once the buffer
+        is full.
+
+        Every pushed reading is stamped with a sequence number, starting at
+        1 and increasing by one per reading, so readers can tell which
+        readings they have already seen.
+
+        """
+        if size < 1:
+            raise ValueError("size must be at least 1")
+
+        self._size = size
+        self._slots = [None] * size
+        self._seq = 0
+        self._changed = Condition(Lock())
+
+
+    ### Read-only public properties ###
+
+    @property
+    def size(self):
+        return self._size
+
+    @property
+    def seq(self):
+        """The sequence number of the newest reading, or 0 if empty."""
+        return self._seq
+
+
+    ### Public methods ###
+
+    def push(self, report, timestamp=None):
+        """Stores `report` as the newest reading and returns the Reading."""
+        if timestamp is None:
+            timestamp = monotonic()
+
+        with self._changed:
+            seq = self._seq + 1
+            reading = Reading(seq, timestamp, report)
+            self._slots[seq % self._size] = reading
+            # Publish the sequence number last so readers never see a
+            # number whose slot has not been written yet.
+            self._seq = seq
+            self._changed.notify_all()
+
+        return reading
+
+    def latest(self):
+        """Returns the newest Reading, or None if nothing was pushed yet."""
+        seq = self._seq
+        if not seq:
+            return None
+        return self._slots[seq % self._size]
+
+    def get(self, seq):
+        """
+        Returns the Reading with sequence number `seq`, or None if it has
+        not been pushed yet or has already been overwritten.
+
+        """
+        if seq < 1:
+            return None
+        reading = self._slots[seq % self._size]
+        if reading is None or reading.seq != seq:
+            return None
+        return reading
+
+    def since(self, seq=0):
+        """
+        Returns the readings newer than sequence number `seq`, oldest
+        first. Readings that have already been overwritten are skipped.
+
+        """
+        newest = self._seq
+        first = max(seq + 1, newest - self._size + 1, 1)
+        readings = []
+
+        for i in range(first, newest + 1):
+            reading = self.get(i)
+            if reading is not None:
+                readings.append(reading)
+
+        return readings
+
+    def wait_for_change(self, seq=0, timeout=None):
+        """
+        Blocks until there is a reading newer than sequence number `seq`
+        whose report differs from the report of reading `seq`, then returns
+        the newest reading. Returns None if `timeout` seconds pass first.
+
+        Passing 0 (or a number the buffer has not reached, e.g. one from
+        before a restart) returns the newest reading as soon as there is
+        one. If reading `seq` has already been overwritten, any newer
+        reading counts as a change.
+
+        """
+        if timeout is not None:
+            deadline = monotonic() + timeout
+
+        with self._changed:
+            if seq > self._seq:
+                seq = 0
+
+            seen = self.get(seq)
+
+            while True:
+                latest = self.latest()
+                if latest is not None and latest.seq > seq and (
+                    seen is None or latest.report != seen.report
+                ):
+                    return latest
+
+                if timeout is None:
+                    self._changed.wait()
+                    continue
+
+                remaining = deadline - monotonic()
+                if remaining <= 0:
+                    return None
+                self._changed.wait(remaining)
+
+    def wait_since(self, seq=0, timeout=None):
+        """
+        Blocks until there are readings newer than sequence number `seq`,
+        then returns them oldest first, like `since`. Returns an empty list
+        if `timeout` seconds pass first.
+
+        Any number of readers can follow the buffer this way, each with
+        its own `seq`, without the writer doing any per-reader work.
+
+        """
+        with self._changed:
+            if self._seq <= seq and timeout != 0:
+                self._changed.wait(timeout)
+
+        return self.since(seq)
+
+    def __len__(self):
+        return min(self._seq, self._size)
@@ -0,0 +1,122 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# vim: set fileencoding=utf-8 :
+import random
+from readings import monotonic
+
+# Circuit breaker states.
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+
+class ReconnectPolicy(object):
+    """Spaces out attempts to reach a failing scale."""
+
+    def __init__(self, base_delay=0.5, max_delay=60, factor=2, jitter=0.5,
+            failure_threshold=5, reset_timeout=60, clock=monotonic,
+            random=random.random):
+        """
+        After the n-th failure in a row, the next attempt waits
+        `base_delay` times `factor` to the power of n - 1 seconds, at most
+        `max_delay`, shortened by a random fraction of up to `jitter` so
+        that several failing scales do not retry in lockstep.
+
+        After `failure_threshold` failures in a row the circuit opens: no
+        attempt is made for `reset_timeout` seconds, after which it is
+        half-open and a single attempt decides whether it closes again
+        or stays open for another `reset_timeout` seconds.
+
+        `clock` and `random` are there for testing.
+
+        """
+        self._base_delay = base_delay
+        self._max_delay = max_delay
+        self._factor = factor
+        self._jitter = jitter
+        self._threshold = failure_threshold
+        self._reset_timeout = reset_timeout
+        self._clock = clock
+        self._random = random
+        self._failures = 0
+        self._opened_at = None
+        self._retry_at = None
+        self._last_error = None
+
+
+    ### Read-only public properties ###
+
+    @property
+    def state(self):
+        # Read once: the acquisition thread may close the circuit meanwhile.
+        opened_at = self._opened_at
+        if opened_at is None:
+            return CLOSED
+        if self._clock() - opened_at >= self._reset_timeout:
+            return HALF_OPEN
+        return OPEN
+
+    @property
+    def failures(self):
+        """How many attempts in a row have failed."""
+        return self._failures
+
+    @property
+    def last_error(self):
+        return self._last_error
+
+
+    ### Public methods ###
+
+    def allow(self):
+        """Returns whether an attempt may be made now."""
+        return self.state != OPEN
+
+    def delay(self):
+        """Returns how many seconds to wait before the next attempt."""
+        # Read once: the acquisition thread may record a failure meanwhile.
+        retry_at = self._retry_at
+        if not self._failures or retry_at is None:
+            return 0
+        return max(0, retry_at - self._clock())
+
+    def success(self):
+        """Records a successful attempt, closing the circuit."""
+        self._failures = 0
+        self._opened_at = None
+        self._last_error = None
+
+    def failure(self, error=None):
+        """
+        Records a failed attempt. Returns True if this failure opened the
+        circuit, False otherwise.
+
+        """
+        was_open = self._opened_at is not None
+        now = self._clock()
+        failures = self._failures + 1
+        self._last_error = error
+
+        # The retry time is set before the failure is counted, so threads
+        # reading `delay` or `status` never see a failure without one.
+        if was_open or failures >= self._threshold:
+            self._retry_at = now + self._reset_timeout
+            self._opened_at = now
+            self._failures = failures
+            return not was_open
+
+        delay = min(
+            self._base_delay * self._factor ** (failures - 1),
+            self._max_delay
+        )
+        self._retry_at = now + delay * (1 - self._jitter * self._random())
+        self._failures = failures
+        return False
+
+    def status(self):
+        """Returns a dictionary describing the policy, for status reports."""
+        return {
+            "state": self.state,
+            "failures": self._failures,
+            "retry_in": round(self.delay(), 3),
+            "last_error": str(self._last_error) if self._last_error else None,
+        }
@@ -0,0 +1,295 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# vim: set fileencoding=utf-8 :
+from collections import namedtuple
+from threading import Lock, Thread
+from scale import Scale
+from session import ScaleSession, CONNECTED
+from readings import ReadingBuffer
+from acquisition import AcquisitionEngine
+
+def device_id(device):
+    """
+    Returns a string identifying `device` on this host, made of its bus
+    and address numbers (e.g. "001-004"). It stays the same for as long
+    as the device stays plugged into the same port.
+
+    """
+    return "%03d-%03d" % (device.bus, device.address)
+
+class ScaleSnapshot(namedtuple("ScaleSnapshot",
+        ["report", "tare", "status", "seq", "timestamp"])):
+    """
+    A scale's newest data report (or None), tare and session state, with
+    the report's sequence number and timestamp, as of one moment.
+
+    """
+
+    __slots__ = ()
+
+    @property
+    def weight(self):
+        """The report's weight minus the tare, or None without a report."""
+        if self.report is None:
+            return None
+        return self.report.weight - self.tare
+
+class ScaleWorker(object):
+    """One scale's session, readings, tare and acquisition thread."""
+
+    def __init__(self, id, device, device_manager, buffer_size=64,
+            endpoint=None, retry_delay=5, on_status=None, on_error=None,
+            stability=None, scheduler=None, reconnect=None, on_publish=None,
+            transfers=None, buffers=None):
+        """
+        Wraps `device` without looking it up on the bus again: `id` is
+        the key the worker is registered under and `device_manager` is
+        only used to name the scale.
+
+        The remaining arguments are passed on to ReadingBuffer and
+        AcquisitionEngine. `on_status` is called with the worker's `id`
+        followed by ScaleSession's state and message arguments.
+
+        The worker's readings, tare and state are published together in
+        `snapshot`, a ScaleSnapshot replaced as a whole whenever one of
+        them changes. Reading the attribute once gives a consistent view
+        without taking any lock. `on_publish` is an optional callable
+        taking the worker's `id` and every new snapshot, called by one
+        thread at a time in the order the snapshots were made.
+
+        `stability` is an optional callable returning a StabilityFilter for
+        the engine, e.g. the StabilityFilter class itself. The filter is
+        reset whenever the scale reconnects. `scheduler` and `reconnect`
+        likewise return the engine's PollScheduler and ReconnectPolicy.
+
+        `transfers` and `buffers` are passed on to Scale, to read the scale
+        through a TransferQueue or into a BufferPool's buffers.
+
+        """
+        self.id = id
+        self.device = device
+        self.snapshot = ScaleSnapshot(None, 0, None, 0, None)
+        self._publishing = Lock()
+        self._on_publish = on_publish
+        self.stability = stability() if stability else None
+        self.reconnect = reconnect() if reconnect else None
+
+        def status(state, message):
+            if state == CONNECTED and self.stability is not None:
+                self.stability.reset()
+            self._publish(status=state)
+            if on_status:
+                on_status(id, state, message)
+
+        self.session = ScaleSession(
+            lambda: Scale(device=device, device_manager=device_manager,
+                transfers=transfers, buffers=buffers),
+            on_status=status
+        )
+        self.readings = ReadingBuffer(buffer_size)
+        self.engine = AcquisitionEngine(self.session, self.readings,
+            endpoint=endpoint, retry_delay=retry_delay, on_error=on_error,
+            stability=self.stability,
+            scheduler=scheduler() if scheduler else None,
+            reconnect=self.reconnect,
+            on_reading=self._on_reading
+        )
+        self._thread = None
+        self._publish(status=self.session.state)
+
+
+    ### Read-only public properties ###
+
+    @property
+    def tare(self):
+        return self.snapshot.tare
+
+
+    ### Public methods ###
+
+    def start(self):
+        """Starts reading the scale in a daemon thread."""
+        if self._thread and self._thread.is_alive():
+            return
+
+        self._thread = Thread(target=self._run, name="scale-" + self.id)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        """Stops reading the scale and waits up to `timeout` seconds for it."""
+        self.engine.stop()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def latest(self):
+        """Returns the newest data report, or None."""
+        return self.snapshot.report
+
+    def view(self, reading):
+        """
+        Returns a ScaleSnapshot of `reading`, a Reading from `readings`,
+        with the current tare and state.
+
+        """
+        return self.snapshot._replace(report=reading.report,
+            seq=reading.seq, timestamp=reading.timestamp
+        )
+
+    def wake(self):
+        """Has the engine read at full rate for a while; see PollScheduler."""
+        self.engine.wake()
+
+    def set_tare(self):
+        """Tares the scale to the newest weight, if there is one."""
+        with self._publishing:
+            snapshot = self.snapshot
+            if snapshot.report is not None:
+                self._set(snapshot._replace(tare=snapshot.report.weight))
+
+    def clear_tare(self):
+        self._publish(tare=0)
+
+
+    ### Private methods ###
+
+    def _on_reading(self, reading):
+        self._publish(report=reading.report, seq=reading.seq,
+            timestamp=reading.timestamp
+        )
+
+    def _publish(self, **changes):
+        # Writers take turns so that none undoes another's change; readers
+        # just read `snapshot`.
+        with self._publishing:
+            self._set(self.snapshot._replace(**changes))
+
+    def _set(self, snapshot):
+        self.snapshot = snapshot
+        if self._on_publish:
+            self._on_publish(self.id, snapshot)
+
+    def _run(self):
+        try:
+            self.engine.run()
+        finally:
+            self.session.close()
+
+class ScaleRegistry(object):
+    """Runs one ScaleWorker per connected scale."""
+
+    def __init__(self, device_manager=None, key=device_id, **worker_args):
+        """
+        `device_manager` is used to enumerate scales; it defaults to a
+        ScaleManager, created when first needed.
+
+        `key` is a callable returning the id a device is registered
+        under. It defaults to `device_id`, i.e. the bus and address.
+
+        Any other keyword arguments are passed on to each ScaleWorker.
+
+        """
+        self._manager = device_manager
+        self._key = key
+        self._worker_args = worker_args
+        self._workers = {}
+        self._order = []
+        self._lock = Lock()
+
+
+    ### Read-only public properties ###
+
+    @property
+    def device_manager(self):
+        if not self._manager:
+            from scale_manager import ScaleManager
+            self._manager = ScaleManager()
+        return self._manager
+
+
+    ### Public methods ###
+
+    def sync(self):
+        """
+        Enumerates the bus once, starts a worker for every new scale and
+        stops the workers of scales that are gone.
+
+        Returns a tuple of the lists of added and removed ids.
+
+        """
+        devices = self.device_manager.find_all()
+        present = set()
+        added = []
+
+        for device in devices:
+            id = self._key(device)
+            present.add(id)
+            if self.add(device, id):
+                added.append(id)
+
+        removed = [id for id in self.ids() if id not in present]
+        for id in removed:
+            self.remove(id)
+
+        return added, removed
+
+    def add(self, device, id=None):
+        """
+        Starts a worker for `device` unless one is already registered
+        under its id. Returns the new worker, or None.
+
+        """
+        if id is None:
+            id = self._key(device)
+
+        with self._lock:
+            if id in self._workers:
+                return None
+
+            worker = ScaleWorker(
+                id, device, self.device_manager, **self._worker_args
+            )
+            self._workers[id] = worker
+            self._order.append(id)
+
+        worker.start()
+        return worker
+
+    def remove(self, id, timeout=None):
+        """Stops and forgets the worker registered under `id`, if any."""
+        with self._lock:
+            worker = self._workers.pop(id, None)
+            if worker:
+                self._order.remove(id)
+
+        if worker:
+            worker.stop(timeout)
+
+        return worker
+
+    def get(self, id=None):
+        """
+        Returns the worker registered under `id`, or the longest-running
+        worker if `id` is None. Returns None if there is no such worker.
+
+        """
+        with self._lock:
+            if id is None:
+                id = self._order[0] if self._order else None
+            return self._workers.get(id)
+
+    def ids(self):
+        """Returns the registered ids, longest-running first."""
+        with self._lock:
+            return list(self._order)
+
+    def stop(self, timeout=None):
+        """Stops every worker."""
+        for id in self.ids():
+            self.remove(id, timeout)
+
+    def __contains__(self, id):
+        return id in self._workers
+
+    def __len__(self):
+        return len(self._workers)
@@ -1,3 +1,5 @@
+from __future__ import division
+from array import array
 from collections import namedtuple
 from decimal import Decimal
 
@@ -65,6 +67,7 @@ STATUSES = {
 }
 
 ZERO_WEIGHT = 0x2
+IN_MOTION = 0x3
 STABLE_WEIGHT = 0x4
 
 
@@ -122,9 +125,8 @@ class ReportFactory(object):
             )
 
     @staticmethod
-    def twos_comp(value):
+    def twos_comp(value, num_bits=8):
         """Compute the 2's compliment of int value val"""
-        num_bits = len(bin(value)) - 2 # Subtract 2 to remove leading '0b'
         if((value & (1 << (num_bits - 1))) != 0):
             value = value - (1 << num_bits)
         return value
@@ -134,3 +136,217 @@ class ReportFactory(object):
         """Converts the USB HID's weight data to a float"""
         return float(Decimal(str(10 ** cls.twos_comp(scale))) \
                 * Decimal(str(lsb + (256 * msb))))
+
+
+### Table-driven decoding ###
+
+# Names by code, with None for codes the tables above leave undefined.
+_UNIT_NAMES = tuple(WEIGHT_UNITS.get(code) for code in range(256))
+_CLASS_NAMES = tuple(SCALE_CLASSES.get(code) for code in range(256))
+_STATUS_NAMES = tuple(STATUSES.get(code) for code in range(256))
+
+# (multiplier, divisor) for 10 ** exponent, indexed by the exponent's
+# unsigned byte. Dividing by an exact integer power of ten rounds the
+# same way calc_weight's Decimal arithmetic does.
+_SCALING = tuple(
+    (10 ** exponent, 1) if exponent >= 0 else (1, 10 ** -exponent)
+    for exponent in (ReportFactory.twos_comp(code) for code in range(256))
+)
+
+# Builds a namedtuple from a tuple without going through its __new__.
+_make = tuple.__new__
+
+def _attributes_report(data):
+    return _make(AttributesReport, (ATTRIBUTES_REPORT, data,
+        _CLASS_NAMES[data[1]], _UNIT_NAMES[data[2]]
+    ))
+
+def _control_report(data):
+    return _make(ControlReport, (CONTROL_REPORT, data,
+        (data[1] > 1), ((data[1] & 1) == 1)
+    ))
+
+def _data_report(data):
+    multiplier, divisor = _SCALING[data[3]]
+    return _make(DataReport, (DATA_REPORT, data,
+        _STATUS_NAMES[data[1]], _UNIT_NAMES[data[2]],
+        (data[4] + (data[5] << 8)) * multiplier / divisor
+    ))
+
+def _status_report(data):
+    return _make(StatusReport, (STATUS_REPORT, data, _STATUS_NAMES[data[1]]))
+
+def _weight_limit_report(data):
+    multiplier, divisor = _SCALING[data[2]]
+    return _make(WeightLimitReport, (WEIGHT_LIMIT_REPORT, data,
+        _UNIT_NAMES[data[1]],
+        (data[3] + (data[4] << 8)) * multiplier / divisor
+    ))
+
+def _statistics_report(data):
+    return _make(StatisticsReport, (STATISTICS_REPORT, data,
+        (data[1] + (data[2] << 8)), (data[3] + (data[4] << 8))
+    ))
+
+# Decoding functions indexed by report id.
+_DECODERS = [None] * 256
+_DECODERS[ATTRIBUTES_REPORT] = _attributes_report
+_DECODERS[CONTROL_REPORT] = _control_report
+_DECODERS[DATA_REPORT] = _data_report
+_DECODERS[STATUS_REPORT] = _status_report
+_DECODERS[WEIGHT_LIMIT_REPORT] = _weight_limit_report
+_DECODERS[STATISTICS_REPORT] = _statistics_report
+_DECODERS = tuple(_DECODERS)
+
+def decode(data):
+    """
+    Returns the same named tuple report as `ReportFactory.build`, using
+    lookup tables instead of branches, dictionaries and Decimal math.
+
+    `data` can be any sequence of byte values: the `array('B')` PyUSB
+    returns, or a memoryview over it, which is indexed in place rather
+    than copied. Codes the tables above leave undefined decode to None
+    instead of raising, and so do unknown report ids.
+
+    """
+    decoder = _DECODERS[data[0]]
+    if decoder is None:
+        return None
+    return decoder(data)
+
+
+
+### Cached decoding ###
+
+# array.tostring was renamed tobytes in Python 3.
+_tobytes = getattr(array, "tobytes", None) or array.tostring
+
+class ReportCache(object):
+    """Decoded reports, shared by every identical report read."""
+
+    def __init__(self, size=256):
+        """
+        Keeps the reports decoded from up to `size` distinct byte
+        sequences. A steady scale sends the same few reports over and
+        over, so decoding them from the cache allocates nothing that
+        outlives the call. Once full, the cache starts over.
+
+        """
+        self._size = size
+        self._reports = {}
+
+
+    ### Public methods ###
+
+    def decode(self, buffer, length):
+        """
+        Returns the report held in the first `length` bytes of `buffer`,
+        an `array('B')`, like `decode`. Its `raw` field is a copy made the
+        first time the report was seen, never `buffer` itself, so the
+        buffer can be read into again straight away.
+
+        """
+        # A slice and a bytes key cost less than looking the bytes up
+        # one by one; see benchmarks.decode.
+        data = buffer[:length]
+        key = _tobytes(data)
+        try:
+            return self._reports[key]
+        except KeyError:
+            pass
+
+        if len(self._reports) >= self._size:
+            self._reports.clear()
+        report = self._reports[key] = decode(data)
+        return report
+
+    def clear(self):
+        self._reports.clear()
+
+
+
+### Batch decoding ###
+
+class ReportBatch(object):
+    """Many fixed-size reports decoded into columns at once."""
+
+    def __init__(self, raw, type, status, unit, weight):
+        """
+        `raw` is the (N, report size) uint8 array the other columns were
+        decoded from; see `decode_batch` for what they hold.
+
+        """
+        self.raw = raw
+        self.type = type
+        self.status = status
+        self.unit = unit
+        self.weight = weight
+
+    def __len__(self):
+        return len(self.raw)
+
+    def __getitem__(self, index):
+        """Decodes row `index` into the usual named tuple report."""
+        return decode(array('B', self.raw[index].tobytes()))
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+def decode_batch(buffer, report_size=6):
+    """
+    Decodes a contiguous buffer of `report_size`-byte reports, such as
+    a capture of raw scale traffic, with vectorised NumPy operations.
+
+    `buffer` can be bytes, a bytearray, a memoryview or a NumPy array; it
+    is viewed rather than copied. Returns a ReportBatch whose `type`,
+    `status` and `unit` columns are uint8 arrays of report ids, status
+    codes and unit codes, and whose `weight` column is a float64 array.
+    Columns a report type does not carry hold 0 (NaN for weights).
+    Indexing the batch decodes single rows into named tuples on demand.
+
+    Requires NumPy.
+
+    """
+    import numpy
+
+    if isinstance(buffer, numpy.ndarray):
+        data = buffer.astype(numpy.uint8, copy=False).reshape(-1)
+    else:
+        data = numpy.frombuffer(buffer, dtype=numpy.uint8)
+
+    if len(data) % report_size:
+        raise ValueError(
+            "buffer size %d is not a multiple of %d" % (len(data), report_size)
+        )
+
+    raw = data.reshape(-1, report_size)
+    type = raw[:, 0]
+    is_data = type == DATA_REPORT
+    is_limit = type == WEIGHT_LIMIT_REPORT
+
+    status = numpy.where(is_data | (type == STATUS_REPORT), raw[:, 1], 0)
+    unit = numpy.where(is_data, raw[:, 2], numpy.where(is_limit, raw[:, 1], 0))
+
+    # Data reports carry exponent, LSB and MSB from byte 3 on, weight limit
+    # reports from byte 2 on.
+    exponent = numpy.where(is_data, raw[:, 3], raw[:, 2])
+    lsb = numpy.where(is_data, raw[:, 4], raw[:, 3]).astype(numpy.float64)
+    msb = numpy.where(is_data, raw[:, 5], raw[:, 4]).astype(numpy.float64)
+
+    multipliers, divisors = _batch_scaling(numpy)
+    weight = (lsb + msb * 256) * multipliers[exponent] / divisors[exponent]
+    weight[~(is_data | is_limit)] = numpy.nan
+
+    return ReportBatch(raw, type, status.astype(numpy.uint8),
+        unit.astype(numpy.uint8), weight
+    )
+
+_batch_tables = []
+
+def _batch_scaling(numpy):
+    """Returns _SCALING as a pair of float64 arrays, built once."""
+    if not _batch_tables:
+        _batch_tables.append(numpy.array([m for m, d in _SCALING], dtype=numpy.float64))
+        _batch_tables.append(numpy.array([d for m, d in _SCALING], dtype=numpy.float64))
+    return _batch_tables
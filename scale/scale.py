@@ -1,13 +1,28 @@
 #!/usr/bin/python
 # -*- coding: utf-8 -*-
 # vim: set fileencoding=utf-8 :
+import usb.core
 import usb.util
 from collections import namedtuple
+import metrics
+import profiling
+from readings import monotonic
 from scale_manager import ScaleManager
+from transfers import ETIMEDOUT
 from reports import \
-        ReportFactory, STATUSES, ZERO_WEIGHT, STABLE_WEIGHT, DATA_REPORT
+        decode, ReportCache, STATUSES, ZERO_WEIGHT, STABLE_WEIGHT, DATA_REPORT
 
 ScaleReading = namedtuple("ScaleReading", ["weight", "unit"])
+LatestReport = namedtuple("LatestReport", ["report", "discarded"])
+
+# How long, in milliseconds, `read_latest` waits for each report while
+# draining the ones already sent: DRAIN_INTERVALS times the endpoint's
+# polling interval, as the host only asks the scale for a report that often,
+# but no less than DRAIN_TIMEOUT. Reports read through a TransferQueue are
+# already waiting in it, so those reads only wait DRAIN_TIMEOUT. libusb
+# takes 0 to mean forever.
+DRAIN_TIMEOUT = 1
+DRAIN_INTERVALS = 2
 
 class ConnectionError(Exception):
     pass
@@ -15,7 +30,8 @@ class ConnectionError(Exception):
 class Scale(object):
     """Represents a USB-connected scale."""
 
-    def __init__(self, device=None, manufacturer=None, model=None, device_manager=None):
+    def __init__(self, device=None, manufacturer=None, model=None, device_manager=None,
+            capture=None, transfers=None, buffers=None):
         """
         Instantiates a Scale object.
 
@@ -45,11 +61,28 @@ class Scale(object):
         If a `device_manager` argument is passed, it uses that object
         instead of a ScaleManager instance to find the attached scale.
 
+        If a `capture` argument is passed, every raw report `read` receives
+        is appended to it; see `capture.CaptureWriter`.
+
+        If a `transfers` argument is passed, a callable taking the device and
+        its endpoint and returning an opened `transfers.TransferQueue`,
+        `connect` uses it to keep transfers queued on the scale, and `read`
+        takes reports from the queue instead of reading the device itself,
+        unless it is given another endpoint.
+
+        If a `buffers` argument is passed, a `buffers.BufferPool`, the scale
+        takes one of its buffers, as long as the endpoint's packet size,
+        while connected and reads every report into it instead of having
+        PyUSB allocate one per read. Reports are then decoded through a
+        `reports.ReportCache`, so reading the same report again returns
+        the same object and nothing read is kept beyond the cache.
+
         """
         if not device_manager:
             device_manager = ScaleManager()
 
-        device = device_manager.find(manufacturer=manufacturer, model=model)
+        if not device:
+            device = device_manager.find(manufacturer=manufacturer, model=model)
 
         if not manufacturer and device:
             manufacturer = device_manager.get_manufacturer(device)
@@ -63,6 +96,13 @@ class Scale(object):
         self._manager = device_manager
         self._endpoint = None
         self._last_reading = None
+        self._connected = False
+        self._capture = capture
+        self._transfers_factory = transfers
+        self._transfers = None
+        self._buffers = buffers
+        self._buffer = None
+        self._decoded = ReportCache() if buffers is not None else None
 
         # Initialize the USB connection to the scale.
         if self.device:
@@ -91,6 +131,22 @@ class Scale(object):
     def manager(self):
         return self._manager
 
+    @property
+    def connected(self):
+        return self._connected
+
+
+    ### Public properties ###
+
+    @property
+    def capture(self):
+        """A CaptureWriter raw reports are logged to, or None."""
+        return self._capture
+
+    @capture.setter
+    def capture(self, capture):
+        self._capture = capture
+
     ### Public methods ###
 
     def connect(self):
@@ -109,13 +165,40 @@ class Scale(object):
 
         self.device.set_configuration()
 
+        if self._transfers_factory is not None and self._transfers is None:
+            if not self._endpoint:
+                self._endpoint = self.device[0][(0,0)][0]
+            self._transfers = self._transfers_factory(
+                self.device, self._endpoint
+            )
+
+        if self._buffers is not None and self._buffer is None:
+            if not self._endpoint:
+                self._endpoint = self.device[0][(0,0)][0]
+            # Each read asks for as many bytes as the buffer holds.
+            self._buffer = self._buffers.acquire(
+                self._endpoint.wMaxPacketSize
+            )
+
+        self._connected = True
+
         return True
 
     def disconnect(self):
         """Frees the scale up for other programs/objects to use."""
-        if not self.device:
+        if not self.device or not self._connected:
             return False
 
+        self._connected = False
+
+        if self._transfers is not None:
+            self._transfers.close()
+            self._transfers = None
+
+        if self._buffer is not None:
+            self._buffers.release(self._buffer)
+            self._buffer = None
+
         self._device.reset()
         usb.util.dispose_resources(self.device)
 
@@ -127,61 +210,215 @@ class Scale(object):
 
         return True
 
-    def weigh(self, endpoint=None, max_attempts=10):
-        """Reads from the scale until a stable weight is found"""
+    def weigh(self, endpoint=None, max_attempts=10, stability=None,
+            latest=False):
+        """
+        Reads from the scale until a stable weight is found.
+
+        If `latest` is True, the first read skips the reports the scale sent
+        before `weigh` was called, through `read_latest`, so a weight left
+        over from the previous item does not count.
+
+        If a `stability` argument is passed, a StabilityFilter, it decides
+        when the weight is stable instead of the scale's own status. It
+        keeps its window across calls, so a filter that has already seen
+        the weight settle lets `weigh` return on the next data report.
+
+        """
         weighed = False
         attempts = 0
+        started = monotonic()
 
         while not weighed and attempts < max_attempts:
             attempts += 1
-            report = self.read(endpoint=endpoint)
+            if latest and attempts == 1:
+                report = self.read_latest(endpoint=endpoint).report
+            else:
+                report = self.read(endpoint=endpoint)
 
             if not report:
                 raise ConnectionError("Scale not found!")
 
+            if stability is not None:
+                report = stability.filter(report)
+
             weighed = (report.type == DATA_REPORT and (
                 report.status == STATUSES[STABLE_WEIGHT]
                 or report.status == STATUSES[ZERO_WEIGHT]
             ))
 
         if not weighed:
-            report = None
+            return None
+
+        metrics.WEIGH_ATTEMPTS.observe(attempts)
+        metrics.WEIGH_SECONDS.observe(monotonic() - started)
+
+        hooks = profiling.hooks
+        if hooks is not None:
+            hooks.post_publish(self, report)
 
         return report
 
-    def read(self, endpoint=None, max_attempts=10):
-        """Takes a reading from the scale and returns a named tuple"""
+    def read(self, endpoint=None, max_attempts=10, timeout=None):
+        """
+        Takes a reading from the scale and returns a named tuple.
+
+        `timeout` is how many milliseconds each attempt waits for a report,
+        PyUSB's default if None.
+
+        """
         if not self.device:
             return False
 
         data = None
         error = None
+        timed_out = False
         attempts = 0
+        transfers = self._transfers if not endpoint else None
+        buffer = self._buffer if transfers is None else None
+        length = None
 
         if not endpoint:
-            endpoint = self.device[0][(0,0)][0]
+            if not self._endpoint:
+                self._endpoint = self.device[0][(0,0)][0]
+            endpoint = self._endpoint
+        elif buffer is not None and \
+                len(buffer) != endpoint.wMaxPacketSize:
+            buffer = None
+
+        hooks = profiling.hooks
+        if hooks is not None:
+            hooks.pre_read(self)
 
         # Weighing data consists of a six-element array.
         # In between reads, it returns a two-element array to
         # demonstrate readiness. We can ignore those.
         while not data and attempts < max_attempts:
             attempts += 1
+            started = monotonic()
             try:
-                data = self.device.read(
-                    endpoint.bEndpointAddress,
-                    endpoint.wMaxPacketSize
-                )
+                if transfers is not None:
+                    data = transfers.read() if timeout is None \
+                        else transfers.read(timeout / 1000.0)
+                elif buffer is not None:
+                    length = self.device.read(
+                        endpoint.bEndpointAddress, buffer, timeout
+                    )
+                    data = buffer if length else None
+                else:
+                    data = self.device.read(
+                        endpoint.bEndpointAddress,
+                        endpoint.wMaxPacketSize,
+                        timeout
+                    )
             except Exception as e:
                 error = e
+                # Callers passing a timeout expect reads to run out of it.
+                timed_out = timeout is not None \
+                        and getattr(e, "errno", None) == ETIMEDOUT
+                if not timed_out:
+                    metrics.USB_READ_ERRORS.labels(type(e).__name__).inc()
+            metrics.USB_READ_SECONDS.observe(monotonic() - started)
+
+        if attempts > 1:
+            metrics.USB_READ_RETRIES.inc(attempts - 1)
 
         if error and not data:
+            if hooks is None:
+                pass
+            elif timed_out:
+                hooks.read_timeout(self)
+            else:
+                hooks.read_error(self, error)
             raise error
 
-        return ReportFactory.build(data)
+        if buffer is not None and (
+                hooks is not None or self._capture is not None):
+            # The buffer is read into again next time.
+            data = buffer[:length]
+
+        if hooks is not None:
+            hooks.post_read(self, data)
+
+        if self._capture is not None:
+            self._capture.write(data)
+
+        if self._decoded is None:
+            report = decode(data)
+        elif buffer is not None:
+            report = self._decoded.decode(buffer, length)
+        else:
+            report = self._decoded.decode(data, len(data))
+
+        if hooks is not None:
+            hooks.post_decode(self, report)
+
+        return report
+
+    def read_latest(self, endpoint=None, max_attempts=10, max_reports=64):
+        """
+        Returns the newest data report the scale sent, as the `report` of a
+        LatestReport whose `discarded` is how many other reports were read
+        on the way.
+
+        Reports the scale sends while nobody reads it wait on the bus, so
+        the first one `read` returns can show a weight long gone. This
+        reads them all, each read giving up once the scale could have sent
+        another (see DRAIN_INTERVALS), stopping after `max_reports` in case the scale sends
+        them faster than they are read. If none of them was a data report,
+        it reads on up to `max_attempts` times for the next one; `report`
+        is None if that does not come either.
+
+        """
+        if not self.device:
+            return False
+
+        latest = None
+        received = 0
+        timeout = self._drain_timeout(endpoint)
+
+        while received < max_reports:
+            try:
+                report = self.read(endpoint=endpoint, max_attempts=1,
+                        timeout=timeout)
+            except usb.core.USBError as e:
+                if e.errno != ETIMEDOUT:
+                    raise
+                break # Nothing left waiting.
+
+            received += 1
+            if report is not None and report.type == DATA_REPORT:
+                latest = report
+
+        attempts = 0
+        while latest is None and attempts < max_attempts:
+            attempts += 1
+            report = self.read(endpoint=endpoint)
+            received += 1
+            if report is not None and report.type == DATA_REPORT:
+                latest = report
+
+        discarded = received - 1 if latest is not None else received
+        if discarded:
+            metrics.STALE_REPORTS.inc(discarded)
+
+        return LatestReport(latest, discarded)
 
 
     ### Private methods ###
 
+    def _drain_timeout(self, endpoint):
+        if not endpoint:
+            if self._transfers is not None:
+                return DRAIN_TIMEOUT
+            if not self._endpoint:
+                self._endpoint = self.device[0][(0,0)][0]
+            endpoint = self._endpoint
+        # bInterval counts milliseconds on the full and low speed buses
+        # HID scales use.
+        return max(DRAIN_TIMEOUT,
+                DRAIN_INTERVALS * getattr(endpoint, "bInterval", 0))
+
     def __str__(self):
         return self.name
 
@@ -193,4 +430,6 @@ class Scale(object):
         self.disconnect()
 
     def __del__(self):
-        self.disconnect()
+        # `__init__` may have raised before the scale was set up.
+        if hasattr(self, "_connected"):
+            self.disconnect()
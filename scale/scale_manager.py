@@ -18,7 +18,8 @@ class ScaleManager(object):
         method.
 
         Both arguments are optional. If omitted, `lookup` defaults to
-        `usb_ids.USB_IDS` and `usb_lib` defaults to PyUSB's `usb.core`.
+        the memory-mapped compiled copy of `usb_ids.USB_IDS` returned by
+        `usb_ids_db.load` and `usb_lib` defaults to PyUSB's `usb.core`.
 
         """
         if not usb_lib:
@@ -26,11 +27,12 @@ class ScaleManager(object):
             usb_lib = usb.core
 
         if not lookup:
-            import usb_ids
-            lookup = usb_ids.USB_IDS
+            import usb_ids_db
+            lookup = usb_ids_db.load()
 
         self._lookup = lookup
         self._usb = usb_lib
+        self._index = None
 
 
     ### Read-only public properties ###
@@ -39,6 +41,23 @@ class ScaleManager(object):
     def usb(self):
         return self._usb
 
+    @property
+    def index(self):
+        """
+        The NameIndex of `lookup`: the one compiled into it if it is a
+        `usb_ids_db.UsbIdDatabase`, or else one built from it the first
+        time it is needed.
+
+        """
+        if not self._index:
+            name_index = getattr(self._lookup, "name_index", None)
+            if name_index is not None:
+                self._index = name_index()
+            else:
+                from name_index import NameIndex
+                self._index = NameIndex(self._lookup)
+        return self._index
+
 
     ### Public methods ###
 
@@ -52,31 +71,26 @@ class ScaleManager(object):
         name as returned by `get_model`.
         Returns None if none are found.
 
+        Names are matched ignoring case, and a name
+        that matches nothing exactly matches every
+        name it is a prefix of. They are resolved to
+        USB ids through `index` before the bus is
+        enumerated, so devices are filtered by id.
+
         """
-        devices = self._usb.find(find_all=True)
-
-        # Returns none if no devices are available.
-        if not devices:
-            return None
-
-        # If no arguments are passed, returns the first
-        # device with " Scale" in its model name.
-        # Returns None if none are found.
-        if not manufacturer and not model:
-            for device in devices:
-                if " Scale" in self.get_model(device):
-                    return device
-            return None
-
-        # Finds the device closest matching the passed-in values...
-        for device in devices:
-            if (not manufacturer or manufacturer == self.get_manufacturer(device))\
-            and (not model or model == self.get_model(device)):
-                return device
-
-        # ...and returns None if none are found.
+        for device in self._matches(manufacturer, model):
+            return device
         return None
 
+    def find_all(self, manufacturer=None, model=None):
+        """
+        Like `find`, but returns a list of every matching device,
+        in bus order. The bus is only enumerated once.
+
+        """
+        return list(self._matches(manufacturer, model))
+
+
     def get_manufacturer(self, device):
         """
         Looks up the device's idVendor property in the `lookup`
@@ -114,3 +128,42 @@ class ScaleManager(object):
         return "<idProduct:%s>" % device.idProduct
 
 
+    def matches(self, device, manufacturer=None, model=None):
+        """
+        Returns True if `device` would be found by `find` when given
+        the same arguments.
+
+        """
+        pairs, vendors = self.index.candidates(manufacturer, model)
+        return (device.idVendor, device.idProduct) in pairs \
+        or device.idVendor in vendors
+
+
+    ### Private methods ###
+
+    def _matches(self, manufacturer, model):
+        pairs, vendors = self.index.candidates(manufacturer, model)
+
+        # Nothing by those names, so nothing to enumerate.
+        if not pairs and not vendors:
+            return
+
+        # A single candidate can be handed to `find` as plain ids.
+        # Otherwise, a single pass compares ids against the candidates.
+        if len(pairs) + len(vendors) == 1:
+            if pairs:
+                (vendor_id, product_id), = pairs
+                devices = self._usb.find(
+                    find_all=True, idVendor=vendor_id, idProduct=product_id
+                )
+            else:
+                vendor_id, = vendors
+                devices = self._usb.find(find_all=True, idVendor=vendor_id)
+        else:
+            devices = self._usb.find(find_all=True, custom_match=lambda device:
+                (device.idVendor, device.idProduct) in pairs
+                or device.idVendor in vendors
+            )
+
+        for device in devices or []:
+            yield device
@@ -0,0 +1,79 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# vim: set fileencoding=utf-8 :
+from threading import Event
+from readings import monotonic
+
+class PollScheduler(object):
+    """Decides how long an AcquisitionEngine waits between reads."""
+
+    def __init__(self, backoff=0.05, max_interval=1.0, factor=2,
+            active_period=10, clock=monotonic):
+        """
+        Reads follow each other back to back, at the scale's own rate, for
+        as long as the weight keeps changing or clients are active. Once
+        it stops changing with no client around, the engine waits
+        `backoff` seconds between reads, then `factor` times longer after
+        every unchanged reading, up to `max_interval` seconds.
+
+        `touch` marks a client as active for the next `active_period`
+        seconds and cuts the current wait short.
+
+        """
+        self._backoff = backoff
+        self._max_interval = max_interval
+        self._factor = factor
+        self._active_period = active_period
+        self._clock = clock
+        self._interval = 0
+        self._active_until = None
+        self._woken = Event()
+
+
+    ### Read-only public properties ###
+
+    @property
+    def interval(self):
+        """How many seconds `wait` will wait for."""
+        return self._interval
+
+    @property
+    def active(self):
+        """Whether a client has touched the scheduler recently."""
+        return self._active_until is not None \
+                and self._clock() < self._active_until
+
+
+    ### Public methods ###
+
+    def update(self, changed):
+        """
+        Adjusts the interval after a reading, `changed` saying whether it
+        differed from the previous one or was in motion. Returns the new
+        interval.
+
+        """
+        if changed or self.active:
+            self._interval = 0
+        elif not self._interval:
+            self._interval = self._backoff
+        else:
+            self._interval = min(self._interval * self._factor,
+                    self._max_interval)
+        return self._interval
+
+    def wait(self):
+        """Waits out the interval unless `wake` or `touch` is called."""
+        if self._interval:
+            self._woken.wait(self._interval)
+        self._woken.clear()
+
+    def wake(self):
+        """Ends the current wait and polls at full rate until told otherwise."""
+        self._interval = 0
+        self._woken.set()
+
+    def touch(self):
+        """Records client activity and wakes the engine."""
+        self._active_until = self._clock() + self._active_period
+        self.wake()
@@ -0,0 +1,130 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# vim: set fileencoding=utf-8 :
+from transfers import ETIMEDOUT
+
+DISCONNECTED = "disconnected"
+CONNECTING = "connecting"
+CONNECTED = "connected"
+ERROR = "error"
+
+class ScaleSession(object):
+    """Keeps a Scale claimed across many readings."""
+
+    def __init__(self, scale_factory, on_status=None):
+        """
+        `scale_factory` should be a callable taking no arguments and
+        returning a connected Scale object, or None if no scale is
+        available. It is called whenever the session needs to (re)connect.
+
+        `on_status` is an optional callable taking a state string and a
+        message string. It is called on every state transition, which makes
+        it a good place to hook up status reporting.
+
+        The session starts out disconnected. It connects lazily on the
+        first `read` or `weigh` (or an explicit `open`) and stays connected
+        until a USB call raises, at which point the scale is released and
+        the next call starts over with a fresh scale from `scale_factory`.
+        Reads that time out are raised without releasing the scale: a scale
+        with nothing to report stays quiet, and resetting it would not help.
+
+        """
+        self._factory = scale_factory
+        self._on_status = on_status
+        self._scale = None
+        self._state = DISCONNECTED
+
+
+    ### Read-only public properties ###
+
+    @property
+    def state(self):
+        return self._state
+
+    @property
+    def scale(self):
+        return self._scale
+
+    @property
+    def connected(self):
+        return self._scale is not None
+
+
+    ### Public methods ###
+
+    def open(self):
+        """
+        Returns the claimed Scale, connecting to a new one first if needed.
+        Returns None if `scale_factory` found no scale.
+
+        """
+        if self._scale:
+            return self._scale
+
+        self._set_state(CONNECTING)
+
+        try:
+            scale = self._factory()
+        except Exception as e:
+            self._set_state(ERROR, str(e))
+            raise
+
+        if not scale or not scale.device:
+            self._set_state(DISCONNECTED, "Scale not found")
+            return None
+
+        self._scale = scale
+        self._set_state(CONNECTED, "Connected to " + scale.name)
+        return scale
+
+    def close(self, state=DISCONNECTED, message=None):
+        """Releases the claimed Scale, if any."""
+        scale, self._scale = self._scale, None
+
+        if scale:
+            try:
+                scale.disconnect()
+            except Exception:
+                pass # The device is most likely gone already.
+
+        self._set_state(state, message)
+
+    def read(self, *args, **kwargs):
+        """Calls `read` on the claimed Scale. See `Scale.read`."""
+        return self._call("read", *args, **kwargs)
+
+    def read_latest(self, *args, **kwargs):
+        """Calls `read_latest` on the claimed Scale. See `Scale.read_latest`."""
+        return self._call("read_latest", *args, **kwargs)
+
+    def weigh(self, *args, **kwargs):
+        """Calls `weigh` on the claimed Scale. See `Scale.weigh`."""
+        return self._call("weigh", *args, **kwargs)
+
+
+    ### Private methods ###
+
+    def _call(self, method, *args, **kwargs):
+        scale = self.open()
+
+        if not scale:
+            return None
+
+        try:
+            return getattr(scale, method)(*args, **kwargs)
+        except Exception as e:
+            if getattr(e, "errno", None) != ETIMEDOUT:
+                self.close(ERROR, str(e))
+            raise
+
+    def _set_state(self, state, message=None):
+        self._state = state
+        if self._on_status:
+            self._on_status(state, message)
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.close()
@@ -0,0 +1,502 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# vim: set fileencoding=utf-8 :
+"""
+Shares the scales of one process with the other processes of the host.
+
+One process wins an OwnerLock and runs the scale workers. It publishes
+each worker's ScaleSnapshot into a SharedSnapshots file, normally under
+/dev/shm so it never reaches the disk. Every other process maps the same
+file and reads snapshots straight from memory, without touching USB.
+
+Each slot of the file is guarded by a seqlock. Its version number is odd
+while the owner writes the slot, so a reader retries until it reads the
+same even version before and after the slot's fields. Readers take no
+lock and never block the owner.
+
+Other processes can only ask for a tare, for the tare to be cleared or
+for fresher readings. They do so by bumping request fields that the
+owner's SharedPublisher polls.
+
+"""
+import mmap
+import os
+import struct
+import time
+from threading import Event, Lock, Thread
+from readings import monotonic
+from registry import ScaleSnapshot
+from reports import DataReport, DATA_REPORT, STATUSES, WEIGHT_UNITS
+from session import DISCONNECTED, CONNECTING, CONNECTED, ERROR
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+MAGIC = b"HWSSHM2\0"
+
+# Magic, slot count, owner's process id and the owner's last heartbeat.
+HEADER = struct.Struct("<8sIIQd")
+
+# Seqlock version, device id, reading seq, seq of the reading the weight
+# last changed at, reading timestamp, report weight, tare, report status
+# and unit codes and session state code.
+SLOT = struct.Struct("<Q16sQQdddBBBx")
+VERSION = struct.Struct("<Q")
+
+# Tare and clear-tare request counts, and when a reader last asked for
+# fresher readings. Written by any process, outside the seqlock.
+REQUESTS = struct.Struct("<QQd")
+
+SLOT_SIZE = SLOT.size + REQUESTS.size
+
+_STATES = (None, DISCONNECTED, CONNECTING, CONNECTED, ERROR)
+_STATE_CODES = dict((state, code) for code, state in enumerate(_STATES))
+_STATUS_CODES = dict((name, code) for code, name in STATUSES.items())
+_UNIT_CODES = dict((name, code) for code, name in WEIGHT_UNITS.items())
+
+_NAN = float("nan")
+
+_make = tuple.__new__
+
+# A reader spins this many times on a slot being written, then yields the
+# processor between attempts, and gives up after _READ_TIMEOUT seconds; a
+# writer preempted halfway through a write can hold the slot for a while.
+_SPINS = 100
+_READ_TIMEOUT = 1.0
+
+class SharedError(Exception):
+    pass
+
+def _key(id):
+    # Device ids are stored as ASCII bytes.
+    return id if isinstance(id, bytes) else id.encode("ascii")
+
+class OwnerLock(object):
+    """An exclusive lock held by at most one process of the host."""
+
+    def __init__(self, path):
+        """
+        Locks `path`, created if need be, with `flock`. The kernel drops
+        the lock when the holding process exits, however it exits, so
+        another process can take over.
+
+        Without `fcntl` (i.e. on Windows), the lock is always acquired.
+
+        """
+        self._path = path
+        self._fd = None
+
+
+    ### Read-only public properties ###
+
+    @property
+    def held(self):
+        return self._fd is not None
+
+
+    ### Public methods ###
+
+    def acquire(self):
+        """Takes the lock if it is free. Returns whether it is held."""
+        if self._fd is not None or fcntl is None:
+            self._fd = self._fd if fcntl else -1
+            return True
+
+        fd = os.open(self._path, os.O_RDWR | os.O_CREAT, 0o666)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except (IOError, OSError):
+            os.close(fd)
+            return False
+
+        self._fd = fd
+        return True
+
+    def release(self):
+        if self._fd is not None and self._fd >= 0:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+        self._fd = None
+
+class SharedSnapshots(object):
+    """Fixed slots of scale snapshots in a memory-mapped file."""
+
+    def __init__(self, path, slots=8, reset=False, stale_after=None):
+        """
+        Maps `path`, creating it with room for `slots` scales if it does
+        not exist yet. Processes mapping the same path share the slots.
+
+        A file of another layout or slot count raises SharedError, unless
+        `reset` is True, in which case it is made over into `slots` empty
+        slots. Only the owner, holding the OwnerLock, may reset the file.
+
+        If `stale_after` is given, snapshots are not read once the owner's
+        heartbeat is older than `stale_after` seconds: an owner that hangs
+        holding the OwnerLock would otherwise be taken to keep weighing
+        the same weight forever.
+
+        """
+        size = HEADER.size + slots * SLOT_SIZE
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o666)
+        try:
+            if os.fstat(fd).st_size < size:
+                os.ftruncate(fd, size)
+            self._map = mmap.mmap(fd, size)
+        finally:
+            os.close(fd)
+
+        magic, count = HEADER.unpack_from(self._map, 0)[:2]
+        if magic == b"\0" * len(magic):
+            HEADER.pack_into(self._map, 0, MAGIC, slots, SLOT_SIZE, 0, 0)
+        elif magic != MAGIC or count != slots:
+            if not reset:
+                self._map.close()
+                raise SharedError("%s is not a %d-slot scale file" % (path, slots))
+            HEADER.pack_into(self._map, 0, MAGIC, slots, SLOT_SIZE, 0, 0)
+            self._map[HEADER.size:size] = b"\0" * (size - HEADER.size)
+
+        self._path = path
+        self._slots = slots
+        self._stale_after = stale_after
+        self._ids = {}
+        self._allocating = Lock()
+
+
+    ### Read-only public properties ###
+
+    @property
+    def path(self):
+        return self._path
+
+    @property
+    def owner(self):
+        """The process id of the owner, or 0 before it took over."""
+        return HEADER.unpack_from(self._map, 0)[3]
+
+    @property
+    def heartbeat(self):
+        """When the owner last called `beat`, as a wall-clock timestamp."""
+        return HEADER.unpack_from(self._map, 0)[4]
+
+    @property
+    def stale(self):
+        """Whether the owner's heartbeat is older than `stale_after`."""
+        return self._stale_after is not None and \
+                time.time() - self.heartbeat > self._stale_after
+
+
+    ### Public methods ###
+
+    def claim(self):
+        """Makes this process the owner. Call it holding the OwnerLock."""
+        HEADER.pack_into(self._map, 0, MAGIC, self._slots, SLOT_SIZE,
+                os.getpid(), time.time())
+        for index in range(self._slots):
+            self._write(index, b"", None)
+        self._ids = {}
+
+    def beat(self):
+        """Records that the owner is alive."""
+        HEADER.pack_into(self._map, 0, MAGIC, self._slots, SLOT_SIZE,
+                os.getpid(), time.time())
+
+    def publish(self, id, snapshot):
+        """
+        Writes `snapshot`, a ScaleSnapshot, into the slot of scale `id`,
+        taking a free slot the first time. Only the owner may publish,
+        and only one thread at a time per scale.
+
+        """
+        index = self._ids.get(id)
+        if index is None:
+            index = self._allocate(id)
+        self._write(index, id, snapshot)
+
+    def remove(self, id):
+        """Frees the slot of scale `id`, if it has one."""
+        with self._allocating:
+            index = self._ids.pop(id, None)
+        if index is not None:
+            self._write(index, b"", None)
+
+    def get(self, id=None):
+        """
+        Returns the ScaleSnapshot of scale `id`, or of the scale in the
+        first used slot if `id` is None, or None if there is no such
+        scale, or if the snapshots are stale. Its report's `raw` field is
+        always None.
+
+        """
+        if self.stale:
+            return None
+        fields = self._find(id)
+        if fields is None:
+            return None
+        return self._snapshot(fields)
+
+    def ids(self):
+        """Returns the ids of the scales published, in slot order."""
+        ids = []
+        for index in range(self._slots):
+            slot_id = self._read(index)[1].rstrip(b"\0").decode("ascii")
+            if slot_id:
+                ids.append(slot_id)
+        return ids
+
+    def wait_for_change(self, id=None, seq=0, timeout=None, interval=0.01):
+        """
+        Like ReadingBuffer.wait_for_change, but polls the slot of scale
+        `id` every `interval` seconds and returns a ScaleSnapshot, or None
+        if `timeout` seconds pass first. Only the newest reading is
+        shared, along with the seq of the reading its report first
+        appeared at, so the report changed since reading `seq` if that
+        seq is newer.
+
+        """
+        fields = self._find(id)
+        if fields is not None and seq > fields[2]:
+            seq = 0
+
+        return self._poll(id, lambda fields: fields[3] > seq,
+                timeout, interval)
+
+    def wait_since(self, id=None, seq=0, timeout=None, interval=0.01):
+        """
+        Polls the slot of scale `id` every `interval` seconds until it
+        holds a reading newer than `seq`, and returns its ScaleSnapshot,
+        or None if `timeout` seconds pass first. Readings overwritten in
+        between polls are missed.
+
+        """
+        return self._poll(id, lambda fields: fields[2] > seq,
+                timeout, interval)
+
+    def owned(self):
+        """Returns the ids of the scales this process publishes."""
+        with self._allocating:
+            return list(self._ids)
+
+    def request_tare(self, id=None):
+        """
+        Asks the owner to tare scale `id`, or the scale in the first used
+        slot if None. Returns whether there is such a scale.
+
+        """
+        return self._request(id, 0)
+
+    def request_clear_tare(self, id=None):
+        """Asks the owner to clear the tare of scale `id`, see `request_tare`."""
+        return self._request(id, 1)
+
+    def wake(self, id=None):
+        """
+        Asks the owner to read scale `id` at full rate for a while, see
+        `request_tare`.
+
+        """
+        return self._request(id, 2)
+
+    def requests(self, id):
+        """
+        Returns the counts of tare and clear-tare requests and the time of
+        the latest wake request for scale `id`, or None.
+
+        """
+        index = self._ids.get(id)
+        if index is None:
+            return None
+        return REQUESTS.unpack_from(self._map, self._offset(index) + SLOT.size)
+
+    def close(self):
+        self._map.close()
+
+
+    ### Private methods ###
+
+    def _offset(self, index):
+        return HEADER.size + index * SLOT_SIZE
+
+    def _allocate(self, id):
+        with self._allocating:
+            used = set(self._ids.values())
+            for index in range(self._slots):
+                if index not in used:
+                    self._ids[id] = index
+                    REQUESTS.pack_into(self._map,
+                            self._offset(index) + SLOT.size, 0, 0, 0)
+                    return index
+        raise SharedError("No free slot for scale %s" % id)
+
+    def _find(self, id):
+        # Returns the fields of the slot of scale `id`, or of the first
+        # used slot if None.
+        key = None if id is None else _key(id)
+        for index in range(self._slots):
+            fields = self._read(index)
+            slot_id = fields[1].rstrip(b"\0")
+            if slot_id and (key is None or slot_id == key):
+                return fields
+        return None
+
+    def _write(self, index, id, snapshot):
+        offset = self._offset(index)
+        # Only the owner writes, so the slot can be read without retrying.
+        previous = SLOT.unpack_from(self._map, offset)
+        version = previous[0]
+        if version % 2:
+            version += 1 # A previous owner died while writing.
+
+        if snapshot is None:
+            fields = (0, 0, _NAN, _NAN, 0, 0, 0, 0)
+        else:
+            report = snapshot.report
+            weight = _NAN if report is None else report.weight
+            status = 0 if report is None else _STATUS_CODES.get(report.status, 0)
+            unit = 0 if report is None else _UNIT_CODES.get(report.unit, 0)
+
+            # The seq the report changed at carries over while the same
+            # scale keeps sending the same report.
+            changed = previous[3]
+            if previous[1].rstrip(b"\0") != _key(id) or snapshot.seq < changed \
+                    or (previous[5], previous[7], previous[8]) != \
+                        (weight, status, unit):
+                changed = snapshot.seq
+
+            fields = (
+                snapshot.seq,
+                changed,
+                _NAN if snapshot.timestamp is None else snapshot.timestamp,
+                weight,
+                snapshot.tare,
+                status,
+                unit,
+                _STATE_CODES.get(snapshot.status, 0),
+            )
+
+        VERSION.pack_into(self._map, offset, version + 1)
+        SLOT.pack_into(self._map, offset, version + 1, _key(id), *fields)
+        VERSION.pack_into(self._map, offset, version + 2)
+
+    def _read(self, index):
+        offset = self._offset(index)
+        attempts = 0
+        while True:
+            fields = SLOT.unpack_from(self._map, offset)
+            if not fields[0] % 2 and \
+                    VERSION.unpack_from(self._map, offset)[0] == fields[0]:
+                return fields
+            attempts += 1
+            if attempts == _SPINS:
+                deadline = monotonic() + _READ_TIMEOUT
+            elif attempts > _SPINS:
+                if monotonic() >= deadline:
+                    break
+                time.sleep(0)
+        # The owner died halfway through a write; the next owner's claim
+        # clears the slot.
+        raise SharedError("Slot %d of %s is being written" % (index, self._path))
+
+    def _snapshot(self, fields):
+        # Builds the namedtuples without going through their __new__, and
+        # tells NaN apart by it not being equal to itself; this is the
+        # bulk of a read.
+        (version, id, seq, changed, timestamp, weight, tare, status, unit,
+                state) = fields
+        report = None
+        if weight == weight:
+            report = _make(DataReport, (DATA_REPORT, None,
+                    STATUSES.get(status), WEIGHT_UNITS.get(unit), weight))
+        return _make(ScaleSnapshot, (report, tare, _STATES[state], seq,
+                timestamp if timestamp == timestamp else None))
+
+    def _poll(self, id, condition, timeout, interval):
+        if timeout is not None:
+            deadline = monotonic() + timeout
+
+        while True:
+            fields = None if self.stale else self._find(id)
+            # Slots without a report hold a NaN weight.
+            if fields is not None and fields[5] == fields[5] \
+                    and condition(fields):
+                return self._snapshot(fields)
+            if timeout is not None and monotonic() >= deadline:
+                return None
+            time.sleep(interval)
+
+    def _request(self, id, field):
+        key = None if id is None else _key(id)
+        for index in range(self._slots):
+            slot_id = self._read(index)[1].rstrip(b"\0")
+            if not slot_id or key is not None and slot_id != key:
+                continue
+            offset = self._offset(index) + SLOT.size
+            requests = list(REQUESTS.unpack_from(self._map, offset))
+            if field == 2:
+                requests[2] = time.time()
+            else:
+                requests[field] += 1
+            REQUESTS.pack_into(self._map, offset, *requests)
+            return True
+        return False
+
+class SharedPublisher(Thread):
+    """Serves the requests other processes leave for the owner's scales."""
+
+    def __init__(self, registry, shared, interval=0.05):
+        """
+        Every `interval` seconds, records a heartbeat in `shared`, a
+        SharedSnapshots claimed by this process, and applies the tare,
+        clear-tare and wake requests left for the workers of `registry`.
+
+        Snapshots themselves are published by the workers as they change;
+        see ScaleWorker's `on_publish` argument.
+
+        """
+        Thread.__init__(self, name="scale-shared")
+        self.daemon = True
+        self._registry = registry
+        self._shared = shared
+        self._interval = interval
+        self._seen = {}
+        self._stop_event = Event()
+
+
+    ### Public methods ###
+
+    def poll(self):
+        """Applies the requests left since the last call."""
+        self._shared.beat()
+
+        # A worker still stopping may publish once more after its scale
+        # was removed.
+        ids = self._registry.ids()
+        for id in self._shared.owned():
+            if id not in ids:
+                self._shared.remove(id)
+                self._seen.pop(id, None)
+
+        for id in ids:
+            worker = self._registry.get(id)
+            requests = self._shared.requests(id)
+            if worker is None or requests is None:
+                continue
+
+            tares, clears, woken = requests
+            seen_tares, seen_clears, seen_woken = self._seen.get(id, (0, 0, 0))
+            if tares != seen_tares:
+                worker.set_tare()
+            if clears != seen_clears:
+                worker.clear_tare()
+            if woken != seen_woken:
+                worker.wake()
+            self._seen[id] = requests
+
+    def run(self):
+        while not self._stop_event.is_set():
+            self.poll()
+            self._stop_event.wait(self._interval)
+
+    def stop(self):
+        self._stop_event.set()
@@ -0,0 +1,178 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# vim: set fileencoding=utf-8 :
+from collections import deque
+from reports import STATUSES, DATA_REPORT, ZERO_WEIGHT, IN_MOTION, \
+        STABLE_WEIGHT
+
+# Statuses the filter may overrule; faults and limits are passed through.
+_MOTION_STATUSES = frozenset(
+    STATUSES[code] for code in (ZERO_WEIGHT, IN_MOTION, STABLE_WEIGHT)
+)
+
+class StabilityFilter(object):
+    """Decides whether a scale's weight has settled from its recent readings."""
+
+    def __init__(self, window=5, tolerance=1, max_deviation=None):
+        """
+        Keeps the last `window` data reports' raw weights, in counts of
+        the scale's smallest increment. The weight is stable once all of
+        them lie within `tolerance` counts of each other and, if
+        `max_deviation` is given, their standard deviation is at most
+        that many counts.
+
+        Each reading is taken into account in constant time: the window's
+        minimum and maximum are tracked with monotonic queues and its
+        variance with running sums.
+
+        """
+        if window < 1:
+            raise ValueError("window must hold at least one reading")
+
+        self._window = window
+        self._tolerance = tolerance
+        self._max_variance = \
+                max_deviation ** 2 if max_deviation is not None else None
+        self.reset()
+
+
+    ### Read-only public properties ###
+
+    @property
+    def window(self):
+        return self._window
+
+    @property
+    def tolerance(self):
+        return self._tolerance
+
+    @property
+    def stable(self):
+        """Whether the last `window` readings have settled."""
+        if len(self._values) < self._window:
+            return False
+
+        if self.spread > self._tolerance:
+            return False
+
+        return self._max_variance is None or self.variance <= self._max_variance
+
+    @property
+    def spread(self):
+        """The difference between the window's largest and smallest weight."""
+        if not self._values:
+            return 0
+        return self._maxima[0][1] - self._minima[0][1]
+
+    @property
+    def mean(self):
+        """The window's mean weight, in counts."""
+        if not self._values:
+            return 0.0
+        return self._sum / float(len(self._values))
+
+    @property
+    def variance(self):
+        """The window's variance, in counts squared."""
+        count = len(self._values)
+        if not count:
+            return 0.0
+        # Exact in integers until the final division.
+        return (count * self._squares - self._sum ** 2) / float(count ** 2)
+
+
+    ### Public methods ###
+
+    def reset(self):
+        """Forgets every reading, e.g. after the scale reconnects."""
+        self._values = deque()
+        self._minima = deque()
+        self._maxima = deque()
+        self._sum = 0
+        self._squares = 0
+        self._count = 0
+        self._scale = None
+
+    def update(self, report):
+        """
+        Adds a data report's weight to the window and returns whether the
+        weight is now stable. Other reports are ignored.
+
+        """
+        if report is None or report.type != DATA_REPORT:
+            return self.stable
+
+        data = report.raw
+
+        # Counts in another unit or resolution do not compare.
+        scale = (data[2], data[3])
+        if scale != self._scale:
+            self.reset()
+            self._scale = scale
+
+        self._push(data[4] + (data[5] << 8))
+        return self.stable
+
+    def filter(self, report):
+        """
+        Returns `report` with its status replaced by what the window says:
+        stable (or stable at zero) as soon as it settles, even if the
+        scale still reports motion, and in motion until it settles, even
+        if the scale already reports a stable weight.
+
+        Reports other than data reports, and data reports with statuses
+        like "Under Zero" or "Over Weight Limit", are returned unchanged.
+
+        """
+        if report is None or report.type != DATA_REPORT:
+            return report
+
+        stable = self.update(report)
+
+        if report.status not in _MOTION_STATUSES:
+            return report
+
+        if not stable:
+            status = STATUSES[IN_MOTION]
+        elif report.weight == 0:
+            status = STATUSES[ZERO_WEIGHT]
+        else:
+            status = STATUSES[STABLE_WEIGHT]
+
+        if status == report.status:
+            return report
+
+        return report._replace(status=status)
+
+
+    ### Private methods ###
+
+    def _push(self, value):
+        self._count += 1
+        index = self._count
+        oldest = index - self._window
+
+        self._values.append(value)
+        self._sum += value
+        self._squares += value * value
+
+        if len(self._values) > self._window:
+            expired = self._values.popleft()
+            self._sum -= expired
+            self._squares -= expired * expired
+
+        # Each queue holds the readings that may still become the window's
+        # extreme, in order; every reading is added and removed once.
+        minima = self._minima
+        while minima and minima[-1][1] >= value:
+            minima.pop()
+        minima.append((index, value))
+        if minima[0][0] <= oldest:
+            minima.popleft()
+
+        maxima = self._maxima
+        while maxima and maxima[-1][1] <= value:
+            maxima.pop()
+        maxima.append((index, value))
+        if maxima[0][0] <= oldest:
+            maxima.popleft()
@@ -0,0 +1,128 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# vim: set fileencoding=utf-8 :
+import time
+from collections import OrderedDict
+from threading import Lock
+
+class StatusEntry(object):
+    """One distinct status message, and how often and when it was seen."""
+
+    __slots__ = ("status", "message", "count", "first_seen", "last_seen")
+
+    def __init__(self, status, message, timestamp):
+        self.status = status
+        self.message = message
+        self.count = 1
+        self.first_seen = timestamp
+        self.last_seen = timestamp
+
+    def as_dict(self):
+        return {
+            "status": self.status,
+            "message": self.message,
+            "count": self.count,
+            "first_seen": self.first_seen,
+            "last_seen": self.last_seen,
+        }
+
+class StatusHistory(object):
+    """A driver's current status and a bounded log of its status messages."""
+
+    def __init__(self, status=None, size=50, clock=time.time):
+        """
+        Starts out in `status`. Keeps at most `size` distinct (status,
+        message) pairs, forgetting the least recently seen first, so a
+        flapping error takes up one entry however often it recurs.
+
+        `clock` returns the wall-clock timestamps entries are stamped with.
+
+        """
+        self._status = status
+        self._since = clock()
+        self._size = size
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+
+    ### Read-only public properties ###
+
+    @property
+    def status(self):
+        return self._status
+
+    @property
+    def since(self):
+        """When the current status was entered."""
+        return self._since
+
+
+    ### Public methods ###
+
+    def record(self, status, message=None):
+        """Sets the current status and logs `message`, if any, under it."""
+        now = self._clock()
+
+        with self._lock:
+            if status != self._status:
+                self._status = status
+                self._since = now
+
+            if message is None:
+                return
+
+            key = (status, message)
+            entry = self._entries.pop(key, None)
+            if entry:
+                entry.count += 1
+                entry.last_seen = now
+            else:
+                entry = StatusEntry(status, message, now)
+                if len(self._entries) >= self._size:
+                    self._entries.popitem(last=False)
+
+            # Most recently seen last.
+            self._entries[key] = entry
+
+    def messages(self, limit=None):
+        """
+        Returns the distinct messages seen under the current status since
+        it was entered, least recently seen first, at most the `limit`
+        most recent ones.
+
+        """
+        with self._lock:
+            return self._messages(limit)
+
+    def entries(self):
+        """Returns every entry as a dictionary, least recently seen first."""
+        with self._lock:
+            return [entry.as_dict() for entry in self._entries.values()]
+
+    def snapshot(self, limit=5):
+        """
+        Returns the current status and at most `limit` of its most recent
+        messages, in the format the hw_proxy status page shows.
+
+        """
+        with self._lock:
+            return {
+                "status": self._status,
+                "messages": self._messages(limit),
+            }
+
+    def __len__(self):
+        return len(self._entries)
+
+
+    ### Private methods ###
+
+    def _messages(self, limit):
+        messages = [
+            entry.message for entry in self._entries.values()
+            if entry.status == self._status and entry.last_seen >= self._since
+        ]
+        if limit is not None:
+            messages = messages[-limit:] if limit else []
+        return messages
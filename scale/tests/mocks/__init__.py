@@ -1,2 +1,4 @@
 from . import usb_ids
 from . import usb_lib
+from . import replay
+from . import libusb1
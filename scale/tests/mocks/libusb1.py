@@ -0,0 +1,153 @@
+import time
+from collections import deque
+
+class MockLibUSB1(object):
+    """
+    Simulates the parts of python-libusb1's `usb1` module TransferQueue
+    uses, for a single device at `bus` and `address`.
+
+    Each item of `reports`, a list the test may keep appending to, is what
+    the next transfer to complete receives: a sequence of bytes, or one of
+    the TRANSFER_* statuses for a transfer that fails.
+
+    """
+
+    TRANSFER_COMPLETED = 0
+    TRANSFER_ERROR = 1
+    TRANSFER_TIMED_OUT = 2
+    TRANSFER_CANCELLED = 3
+    TRANSFER_STALL = 4
+    TRANSFER_NO_DEVICE = 5
+    TRANSFER_OVERFLOW = 6
+
+    def __init__(self, reports=None, bus=1, address=1):
+        self.reports = reports if reports is not None else []
+        self.bus = bus
+        self.address = address
+        self.pending = deque()
+        self.transfers = []
+        self.claimed = False
+        self.closed = False
+
+    def USBContext(self):
+        return MockUSBContext(self)
+
+class MockUSBContext(object):
+    """Simulates usb1.USBContext, completing transfers as events are handled."""
+
+    def __init__(self, lib):
+        self._lib = lib
+
+    def getDeviceList(self, skip_on_error=False):
+        return [MockUSBDevice(self._lib)]
+
+    def handleEventsTimeout(self, tv=0):
+        lib = self._lib
+        handled = False
+
+        while lib.pending:
+            transfer = lib.pending[0]
+            if transfer.cancelled:
+                status, data = lib.TRANSFER_CANCELLED, ()
+            elif lib.reports:
+                item = lib.reports.pop(0)
+                if isinstance(item, int):
+                    status, data = item, ()
+                else:
+                    status, data = lib.TRANSFER_COMPLETED, item
+            else:
+                break
+
+            lib.pending.popleft()
+            transfer.complete(status, data)
+            handled = True
+
+        if not handled:
+            time.sleep(min(tv, 0.01))
+
+    def close(self):
+        self._lib.closed = True
+
+class MockUSBDevice(object):
+    """Simulates usb1.USBDevice."""
+
+    def __init__(self, lib):
+        self._lib = lib
+
+    def getBusNumber(self):
+        return self._lib.bus
+
+    def getDeviceAddress(self):
+        return self._lib.address
+
+    def open(self):
+        return MockUSBDeviceHandle(self._lib)
+
+class MockUSBDeviceHandle(object):
+    """Simulates usb1.USBDeviceHandle."""
+
+    def __init__(self, lib):
+        self._lib = lib
+
+    def claimInterface(self, interface):
+        self._lib.claimed = True
+
+    def releaseInterface(self, interface):
+        self._lib.claimed = False
+
+    def getTransfer(self):
+        transfer = MockUSBTransfer(self._lib)
+        self._lib.transfers.append(transfer)
+        return transfer
+
+    def close(self):
+        pass
+
+class MockUSBTransfer(object):
+    """Simulates usb1.USBTransfer."""
+
+    def __init__(self, lib):
+        self._lib = lib
+        self.submitted = False
+        self.cancelled = False
+        self.submissions = 0
+        self._status = None
+        self._length = 0
+
+    def setInterrupt(self, endpoint, buffer_or_len, callback=None,
+            timeout=0):
+        self.endpoint = endpoint
+        self._buffer = bytearray(buffer_or_len)
+        self._callback = callback
+
+    def getBuffer(self):
+        return self._buffer
+
+    def getActualLength(self):
+        return self._length
+
+    def getStatus(self):
+        return self._status
+
+    def isSubmitted(self):
+        return self.submitted
+
+    def submit(self):
+        if self.submitted:
+            raise ValueError("Transfer already submitted")
+        self.submitted = True
+        self.cancelled = False
+        self.submissions += 1
+        self._lib.pending.append(self)
+
+    def cancel(self):
+        if not self.submitted:
+            raise ValueError("Transfer not submitted")
+        self.cancelled = True
+
+    def complete(self, status, data):
+        self.submitted = False
+        self._status = status
+        self._length = len(data)
+        self._buffer[:len(data)] = bytearray(data)
+        self._callback(self)
@@ -0,0 +1,140 @@
+import math
+import time
+import usb.core
+from array import array
+from capture import CaptureReader
+from readings import monotonic
+from reports import DATA_REPORT, STATUS_REPORT, ZERO_WEIGHT, IN_MOTION, \
+        STABLE_WEIGHT
+from .usb_ids import FAKE_VDR, SCALE
+from .usb_lib import MockDevice, MockUSBLib
+
+# What a scale sends in between data reports.
+READY = (STATUS_REPORT, 4)
+
+def data_report(weight, status, unit=0x3, exponent=-2):
+    """Returns the raw data report for `weight` in `unit` units."""
+    counts = int(round(weight / 10.0 ** exponent))
+    return (DATA_REPORT, status, unit, exponent & 0xFF,
+            counts & 0xFF, (counts >> 8) & 0xFF)
+
+def waveform(weight=1.94, unit=0x3, exponent=-2, rate=100, empty=0.5,
+        settle=0.5, hold=1.0, frequency=4.0, overshoot=0.2):
+    """
+    Returns a list of (timestamp, data) pairs simulating an item of
+    `weight` being placed on a scale and taken off again: `empty` seconds
+    of zero weight, `settle` seconds of a damped oscillation around
+    `weight` reported as in motion, `hold` seconds of stable weight, and
+    the same oscillation down to zero.
+
+    Data reports come at `rate` per second, each preceded by the two-byte
+    status report the real scale interleaves with them.
+
+    """
+    reports = []
+    interval = 1.0 / rate
+    decay = -math.log(0.01) / settle
+
+    def add(value, status):
+        timestamp = len(reports) // 2 * interval
+        reports.append((timestamp, READY))
+        reports.append((timestamp, data_report(value, status, unit, exponent)))
+
+    def oscillate(start, end):
+        for i in range(int(settle * rate)):
+            t = i * interval
+            swing = (1 + overshoot) * math.exp(-decay * t) \
+                    * math.cos(2 * math.pi * frequency * t)
+            add(max(0, end + (start - end) * swing), IN_MOTION)
+
+    for i in range(int(empty * rate)):
+        add(0, ZERO_WEIGHT)
+    oscillate(0, weight)
+    for i in range(int(hold * rate)):
+        add(weight, STABLE_WEIGHT)
+    oscillate(weight, 0)
+    add(0, ZERO_WEIGHT)
+
+    return reports
+
+def capture_reports(path):
+    """Returns the (timestamp, data) pairs recorded in a capture file."""
+    with CaptureReader(path) as reader:
+        return [(record.timestamp, tuple(record.data)) for record in reader]
+
+class ReplayDevice(MockDevice):
+    """Simulates a scale by playing back recorded or synthetic reports"""
+
+    def __init__(self, idVendor, idProduct, reports, speed=None, loop=True,
+            bus=1, address=1, clock=monotonic, sleep=time.sleep):
+        """
+        `reports` is a sequence of (timestamp, data) pairs, like those
+        `waveform` and `capture_reports` return.
+
+        `speed` paces reads by the reports' timestamps: 1 is real time, 10
+        ten times faster. If None, reports come back as fast as they are
+        read.
+
+        Once out of reports, the device starts over if `loop` is set and
+        raises a timeout error otherwise.
+
+        """
+        MockDevice.__init__(self, idVendor, idProduct, bus, address)
+        self._reports = reports
+        self._speed = speed
+        self._loop = loop
+        self._clock = clock
+        self._sleep = sleep
+        self._position = 0
+        self._offset = 0
+        self._started = None
+        self.reads = 0
+
+        if len(reports) > 1:
+            first, last = reports[0][0], reports[-1][0]
+            self._period = (last - first) * len(reports) / (len(reports) - 1)
+        else:
+            self._period = 0
+
+    def read(self, *args):
+        self._fail("read")
+
+        if self._position == len(self._reports):
+            if not self._loop or not self._reports:
+                raise usb.core.USBError("Operation timed out", errno=110)
+            self._position = 0
+            self._offset += self._period
+
+        timestamp, data = self._reports[self._position]
+        self._position += 1
+        self.reads += 1
+
+        if self._speed:
+            timestamp += self._offset - self._reports[0][0]
+            if self._started is None:
+                self._started = self._clock()
+            delay = self._started + timestamp / self._speed - self._clock()
+            if delay > 0:
+                self._sleep(delay)
+
+        return self._output(array('B', data), *args)
+
+    def rewind(self):
+        """For testing. Starts playback over from the first report."""
+        self._position = 0
+        self._offset = 0
+        self._started = None
+
+def replay_bus(count, reports, speed=None, idVendor=FAKE_VDR, idProduct=SCALE):
+    """
+    Returns a MockUSBLib with `count` ReplayDevices playing back `reports`,
+    spread over as many buses as it takes.
+
+    """
+    return MockUSBLib(devices=[
+        ReplayDevice(
+            idVendor, idProduct, reports, speed,
+            bus=1 + i // 127, address=1 + i % 127
+        )
+        for i in range(count)
+    ])
@@ -1,10 +1,12 @@
 from array import array
 from collections import namedtuple
 from .usb_ids import FAUX_MFR, FAKE_VDR, SCALE, OTHER
+from discovery import ARRIVED, LEFT
 
 MockEndpoint = namedtuple(
-    "MockEndpoint", ["bEndpointAddress", "wMaxPacketSize"]
+    "MockEndpoint", ["bEndpointAddress", "wMaxPacketSize", "bInterval"]
 )
+MockEndpoint.__new__.__defaults__ = (10,) # Milliseconds, as HID scales poll.
 
 class MockCtx(object):
     """Simulates the _ctx property expected by usb.util.dispose_resources""" 
@@ -14,9 +16,12 @@ class MockCtx(object):
 class MockDevice(object):
     """Simulates a device returned by usb.core.find"""
 
-    def __init__(self, idVendor, idProduct):
+    def __init__(self, idVendor, idProduct, bus=1, address=1, packet_size=8):
         self.idVendor = idVendor
         self.idProduct = idProduct
+        self.bus = bus
+        self.address = address
+        self.packet_size = packet_size
     
         # Actual output recorded from a Mettler Toledo PS60.
         self._weights = {
@@ -28,14 +33,18 @@ class MockDevice(object):
         self._weight = "0 lb"
         self._readied = False
         self._ctx = MockCtx()
+        self._failures = {}
+        self.resets = 0
 
     def read(self, *args):
+        self._fail("read")
+
         # Simulate the alternating output of the scale.
         if not self._readied:
             self._readied = True
-            return array('B', [4, 4])
+            return self._output(array('B', [4, 4]), *args)
 
-        return self._weights[self._weight]
+        return self._output(self._weights[self._weight], *args)
 
     def set_weight(self, weight):
         """For testing. Sets the output 'read' should return."""
@@ -45,6 +54,34 @@ class MockDevice(object):
 
         self._weight = weight
 
+    def fail_on(self, method, error=None):
+        """For testing. Makes `method` raise `error` until cleared."""
+
+        if error is None:
+            self._failures.pop(method, None)
+        else:
+            self._failures[method] = error
+
+    def _fail(self, method):
+        if method in self._failures:
+            raise self._failures[method]
+
+    def _output(self, data, endpoint=None, size_or_buffer=None, timeout=None):
+        # Like PyUSB, fills a buffer passed instead of a size and returns
+        # how many bytes it received.
+        if size_or_buffer is None or isinstance(size_or_buffer, int):
+            return data
+        if len(size_or_buffer) > self.packet_size:
+            # A real scale would run reports of a full packet together.
+            raise ValueError("Read of %d bytes spans several %d-byte packets"
+                % (len(size_or_buffer), self.packet_size))
+        size_or_buffer[:len(data)] = data
+        return len(data)
+
+    def __getitem__(self, configuration):
+        """Simulates `device[0][(0,0)][0]`, the default endpoint."""
+        return {(0, 0): [MockEndpoint(0x81, self.packet_size)]}
+
     def is_kernel_driver_active(self, *args):
         return True
 
@@ -52,6 +89,11 @@ class MockDevice(object):
         return True
 
     def set_configuration(self, *args):
+        self._fail("set_configuration")
+        return True
+
+    def reset(self, *args):
+        self.resets += 1
         return True
 
     def attach_kernel_driver(self, *args):
@@ -61,21 +103,73 @@ class MockDevice(object):
 class MockUSBLib(object):
     """Simulates usb.lib.core"""
 
-    def __init__(self):
-        self.devices = [
-            MockDevice(FAUX_MFR, SCALE),
-            MockDevice(FAUX_MFR, OTHER),
-            MockDevice(FAKE_VDR, SCALE),
-            MockDevice(FAKE_VDR, OTHER),
+    def __init__(self, devices=None):
+        if devices is None:
+            devices = [
+                MockDevice(FAUX_MFR, SCALE, address=1),
+                MockDevice(FAUX_MFR, OTHER, address=2),
+                MockDevice(FAKE_VDR, SCALE, address=3),
+                MockDevice(FAKE_VDR, OTHER, address=4),
+            ]
+
+        self.devices = devices
+        self.enumerations = 0
+        self._hotplug_callbacks = []
+        self._failures = {}
+
+    def find(self, find_all=False, custom_match=None, **attributes):
+        self._fail("find")
+        self.enumerations += 1
+
+        matches = [
+            device for device in self.devices
+            if all(getattr(device, key) == value
+                for key, value in attributes.items() if value)
+            and (not custom_match or custom_match(device))
         ]
 
-    def find(self, find_all=False, idVendor=None, idProduct=None):
         if find_all:
-            return self.devices
+            return matches
+
+        return matches[0] if matches else None
+
+    def fail_on(self, method, error=None):
+        """For testing. Makes `method` raise `error` until cleared."""
+
+        if error is None:
+            self._failures.pop(method, None)
+        else:
+            self._failures[method] = error
+
+    def _fail(self, method):
+        if method in self._failures:
+            raise self._failures[method]
+
+    def register_hotplug(self, callback):
+        """For testing. Calls `callback(event, device)` on plug/unplug."""
+        self._hotplug_callbacks.append(callback)
+
+    def plug(self, device):
+        """For testing. Simulates `device` being plugged in."""
+        self.devices.append(device)
+        for callback in self._hotplug_callbacks:
+            callback(ARRIVED, device)
+
+    def unplug(self, device):
+        """For testing. Simulates `device` being unplugged."""
+        self.devices.remove(device)
+        for callback in self._hotplug_callbacks:
+            callback(LEFT, device)
+
+
+class MockHotplug(object):
+    """Simulates LibusbHotplug, relaying MockUSBLib's plug/unplug events"""
+
+    def __init__(self, usb_lib):
+        self._usb = usb_lib
 
-        for device in self.devices:
-            if (not idVendor or device.idVendor == idVendor)\
-            and (not idProduct or device.idProduct == idProduct):
-                return device
+    def register(self, callback):
+        self._usb.register_hotplug(callback)
 
-        return None
+    def run(self, stop):
+        stop.wait()
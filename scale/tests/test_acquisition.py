@@ -0,0 +1,131 @@
+import unittest
+from threading import Thread
+import mocks
+from scale_manager import ScaleManager
+from scale import Scale
+from session import ScaleSession
+from acquisition import AcquisitionEngine
+from stability import StabilityFilter
+from scheduler import PollScheduler
+from reports import WEIGHT_UNITS, STATUSES, IN_MOTION, STABLE_WEIGHT
+
+POUNDS = WEIGHT_UNITS[0xC]
+
+class TestAcquisitionEngine(unittest.TestCase):
+    def setUp(self):
+        self.manager = ScaleManager(
+            lookup=mocks.usb_ids.USB_IDS,
+            usb_lib=mocks.usb_lib.MockUSBLib()
+        )
+        self.session = ScaleSession(
+            lambda: Scale(device_manager=self.manager)
+        )
+        self.engine = AcquisitionEngine(
+            self.session,
+            endpoint=mocks.usb_lib.MockEndpoint(0, 0),
+            retry_delay=0
+        )
+
+    def test_poll_skips_status_reports(self):
+        """Make sure only data reports end up in the buffer."""
+
+        self.assertEqual(self.engine.poll(), None)
+        reading = self.engine.poll()
+        self.assertEqual(reading.seq, 1)
+        self.assertEqual(reading.report.unit, POUNDS)
+        self.assertEqual(self.engine.latest(), reading.report)
+
+    def test_poll_follows_weight(self):
+        """Make sure the newest reading reflects the current weight."""
+
+        self.engine.poll()
+        self.session.scale.device.set_weight("5.10 lb")
+        self.engine.poll()
+        self.assertEqual(self.engine.latest().weight, 5.10)
+
+    def test_poll_latest(self):
+        """Make sure polling for the latest report skips the ones waiting."""
+
+        self.engine.poll()
+        self.engine.poll()
+        self.session.scale.device.set_weight("5.10 lb")
+
+        reading = self.engine.poll(latest=True)
+        self.assertEqual(reading.seq, 2)
+        self.assertEqual(reading.report.weight, 5.10)
+
+    def test_poll_filters_stability(self):
+        """Make sure data reports go through the stability filter."""
+
+        engine = AcquisitionEngine(
+            self.session,
+            endpoint=mocks.usb_lib.MockEndpoint(0, 0),
+            stability=StabilityFilter(window=3)
+        )
+        engine.poll()
+        self.session.scale.device.set_weight("5.10 lb")
+
+        statuses = [engine.poll().report.status for i in range(3)]
+        self.assertEqual(statuses, [
+            STATUSES[IN_MOTION], STATUSES[IN_MOTION], STATUSES[STABLE_WEIGHT]
+        ])
+
+    def test_run_until_stopped(self):
+        """Make sure `run` keeps filling the buffer until stopped."""
+
+        buffer = self.engine.buffer
+        thread = Thread(target=self.engine.run)
+        thread.start()
+        while buffer.seq < 100:
+            pass
+        self.engine.stop()
+        thread.join(1)
+
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(len(buffer), buffer.size)
+
+    def test_run_backs_off_when_idle(self):
+        """Make sure an unchanging weight is read less and less often."""
+
+        scheduler = PollScheduler(backoff=0.01, max_interval=30)
+        engine = AcquisitionEngine(
+            self.session,
+            endpoint=mocks.usb_lib.MockEndpoint(0, 0),
+            scheduler=scheduler
+        )
+        thread = Thread(target=engine.run)
+        thread.start()
+        while scheduler.interval < 1:
+            pass
+
+        # A client wakes the engine out of its long wait.
+        seq = engine.buffer.seq
+        engine.wake()
+        self.assertTrue(engine.buffer.wait_since(seq, 5))
+        self.assertEqual(scheduler.interval, 0)
+
+        engine.stop()
+        thread.join(5)
+        self.assertFalse(thread.is_alive())
+
+    def test_run_reports_errors(self):
+        """Make sure read errors are handed to `on_error` and run goes on."""
+
+        errors = []
+
+        def on_error(error):
+            errors.append(error)
+            self.engine.stop()
+
+        self.engine = AcquisitionEngine(
+            self.session,
+            endpoint=mocks.usb_lib.MockEndpoint(0, 0),
+            retry_delay=0,
+            on_error=on_error
+        )
+        self.session.open().device.fail_on("read", IOError("Gone"))
+        self.engine.run()
+
+        self.assertEqual(len(errors), 1)
+        self.assertIsInstance(errors[0], IOError)
+        self.assertFalse(self.session.connected)
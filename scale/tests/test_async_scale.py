@@ -0,0 +1,134 @@
+import sys
+import threading
+import time
+import unittest
+from array import array
+from reports import decode, STATUSES, IN_MOTION, STABLE_WEIGHT
+
+if sys.version_info >= (3, 5):
+    import asyncio
+    from async_scale import AsyncScale
+else:
+    asyncio = None
+
+READY = decode(array('B', [4, 4]))
+
+def data_report(weight, status=STABLE_WEIGHT):
+    hundredths = int(round(weight * 100))
+    return decode(array('B', [3, status, 3, 254, hundredths & 0xff, hundredths >> 8]))
+
+class FakeScale(object):
+    """Returns the given reports in turn, then raises, counting reads."""
+
+    def __init__(self, reports, delay=0):
+        self.reports = list(reports)
+        self.delay = delay
+        self.reads = 0
+        self.threads = set()
+        self.active = 0
+        self.overlapped = False
+
+    def read(self, endpoint=None, max_attempts=10):
+        self.active += 1
+        self.overlapped = self.overlapped or self.active > 1
+        try:
+            self.reads += 1
+            self.threads.add(threading.current_thread().name)
+            time.sleep(self.delay)
+            if not self.reports:
+                raise IOError("Operation timed out")
+            return self.reports.pop(0)
+        finally:
+            self.active -= 1
+
+@unittest.skipIf(asyncio is None, "asyncio needs Python 3.5")
+class TestAsyncScale(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+
+    def tearDown(self):
+        self.loop.close()
+        asyncio.set_event_loop(None)
+
+    def run_loop(self, coroutine):
+        return self.loop.run_until_complete(coroutine)
+
+    def test_weigh(self):
+        """Make sure weighing skips status reports and moving weights."""
+
+        scale = FakeScale([READY, data_report(1.5, IN_MOTION),
+                data_report(1.94)])
+        report = self.run_loop(AsyncScale(scale).weigh())
+
+        self.assertEqual(report.weight, 1.94)
+        self.assertEqual(report.status, STATUSES[STABLE_WEIGHT])
+        self.assertNotIn(threading.current_thread().name, scale.threads)
+
+    def test_concurrent_scales(self):
+        """Make sure several scales are read at once without blocking the loop."""
+
+        scales = [FakeScale([data_report(i)], delay=0.1) for i in range(4)]
+        ticks = []
+        for i in range(5):
+            self.loop.call_later(0.01 * i, ticks.append, i)
+
+        started = time.time()
+        results = self.run_loop(asyncio.gather(
+                *[AsyncScale(scale).weigh() for scale in scales]))
+
+        self.assertLess(time.time() - started, 0.3)
+        self.assertEqual([report.weight for report in results], [0, 1, 2, 3])
+        self.assertEqual(ticks, [0, 1, 2, 3, 4])
+
+    def test_many_scales(self):
+        """Make sure the shared executor reads every scale at once, however many."""
+
+        barrier = threading.Barrier(8, timeout=5)
+
+        class WaitingScale(FakeScale):
+            def read(self, endpoint=None, max_attempts=10):
+                # Every read waits for the other scales' reads to start.
+                barrier.wait()
+                return FakeScale.read(self, endpoint, max_attempts)
+
+        scales = [AsyncScale(WaitingScale([data_report(i)])) for i in range(8)]
+        results = self.run_loop(asyncio.gather(
+                *[scale.weigh() for scale in scales]))
+        self.assertEqual([report.weight for report in results], list(range(8)))
+
+    def test_one_transfer_at_a_time(self):
+        """Make sure concurrent calls on one scale take turns."""
+
+        scale = FakeScale([data_report(1)] * 4, delay=0.01)
+        async_scale = AsyncScale(scale)
+        self.run_loop(asyncio.gather(*[async_scale.read() for i in range(4)]))
+        self.assertEqual(scale.reads, 4)
+        self.assertFalse(scale.overlapped)
+
+    def test_readings(self):
+        """Make sure readings are numbered data reports, ending on an error."""
+
+        scale = FakeScale([READY, data_report(1), READY, data_report(2)])
+        stream = AsyncScale(scale).readings()
+
+        readings = [self.run_loop(stream.__anext__()) for i in range(2)]
+        self.assertEqual([reading.seq for reading in readings], [1, 2])
+        self.assertEqual([reading.report.weight for reading in readings], [1, 2])
+
+        for i in range(2):
+            self.assertRaises(IOError, self.run_loop, stream.__anext__())
+
+    def test_backpressure(self):
+        """Make sure reading stops while the buffer is full."""
+
+        scale = FakeScale([data_report(1)] * 100)
+        stream = AsyncScale(scale).readings(buffer_size=3)
+
+        self.assertEqual(self.run_loop(stream.__anext__()).seq, 1)
+        self.run_loop(asyncio.sleep(0.1))
+        self.run_loop(stream.close())
+
+        # One reading taken, three waiting and one waiting for room.
+        self.assertLessEqual(scale.reads, 5)
+        self.assertRaises(StopAsyncIteration, self.run_loop, stream.__anext__())
@@ -0,0 +1,147 @@
+import unittest
+import mocks
+from buffers import BufferPool
+from scale import Scale
+from scale_manager import ScaleManager
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None # Python 3.4+ only.
+
+class TestBufferPool(unittest.TestCase):
+    def test_preallocated(self):
+        """Make sure every buffer is allocated up front."""
+
+        pool = BufferPool(count=3, size=8)
+        self.assertEqual(pool.available, 3)
+
+        buffers = [pool.acquire() for i in range(3)]
+        self.assertEqual([len(buffer) for buffer in buffers], [8] * 3)
+        self.assertEqual(len(set(id(buffer) for buffer in buffers)), 3)
+        self.assertEqual(pool.available, 0)
+
+    def test_reused(self):
+        """Make sure a buffer given back is the next one taken."""
+
+        pool = BufferPool(count=1)
+        buffer = pool.acquire()
+        pool.release(buffer)
+        self.assertIs(pool.acquire(), buffer)
+
+    def test_exhausted(self):
+        """Make sure an empty pool hands out new buffers, but keeps only `count`."""
+
+        pool = BufferPool(count=1, size=8)
+        first, second = pool.acquire(), pool.acquire()
+        self.assertEqual(len(second), 8)
+
+        pool.release(first)
+        pool.release(second)
+        self.assertEqual(pool.available, 1)
+
+    def test_sizes(self):
+        """Make sure buffers are taken and kept by size."""
+
+        pool = BufferPool(count=1, size=8)
+        buffer = pool.acquire(64)
+        self.assertEqual(len(buffer), 64)
+        self.assertEqual(pool.available, 1)
+
+        pool.release(buffer)
+        self.assertIs(pool.acquire(64), buffer)
+        self.assertEqual(len(pool.acquire()), 8)
+
+class TestPooledScale(unittest.TestCase):
+    def setUp(self):
+        self.manager = ScaleManager(
+            lookup=mocks.usb_ids.USB_IDS,
+            usb_lib=mocks.usb_lib.MockUSBLib()
+        )
+        self.pool = BufferPool(count=1)
+
+    def test_packet_size(self):
+        """Make sure each read asks for no more than one packet."""
+
+        pool = BufferPool(count=1, size=64)
+        device = mocks.usb_lib.MockDevice(
+            mocks.usb_ids.FAKE_VDR, mocks.usb_ids.SCALE, packet_size=16
+        )
+        scale = Scale(device=device, device_manager=self.manager,
+            buffers=pool)
+        buffer = scale._buffer
+        self.assertEqual(len(buffer), 16)
+        self.assertEqual(scale.weigh().weight, 0)
+
+        scale.disconnect()
+        self.assertIs(pool.acquire(16), buffer)
+
+    def test_buffer_held_while_connected(self):
+        """Make sure a scale takes a buffer when connecting and gives it back."""
+
+        scale = Scale(device_manager=self.manager, buffers=self.pool)
+        self.assertEqual(self.pool.available, 0)
+
+        scale.disconnect()
+        self.assertEqual(self.pool.available, 1)
+
+    def test_weigh(self):
+        """Make sure reports read into the pool decode like any others."""
+
+        scale = Scale(device_manager=self.manager, buffers=self.pool)
+        scale.device.set_weight("1.94 kg")
+        report = scale.weigh()
+
+        self.assertEqual(report.weight, 1.94)
+        self.assertEqual(report.unit, "kilogram")
+        self.assertEqual(list(report.raw), [3, 4, 3, 254, 194, 0])
+
+    def test_reports_shared(self):
+        """Make sure reading the same report again returns the same object."""
+
+        scale = Scale(device_manager=self.manager, buffers=self.pool)
+        first = scale.weigh()
+        self.assertIs(scale.weigh(), first)
+
+    def test_capture(self):
+        """Make sure only the bytes read are captured."""
+
+        captured = []
+
+        class Capture(object):
+            def write(self, data):
+                captured.append(list(data))
+
+        scale = Scale(device_manager=self.manager, buffers=self.pool,
+            capture=Capture())
+        scale.weigh()
+        self.assertEqual(captured, [[4, 4], [3, 2, 12, 254, 0, 0]])
+
+    @unittest.skipIf(tracemalloc is None, "requires tracemalloc")
+    def test_no_allocations(self):
+        """Make sure steady state reads keep no memory, however many reports they return."""
+
+        scale = Scale(device_manager=self.manager, buffers=self.pool)
+        number = 1000
+        reports = [None] * number
+        for i in range(10):
+            scale.weigh()
+
+        tracemalloc.start()
+        try:
+            before = tracemalloc.take_snapshot()
+            for i in range(number):
+                reports[i] = scale.weigh()
+            after = tracemalloc.take_snapshot()
+        finally:
+            tracemalloc.stop()
+
+        grown = sum(
+            stat.size_diff for stat in after.compare_to(before, "filename")
+            if "tracemalloc" not in stat.traceback[0].filename
+        )
+        self.assertLess(grown, number)
+        self.assertEqual(len(set(map(id, reports))), 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,162 @@
+import os
+import shutil
+import tempfile
+import unittest
+import mocks
+from capture import CaptureReader, CaptureWriter, HEADER, RECORD
+from reports import WEIGHT_UNITS
+from scale import Scale
+from scale_manager import ScaleManager
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+REPORTS = [
+    [3, 4, 12, 254, 254, 1],
+    [4, 4],
+    [3, 2, 3, 254, 0, 0],
+    [3, 4, 3, 254, 194, 0],
+]
+
+class TestCapture(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.path = os.path.join(self.directory, "scale.cap")
+
+    def capture(self, count, index_interval=4):
+        with CaptureWriter(self.path, index_interval=index_interval) as writer:
+            for i in range(count):
+                writer.write(REPORTS[i % len(REPORTS)], timestamp=float(i))
+
+    def test_round_trip(self):
+        """Make sure reports are replayed as they were captured."""
+
+        self.capture(10)
+
+        with CaptureReader(self.path) as reader:
+            self.assertEqual(len(reader), 10)
+            records = [
+                (record.number, record.timestamp, list(record.data))
+                for record in reader
+            ]
+
+        self.assertEqual(records, [
+            (i, float(i), REPORTS[i % len(REPORTS)]) for i in range(10)
+        ])
+
+    def test_reused_record(self):
+        """Make sure iterating yields one record object, moved along."""
+
+        self.capture(3)
+
+        with CaptureReader(self.path) as reader:
+            records = set(id(record) for record in reader)
+            self.assertEqual(len(records), 1)
+
+            record = next(reader.records(start=2))
+            self.assertEqual(record.number, 2)
+            self.assertEqual(record.report.weight, 0)
+            self.assertEqual(record.report.unit, WEIGHT_UNITS[3])
+
+    def test_index(self):
+        """Make sure the footer indexes every n-th record."""
+
+        self.capture(10)
+
+        with CaptureReader(self.path) as reader:
+            self.assertEqual(reader.index(), [(0, 0.0), (4, 4.0), (8, 8.0)])
+            self.assertEqual(reader.find(-1), 0)
+            self.assertEqual(reader.find(5), 5)
+            self.assertEqual(reader.find(5.5), 6)
+            self.assertEqual(reader.find(9), 9)
+            self.assertEqual(reader.find(100), 10)
+
+    def test_append(self):
+        """Make sure reopening a capture appends after the last record."""
+
+        self.capture(6)
+
+        with CaptureWriter(self.path, index_interval=100) as writer:
+            self.assertEqual(writer.count, 6)
+            writer.write([2, 3], timestamp=6.0)
+
+        with CaptureReader(self.path) as reader:
+            self.assertEqual(reader.index_interval, 4)
+            self.assertEqual(len(reader), 7)
+            self.assertEqual(reader.index(), [(0, 0.0), (4, 4.0)])
+            self.assertEqual(list(list(reader.records(start=6))[0].data), [2, 3])
+
+    def test_truncated(self):
+        """Make sure a capture cut short still reads complete records."""
+
+        self.capture(6)
+        with open(self.path, "r+b") as handle:
+            handle.truncate(HEADER.size + 5 * RECORD.size + 3)
+
+        with CaptureReader(self.path) as reader:
+            self.assertEqual(len(reader), 5)
+            self.assertEqual(reader.index(), [(0, 0.0), (4, 4.0)])
+
+        with CaptureWriter(self.path) as writer:
+            self.assertEqual(writer.count, 5)
+            writer.write([2, 3], timestamp=5.0)
+
+        with CaptureReader(self.path) as reader:
+            self.assertEqual(len(reader), 6)
+            self.assertEqual([record.timestamp for record in reader],
+                    [0.0, 1.0, 2.0, 3.0, 4.0, 5.0])
+
+    def test_oversized_report(self):
+        """Make sure reports too long for a record are refused."""
+
+        with CaptureWriter(self.path) as writer:
+            self.assertRaises(ValueError, writer.write, list(range(9)))
+            self.assertEqual(writer.count, 0)
+
+    def test_not_a_capture(self):
+        """Make sure other files are refused."""
+
+        with open(self.path, "wb") as handle:
+            handle.write(b"\0" * 64)
+
+        self.assertRaises(ValueError, CaptureReader, self.path)
+
+    @unittest.skipIf(numpy is None, "requires NumPy")
+    def test_array(self):
+        """Make sure records can be viewed as a NumPy array."""
+
+        self.capture(5)
+
+        with CaptureReader(self.path) as reader:
+            records = reader.array()
+            self.assertEqual(list(records["timestamp"]), [0.0, 1.0, 2.0, 3.0, 4.0])
+            self.assertEqual(list(records["length"]), [6, 2, 6, 6, 6])
+            self.assertEqual(list(records["data"][1][:2]), [4, 4])
+            del records
+
+    def test_scale_capture(self):
+        """Make sure a Scale logs every raw report it reads."""
+
+        manager = ScaleManager(
+            lookup=mocks.usb_ids.USB_IDS,
+            usb_lib=mocks.usb_lib.MockUSBLib()
+        )
+        endpoint = mocks.usb_lib.MockEndpoint(0, 0)
+
+        with CaptureWriter(self.path) as writer:
+            with Scale(device_manager=manager, capture=writer) as scale:
+                scale.device.set_weight("1.94 kg")
+                scale.read(endpoint=endpoint)
+                scale.read(endpoint=endpoint)
+                scale.capture = None
+                scale.read(endpoint=endpoint)
+            self.assertEqual(writer.count, 2)
+
+        with CaptureReader(self.path) as reader:
+            self.assertEqual(list(next(iter(reader)).data), [4, 4])
+            record = next(reader.records(start=1))
+            self.assertEqual(record.report.weight, 1.94)
+            self.assertEqual(record.report.unit, WEIGHT_UNITS[3])
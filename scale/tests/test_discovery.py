@@ -0,0 +1,95 @@
+import os
+import shutil
+import tempfile
+import unittest
+import mocks
+from scale_manager import ScaleManager
+from discovery import DiscoveryService, PollingHotplug, ARRIVED, LEFT
+
+class TestDiscoveryService(unittest.TestCase):
+    def setUp(self):
+        self.usb = mocks.usb_lib.MockUSBLib()
+        self.manager = ScaleManager(
+            lookup=mocks.usb_ids.USB_IDS,
+            usb_lib=self.usb
+        )
+        self.events = []
+        self.discovery = DiscoveryService(
+            self.manager,
+            lambda device, id: self.events.append((ARRIVED, id)),
+            lambda id: self.events.append((LEFT, id)),
+            hotplug=mocks.usb_lib.MockHotplug(self.usb)
+        )
+
+    def test_scan(self):
+        """Make sure a scan reports every scale once."""
+
+        self.discovery.scan()
+        self.discovery.scan()
+        self.assertEqual(
+            self.events, [(ARRIVED, "001-001"), (ARRIVED, "001-003")]
+        )
+
+    def test_hotplug(self):
+        """Make sure scales are reported as they are plugged in and out."""
+
+        self.discovery.scan()
+        self.discovery.start(scan=False)
+        enumerations = self.usb.enumerations
+
+        scale = mocks.usb_lib.MockDevice(
+            mocks.usb_ids.FAKE_VDR, mocks.usb_ids.SCALE, address=9
+        )
+        self.usb.plug(scale)
+        self.usb.plug(mocks.usb_lib.MockDevice(
+            mocks.usb_ids.FAKE_VDR, mocks.usb_ids.OTHER, address=10
+        ))
+        self.usb.unplug(scale)
+        self.discovery.stop(1)
+
+        self.assertEqual(self.events[-2:], [
+            (ARRIVED, "001-009"), (LEFT, "001-009")
+        ])
+        self.assertEqual(self.usb.enumerations, enumerations)
+        self.assertEqual(sorted(self.discovery.ids()), ["001-001", "001-003"])
+
+class TestPollingHotplug(unittest.TestCase):
+    def setUp(self):
+        self.usb = mocks.usb_lib.MockUSBLib()
+        self.events = []
+
+    def record(self, event, device):
+        self.events.append((event, device.address))
+
+    def test_poll_diffs_snapshots(self):
+        """Make sure only changes between snapshots are reported."""
+
+        hotplug = PollingHotplug(self.usb)
+        hotplug.register(self.record)
+        hotplug.poll()
+        self.assertEqual(sorted(self.events), [(ARRIVED, i) for i in range(1, 5)])
+
+        del self.events[:]
+        hotplug.poll()
+        self.assertEqual(self.events, [])
+
+        removed = self.usb.devices.pop(1)
+        hotplug.poll()
+        self.assertEqual(self.events, [(LEFT, removed.address)])
+
+    def test_poll_skips_unchanged_bus(self):
+        """Make sure the bus is only enumerated when its device nodes change."""
+
+        bus_path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, bus_path)
+        os.mkdir(os.path.join(bus_path, "001"))
+        open(os.path.join(bus_path, "001", "001"), "w").close()
+
+        hotplug = PollingHotplug(self.usb, bus_path=bus_path)
+        hotplug.poll()
+        hotplug.poll()
+        self.assertEqual(self.usb.enumerations, 1)
+
+        open(os.path.join(bus_path, "001", "002"), "w").close()
+        hotplug.poll()
+        self.assertEqual(self.usb.enumerations, 2)
@@ -0,0 +1,106 @@
+import unittest
+import mocks
+import metrics
+from metrics import Counter, Histogram, MetricsRegistry
+from scale import Scale
+from scale_manager import ScaleManager
+
+class TestMetrics(unittest.TestCase):
+    def test_counter(self):
+        """Make sure counters are exposed with their labels."""
+
+        registry = MetricsRegistry()
+        requests = registry.counter("requests_total", "Requests.")
+        errors = registry.counter("errors_total", "Errors.", ["type"])
+        requests.inc()
+        requests.inc(2)
+        errors.labels("IOError").inc()
+        errors.labels('Say "hi"').inc()
+
+        self.assertEqual(registry.exposition(), "\n".join([
+            "# HELP requests_total Requests.",
+            "# TYPE requests_total counter",
+            "requests_total 3",
+            "# HELP errors_total Errors.",
+            "# TYPE errors_total counter",
+            'errors_total{type="IOError"} 1',
+            'errors_total{type="Say \\"hi\\""} 1',
+        ]) + "\n")
+
+    def test_histogram(self):
+        """Make sure histogram buckets are cumulative."""
+
+        histogram = Histogram("latency_seconds", "Latency.", buckets=(1, 5))
+        for value in (0.5, 1, 3, 10):
+            histogram.observe(value)
+
+        self.assertEqual(histogram.count, 4)
+        self.assertEqual(histogram.exposition().split("\n")[2:], [
+            'latency_seconds_bucket{le="1"} 2',
+            'latency_seconds_bucket{le="5"} 3',
+            'latency_seconds_bucket{le="+Inf"} 4',
+            "latency_seconds_sum 14.5",
+            "latency_seconds_count 4",
+        ])
+
+    def test_labels(self):
+        """Make sure labelled metrics check how many labels they are given."""
+
+        errors = Counter("errors_total", "Errors.", ["type"])
+        self.assertIs(errors.labels("IOError"), errors.labels("IOError"))
+        self.assertRaises(ValueError, errors.labels, "IOError", "extra")
+
+    def test_duplicate(self):
+        """Make sure a name can only be registered once."""
+
+        registry = MetricsRegistry()
+        registry.counter("requests_total", "Requests.")
+        self.assertRaises(ValueError, registry.gauge, "requests_total", "")
+
+class TestScaleMetrics(unittest.TestCase):
+    def setUp(self):
+        self.manager = ScaleManager(
+            lookup=mocks.usb_ids.USB_IDS,
+            usb_lib=mocks.usb_lib.MockUSBLib()
+        )
+        self.scale = Scale(device_manager=self.manager)
+        self.endpoint = mocks.usb_lib.MockEndpoint(0, 0)
+
+    def test_read(self):
+        """Make sure reads are timed and their failures counted by type."""
+
+        reads = metrics.USB_READ_SECONDS.count
+        retries = metrics.USB_READ_RETRIES.value
+        error = IOError("Pipe error")
+        # IOError is named OSError on Python 3.
+        errors = metrics.USB_READ_ERRORS.labels(type(error).__name__)
+        failures = errors.value
+
+        self.scale.read(self.endpoint)
+        self.scale.device.fail_on("read", error)
+        self.assertRaises(IOError, self.scale.read, self.endpoint, 3)
+
+        self.assertEqual(metrics.USB_READ_SECONDS.count, reads + 4)
+        self.assertEqual(metrics.USB_READ_RETRIES.value, retries + 2)
+        self.assertEqual(errors.value, failures + 3)
+
+    def test_weigh(self):
+        """Make sure weighings record how many reports they took."""
+
+        attempts = metrics.WEIGH_ATTEMPTS.sum
+        weighings = metrics.WEIGH_SECONDS.count
+
+        self.assertTrue(self.scale.weigh(self.endpoint))
+
+        # The scale reports it is ready before its first weight.
+        self.assertEqual(metrics.WEIGH_ATTEMPTS.sum, attempts + 2)
+        self.assertEqual(metrics.WEIGH_SECONDS.count, weighings + 1)
+
+    def test_exposition(self):
+        """Make sure the driver's metrics are all exposed."""
+
+        exposition = metrics.REGISTRY.exposition()
+        for name in ("scale_usb_read_seconds", "scale_weigh_attempts",
+                "scale_acquisition_iterations_total", "scale_reconnects_total",
+                "scale_http_requests_total"):
+            self.assertIn("# TYPE %s " % name, exposition)
@@ -0,0 +1,52 @@
+import unittest
+import mocks
+from name_index import NameIndex
+from mocks.usb_ids import FAUX_MFR, FAKE_VDR, SCALE, OTHER
+
+class TestNameIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = NameIndex(mocks.usb_ids.USB_IDS)
+
+    def test_vendors(self):
+        """Make sure manufacturers are found ignoring case."""
+
+        self.assertEqual(self.index.vendors("fake VENDOR"), set([FAKE_VDR]))
+        self.assertEqual(self.index.vendors("DNE"), set())
+
+    def test_vendor_prefix(self):
+        """Make sure a prefix finds every manufacturer it starts."""
+
+        self.assertEqual(self.index.vendors("Fa"), set([FAUX_MFR, FAKE_VDR]))
+
+    def test_products(self):
+        """Make sure models are found ignoring case, or by prefix."""
+
+        self.assertEqual(self.index.products("faux scale"), set([(FAUX_MFR, SCALE)]))
+        self.assertEqual(
+            self.index.products("Fake D"),
+            set([(FAKE_VDR, OTHER)])
+        )
+
+    def test_exact_beats_prefix(self):
+        """Make sure an exact match hides longer names it is a prefix of."""
+
+        index = NameIndex({
+            1: {"name": "Acme", 1: "Scale", 2: "Scale Pro"},
+        })
+        self.assertEqual(index.products("scale"), set([(1, 1)]))
+
+    def test_candidates(self):
+        """Make sure names narrow each other down."""
+
+        self.assertEqual(
+            self.index.candidates(),
+            (frozenset([(FAUX_MFR, SCALE), (FAKE_VDR, SCALE)]), frozenset())
+        )
+        self.assertEqual(
+            self.index.candidates(manufacturer="Fake Vendor", model="Fa"),
+            (set([(FAKE_VDR, SCALE), (FAKE_VDR, OTHER)]), frozenset())
+        )
+        self.assertEqual(
+            self.index.candidates(manufacturer="Fake Vendor"),
+            (frozenset(), set([FAKE_VDR]))
+        )
@@ -0,0 +1,209 @@
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+from threading import Event, Thread
+import mocks
+import profiling
+from mocks.replay import READY, ReplayDevice, data_report
+from profiling import Hooks, Profiler
+from reports import STABLE_WEIGHT
+from scale import Scale
+from scale_manager import ScaleManager
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        self.now += 0.1
+        return self.now
+
+class RecordingHooks(Hooks):
+    def __init__(self):
+        self.calls = []
+
+    def pre_read(self, scale):
+        self.calls.append("pre_read")
+
+    def post_read(self, scale, data):
+        self.calls.append("post_read")
+
+    def read_timeout(self, scale):
+        self.calls.append("read_timeout")
+
+    def read_error(self, scale, error):
+        self.calls.append("read_error")
+
+    def post_decode(self, scale, report):
+        self.calls.append("post_decode")
+
+    def post_publish(self, scale, result):
+        self.calls.append("post_publish")
+
+class TestProfiling(unittest.TestCase):
+    def setUp(self):
+        self.manager = ScaleManager(
+            lookup=mocks.usb_ids.USB_IDS,
+            usb_lib=mocks.usb_lib.MockUSBLib()
+        )
+        self.scale = Scale(device_manager=self.manager)
+        self.endpoint = mocks.usb_lib.MockEndpoint(0, 0)
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        profiling.detach()
+        shutil.rmtree(self.directory)
+
+    def test_hook_points(self):
+        """Make sure weighing calls the hooks in order."""
+
+        hooks = RecordingHooks()
+        profiling.attach(hooks)
+        self.scale.weigh(self.endpoint)
+
+        read = ["pre_read", "post_read", "post_decode"]
+        self.assertEqual(hooks.calls, read + read + ["post_publish"])
+        self.assertIs(profiling.detach(), hooks)
+        self.assertIsNone(profiling.hooks)
+
+    def test_stages(self):
+        """Make sure the profiler times each stage of an iteration."""
+
+        profiler = Profiler(slow=10, clock=FakeClock())
+        profiling.attach(profiler)
+        self.scale.weigh(self.endpoint)
+
+        stats = profiler.stats()
+        self.assertEqual(stats["read"]["count"], 2)
+        self.assertEqual(stats["decode"]["count"], 2)
+        self.assertEqual(stats["iteration"]["count"], 1)
+        self.assertAlmostEqual(stats["iteration"]["total"], 0.6)
+        self.assertEqual(profiler.slow_iterations(), [])
+
+    def test_slow_iterations(self):
+        """Make sure slow iterations are kept with their profile."""
+
+        profiler = Profiler(slow=0.25, keep=2, profile=True, clock=FakeClock())
+        profiling.attach(profiler)
+        for i in range(3):
+            self.scale.weigh(self.endpoint)
+
+        slow = profiler.slow_iterations()
+        self.assertEqual(len(slow), 2)
+        self.assertIn("read", slow[0]["stages"])
+        self.assertIn("function calls", slow[0]["profile"])
+
+        path = profiler.dump(os.path.join(self.directory, "profile.json"))
+        with open(path) as handle:
+            dump = json.load(handle)
+        self.assertEqual(len(dump["slow_iterations"]), 2)
+        self.assertEqual(dump["stages"]["iteration"]["count"], 3)
+
+    def test_sample(self):
+        """Make sure the stack of a stuck read is sampled."""
+
+        profiler = Profiler(slow=0.05)
+        profiling.attach(profiler, sample_interval=0.01)
+        release = Event()
+        read = self.scale.device.read
+
+        def stuck(*args):
+            release.wait(5)
+            return read(*args)
+
+        self.scale.device.read = stuck
+        thread = Thread(target=self.scale.weigh, args=(self.endpoint,))
+        thread.start()
+
+        def sampled():
+            iterations = list(profiler._iterations.values())
+            return iterations and iterations[0].stack
+
+        try:
+            deadline = time.time() + 5
+            while not sampled() and time.time() < deadline:
+                time.sleep(0.01)
+        finally:
+            release.set()
+            thread.join(5)
+
+        stack = profiler.slow_iterations()[0]["stack"]
+        self.assertIn("stuck", stack)
+
+    def test_read_error(self):
+        """Make sure an iteration whose read raised is dropped."""
+
+        hooks = RecordingHooks()
+        profiling.attach(hooks)
+        self.scale.device.fail_on("read", IOError("Gone"))
+        self.assertRaises(IOError, self.scale.read, self.endpoint, 1)
+        self.assertEqual(hooks.calls, ["pre_read", "read_error"])
+
+        profiler = Profiler(slow=10, profile=True, clock=FakeClock())
+        profiling.attach(profiler)
+        self.assertRaises(IOError, self.scale.read, self.endpoint, 1)
+        self.assertEqual(profiler._iterations, {})
+
+        self.scale.device.fail_on("read")
+        self.scale.weigh(self.endpoint)
+        self.assertAlmostEqual(profiler.stats()["iteration"]["total"], 0.6)
+
+    def test_read_latest(self):
+        """Make sure the timeout ending a drain does not drop the iteration."""
+
+        device = ReplayDevice(mocks.usb_ids.FAKE_VDR, mocks.usb_ids.SCALE, [
+            (0, READY), (0, data_report(1.94, STABLE_WEIGHT)),
+        ], loop=False)
+        scale = Scale(device=device, device_manager=self.manager)
+
+        hooks = RecordingHooks()
+        profiling.attach(hooks)
+        scale.read_latest()
+        read = ["pre_read", "post_read", "post_decode"]
+        self.assertEqual(hooks.calls, read + read + ["pre_read", "read_timeout"])
+
+        profiler = Profiler(slow=10, profile=True, clock=FakeClock())
+        profiling.attach(profiler)
+        for i in range(5):
+            device.rewind()
+            latest = scale.read_latest()
+            profiler.post_publish(scale, latest.report)
+            self.assertIsNone(sys.getprofile())
+
+        self.assertEqual(profiler.stats()["iteration"]["count"], 5)
+        self.assertEqual(profiler._iterations, {})
+
+    def test_detach_during_read(self):
+        """Make sure detaching in the middle of a read leaves no profiler behind."""
+
+        profiler = Profiler(slow=10, profile=True)
+        profiling.attach(profiler)
+        started, release = Event(), Event()
+        read = self.scale.device.read
+        after = []
+
+        def stuck(*args):
+            started.set()
+            release.wait(5)
+            return read(*args)
+
+        def weigh():
+            self.scale.weigh(self.endpoint)
+            after.append(sys.getprofile())
+
+        self.scale.device.read = stuck
+        thread = Thread(target=weigh)
+        thread.start()
+        try:
+            started.wait(5)
+            profiling.detach()
+        finally:
+            release.set()
+            thread.join(5)
+
+        self.assertEqual(after, [None])
+        self.assertEqual(profiler._iterations, {})
@@ -0,0 +1,96 @@
+import unittest
+from threading import Timer
+from readings import ReadingBuffer
+
+class TestReadingBuffer(unittest.TestCase):
+    def setUp(self):
+        self.buffer = ReadingBuffer(size=4)
+
+    def test_empty(self):
+        """Make sure an empty buffer has no readings."""
+
+        self.assertEqual(self.buffer.latest(), None)
+        self.assertEqual(self.buffer.seq, 0)
+        self.assertEqual(self.buffer.since(), [])
+        self.assertEqual(len(self.buffer), 0)
+
+    def test_push(self):
+        """Make sure pushed readings are numbered in order."""
+
+        first = self.buffer.push("a", timestamp=1.0)
+        second = self.buffer.push("b", timestamp=2.0)
+        self.assertEqual(first.seq, 1)
+        self.assertEqual(second.seq, 2)
+        self.assertEqual(self.buffer.latest(), second)
+        self.assertEqual(self.buffer.get(1).report, "a")
+        self.assertEqual(self.buffer.get(3), None)
+
+    def test_wraps_around(self):
+        """Make sure only the newest `size` readings are kept."""
+
+        for report in "abcdef":
+            self.buffer.push(report)
+
+        self.assertEqual(len(self.buffer), 4)
+        self.assertEqual(self.buffer.get(2), None)
+        self.assertEqual(
+            [reading.report for reading in self.buffer.since()],
+            list("cdef")
+        )
+        self.assertEqual(
+            [reading.seq for reading in self.buffer.since(4)],
+            [5, 6]
+        )
+
+    def test_invalid_size(self):
+        """Make sure a buffer needs at least one slot."""
+
+        self.assertRaises(ValueError, ReadingBuffer, 0)
+
+    def test_wait_returns_newer_change(self):
+        """Make sure waiting returns at once when a different reading exists."""
+
+        self.buffer.push("a")
+        self.buffer.push("b")
+        self.assertEqual(self.buffer.wait_for_change(1, timeout=0).report, "b")
+        self.assertEqual(self.buffer.wait_for_change(0, timeout=0).seq, 2)
+
+    def test_wait_ignores_repeats(self):
+        """Make sure identical reports do not count as a change."""
+
+        self.buffer.push("a")
+        self.buffer.push("a")
+        self.assertEqual(self.buffer.wait_for_change(1, timeout=0.01), None)
+
+    def test_wait_wakes_on_push(self):
+        """Make sure a waiter wakes up when a changed reading is pushed."""
+
+        self.buffer.push("a")
+        timer = Timer(0.01, self.buffer.push, ["b"])
+        timer.start()
+        reading = self.buffer.wait_for_change(1, timeout=5)
+        timer.join()
+        self.assertEqual(reading.report, "b")
+
+    def test_wait_after_restart(self):
+        """Make sure a sequence number from the future is treated as unseen."""
+
+        self.buffer.push("a")
+        self.assertEqual(self.buffer.wait_for_change(42, timeout=0).report, "a")
+
+    def test_wait_since(self):
+        """Make sure readers get every reading they have not seen yet."""
+
+        self.buffer.push("a")
+        self.buffer.push("b")
+        self.assertEqual(
+            [reading.report for reading in self.buffer.wait_since(0, timeout=0)],
+            ["a", "b"]
+        )
+        self.assertEqual(self.buffer.wait_since(2, timeout=0.01), [])
+
+        timer = Timer(0.01, self.buffer.push, ["c"])
+        timer.start()
+        readings = self.buffer.wait_since(2, timeout=5)
+        timer.join()
+        self.assertEqual([reading.seq for reading in readings], [3])
@@ -0,0 +1,216 @@
+import unittest
+from threading import Thread
+import usb.core
+import mocks
+import metrics
+from acquisition import AcquisitionEngine
+from reconnect import ReconnectPolicy, CLOSED, OPEN, HALF_OPEN
+from scale import Scale
+from scale_manager import ScaleManager
+from session import ScaleSession
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+class TestReconnectPolicy(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+
+    def policy(self, **kwargs):
+        kwargs.setdefault("clock", self.clock)
+        kwargs.setdefault("random", lambda: 0.0)
+        return ReconnectPolicy(**kwargs)
+
+    def test_backoff(self):
+        """Make sure delays double after each failure, up to a maximum."""
+
+        policy = self.policy(base_delay=1, max_delay=10, failure_threshold=100)
+        self.assertEqual(policy.delay(), 0)
+
+        delays = []
+        for i in range(6):
+            policy.failure(IOError("Gone"))
+            delays.append(policy.delay())
+
+        self.assertEqual(delays, [1, 2, 4, 8, 10, 10])
+        self.clock.now += 3
+        self.assertEqual(policy.delay(), 7)
+
+    def test_jitter(self):
+        """Make sure jitter shortens delays by up to the given fraction."""
+
+        policy = self.policy(base_delay=4, jitter=0.5, random=lambda: 1.0)
+        policy.failure()
+        self.assertEqual(policy.delay(), 2)
+
+    def test_circuit_breaker(self):
+        """Make sure repeated failures open the circuit until it resets."""
+
+        policy = self.policy(failure_threshold=3, reset_timeout=60)
+        opened = [policy.failure() for i in range(3)]
+
+        self.assertEqual(opened, [False, False, True])
+        self.assertEqual(policy.state, OPEN)
+        self.assertFalse(policy.allow())
+        self.assertEqual(policy.delay(), 60)
+
+        self.clock.now += 60
+        self.assertEqual(policy.state, HALF_OPEN)
+        self.assertTrue(policy.allow())
+
+        # A failed trial opens it again straight away.
+        self.assertFalse(policy.failure())
+        self.assertEqual(policy.state, OPEN)
+        self.assertEqual(policy.delay(), 60)
+
+        self.clock.now += 60
+        policy.success()
+        self.assertEqual(policy.state, CLOSED)
+        self.assertEqual(policy.failures, 0)
+        self.assertEqual(policy.delay(), 0)
+
+    def test_status(self):
+        """Make sure the status describes the circuit and last error."""
+
+        policy = self.policy(base_delay=2)
+        policy.failure(IOError("Gone"))
+
+        self.assertEqual(policy.status(), {
+            "state": CLOSED, "failures": 1, "retry_in": 2, "last_error": "Gone"
+        })
+
+    def test_status_during_failure(self):
+        """Make sure the status can be read while a failure is being recorded."""
+
+        statuses = []
+
+        def random():
+            # Called by `failure` half way through.
+            statuses.append(policy.status())
+            return 0.0
+
+        policy = self.policy(base_delay=2, random=random)
+        policy.failure(IOError("Gone"))
+
+        self.assertEqual(statuses[0]["failures"], 0)
+        self.assertEqual(statuses[0]["retry_in"], 0)
+        self.assertEqual(policy.status()["retry_in"], 2)
+
+class TestEngineReconnect(unittest.TestCase):
+    def setUp(self):
+        self.usb = mocks.usb_lib.MockUSBLib()
+        self.manager = ScaleManager(
+            lookup=mocks.usb_ids.USB_IDS, usb_lib=self.usb
+        )
+        self.device = self.manager.find()
+        self.errors = []
+
+    def engine(self, factory, policy):
+        return AcquisitionEngine(
+            ScaleSession(factory),
+            endpoint=mocks.usb_lib.MockEndpoint(0, 0),
+            on_error=self.errors.append,
+            reconnect=policy
+        )
+
+    def run_until(self, engine, condition):
+        thread = Thread(target=engine.run)
+        thread.start()
+        try:
+            while not condition():
+                pass
+        finally:
+            engine.stop()
+            thread.join(5)
+        self.assertFalse(thread.is_alive())
+
+    def assertOpens(self, factory, error):
+        policy = ReconnectPolicy(base_delay=0.001, failure_threshold=3,
+                reset_timeout=30)
+        engine = self.engine(factory, policy)
+
+        # Stopping cuts the 30 second wait short.
+        self.run_until(engine, lambda: policy.state == OPEN)
+
+        self.assertEqual(policy.failures, 3)
+        self.assertEqual(len(self.errors), 3)
+        self.assertIs(policy.last_error, error)
+
+    def test_set_configuration(self):
+        """Make sure failing to configure a scale opens the circuit."""
+
+        error = IOError("Access denied")
+        self.device.fail_on("set_configuration", error)
+        self.assertOpens(
+            lambda: Scale(device=self.device, device_manager=self.manager),
+            error
+        )
+
+    def test_read(self):
+        """Make sure failing reads open the circuit."""
+
+        error = IOError("Pipe error")
+        self.device.fail_on("read", error)
+        self.assertOpens(
+            lambda: Scale(device=self.device, device_manager=self.manager),
+            error
+        )
+
+    def test_find(self):
+        """Make sure failing to enumerate the bus opens the circuit."""
+
+        error = IOError("No backend")
+        self.usb.fail_on("find", error)
+        self.assertOpens(lambda: Scale(device_manager=self.manager), error)
+
+    def test_timeouts(self):
+        """Make sure reads timing out on a quiet scale are not failures."""
+
+        policy = ReconnectPolicy(base_delay=0.001, failure_threshold=2)
+        engine = self.engine(
+            lambda: Scale(device=self.device, device_manager=self.manager),
+            policy
+        )
+        self.device.fail_on(
+            "read", usb.core.USBError("Operation timed out", errno=110)
+        )
+        reads = []
+
+        def read(*args):
+            reads.append(args)
+            return original(*args)
+
+        original, self.device.read = self.device.read, read
+        self.run_until(engine, lambda: len(reads) > 10)
+
+        self.assertEqual(policy.state, CLOSED)
+        self.assertEqual(policy.failures, 0)
+        self.assertEqual(self.errors, [])
+        self.assertTrue(engine.session.connected)
+
+    def test_recovery(self):
+        """Make sure the circuit closes once the scale reads again."""
+
+        policy = ReconnectPolicy(base_delay=0.001, failure_threshold=2,
+                reset_timeout=0.01)
+        engine = self.engine(
+            lambda: Scale(device=self.device, device_manager=self.manager),
+            policy
+        )
+        self.device.fail_on("read", IOError("Pipe error"))
+        reconnects = metrics.RECONNECTS.value
+
+        def recovered():
+            if policy.state != CLOSED:
+                self.device.fail_on("read")
+            return engine.buffer.seq > 0
+
+        self.run_until(engine, recovered)
+
+        self.assertEqual(policy.state, CLOSED)
+        self.assertEqual(policy.failures, 0)
+        self.assertEqual(metrics.RECONNECTS.value, reconnects + 1)
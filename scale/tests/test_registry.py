@@ -0,0 +1,111 @@
+import unittest
+import mocks
+from scale_manager import ScaleManager
+from registry import ScaleRegistry, ScaleSnapshot, device_id
+from session import CONNECTED
+
+class TestScaleRegistry(unittest.TestCase):
+    def setUp(self):
+        self.usb = mocks.usb_lib.MockUSBLib()
+        self.manager = ScaleManager(
+            lookup=mocks.usb_ids.USB_IDS,
+            usb_lib=self.usb
+        )
+        self.registry = ScaleRegistry(self.manager, retry_delay=0)
+
+    def tearDown(self):
+        self.registry.stop(1)
+
+    def wait_for_reading(self, worker):
+        while worker.snapshot.seq < 1:
+            pass
+
+    def test_device_id(self):
+        """Make sure devices are keyed by bus and address."""
+
+        self.assertEqual(device_id(self.usb.devices[2]), "001-003")
+
+    def test_sync_starts_one_worker_per_scale(self):
+        """Make sure every scale on the bus gets its own worker."""
+
+        added, removed = self.registry.sync()
+        self.assertEqual(added, ["001-001", "001-003"])
+        self.assertEqual(removed, [])
+        self.assertEqual(self.registry.ids(), ["001-001", "001-003"])
+
+        for id in added:
+            worker = self.registry.get(id)
+            self.assertIs(worker.device, self.usb.devices[int(id[-1]) - 1])
+            self.wait_for_reading(worker)
+
+        self.assertEqual(self.registry.sync(), ([], []))
+
+    def test_sync_removes_unplugged_scales(self):
+        """Make sure a scale that left the bus has its worker stopped."""
+
+        self.registry.sync()
+        worker = self.registry.get("001-001")
+        del self.usb.devices[0]
+
+        self.assertEqual(self.registry.sync(), ([], ["001-001"]))
+        self.assertNotIn("001-001", self.registry)
+        self.assertEqual(self.registry.get().id, "001-003")
+        worker.stop(1)
+        self.assertFalse(worker.session.connected)
+
+    def test_tare_per_scale(self):
+        """Make sure taring one scale leaves the others alone."""
+
+        self.usb.devices[2].set_weight("5.10 lb")
+        self.registry.sync()
+        worker = self.registry.get("001-003")
+        self.wait_for_reading(worker)
+        worker.set_tare()
+
+        self.assertEqual(worker.tare, 5.10)
+        self.assertEqual(self.registry.get("001-001").tare, 0)
+        worker.clear_tare()
+        self.assertEqual(worker.tare, 0)
+
+    def test_snapshot(self):
+        """Make sure readings, tare and state are published together."""
+
+        self.usb.devices[0].set_weight("5.10 lb")
+        self.registry.sync()
+        worker = self.registry.get("001-001")
+        self.wait_for_reading(worker)
+        worker.set_tare()
+
+        snapshot = worker.snapshot
+        self.assertIsInstance(snapshot, ScaleSnapshot)
+        self.assertEqual(snapshot.report.weight, 5.10)
+        self.assertEqual(snapshot.tare, 5.10)
+        self.assertEqual(snapshot.weight, 0)
+        self.assertEqual(snapshot.status, CONNECTED)
+        self.assertTrue(snapshot.seq >= 1)
+
+        # Published snapshots are never changed, only replaced.
+        worker.clear_tare()
+        self.assertEqual(snapshot.tare, 5.10)
+        self.assertEqual(worker.snapshot.tare, 0)
+
+        reading = worker.readings.latest()
+        view = worker.view(reading)
+        self.assertEqual((view.seq, view.report, view.tare),
+                (reading.seq, reading.report, 0))
+
+    def test_snapshot_without_reading(self):
+        """Make sure a worker that never read has an empty snapshot."""
+
+        self.usb.devices[0].fail_on("set_configuration", IOError("Busy"))
+        worker = self.registry.add(self.usb.devices[0])
+
+        self.assertEqual(worker.snapshot.report, None)
+        self.assertEqual(worker.snapshot.weight, None)
+        self.assertEqual(worker.latest(), None)
+
+    def test_get_unknown(self):
+        """Make sure unknown ids and empty registries return None."""
+
+        self.assertEqual(self.registry.get(), None)
+        self.assertEqual(self.registry.get("DNE"), None)
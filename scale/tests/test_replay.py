@@ -0,0 +1,128 @@
+import os
+import shutil
+import tempfile
+import unittest
+import usb.core
+import mocks
+from capture import CaptureWriter
+from mocks.replay import ReplayDevice, waveform, capture_reports, replay_bus
+from reports import decode, STATUSES, DATA_REPORT, IN_MOTION
+from scale import Scale
+from scale_manager import ScaleManager
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 0.0
+        self.slept = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+class TestReplay(unittest.TestCase):
+    def setUp(self):
+        self.endpoint = mocks.usb_lib.MockEndpoint(0, 0)
+
+    def device(self, reports, **kwargs):
+        return ReplayDevice(
+            mocks.usb_ids.FAKE_VDR, mocks.usb_ids.SCALE, reports, **kwargs
+        )
+
+    def test_waveform(self):
+        """Make sure the waveform settles on the weight and goes back to zero."""
+
+        reports = waveform(weight=1.94, rate=100)
+        weights = [
+            decode(data).weight for timestamp, data in reports
+            if data[0] == DATA_REPORT
+        ]
+
+        self.assertEqual(len(weights) * 2, len(reports))
+        self.assertEqual(weights[0], 0)
+        self.assertTrue(max(weights) > 1.94)
+        self.assertIn(1.94, weights)
+        self.assertEqual(weights[-1], 0)
+        self.assertEqual(list(reports[0][1]), [4, 4])
+
+    def test_weigh(self):
+        """Make sure Scale.weigh waits out the settling oscillation."""
+
+        device = self.device(waveform(empty=0))
+        manager = ScaleManager(
+            lookup=mocks.usb_ids.USB_IDS,
+            usb_lib=mocks.usb_lib.MockUSBLib(devices=[device])
+        )
+
+        with Scale(device_manager=manager) as scale:
+            scale.read(endpoint=self.endpoint)
+            first = scale.read(endpoint=self.endpoint)
+            self.assertEqual(first.type, DATA_REPORT)
+            self.assertEqual(first.status, STATUSES[IN_MOTION])
+
+            weighing = scale.weigh(endpoint=self.endpoint, max_attempts=200)
+            self.assertEqual(weighing.weight, 1.94)
+
+    def test_pacing(self):
+        """Make sure reports are paced by their timestamps times `speed`."""
+
+        clock = FakeClock()
+        reports = [(10.0, (4, 4)), (10.5, (4, 4)), (11.0, (4, 4))]
+        device = self.device(reports, speed=2, clock=clock, sleep=clock.sleep)
+
+        for i in range(6):
+            device.read()
+
+        self.assertEqual(clock.slept, [0.25] * 5)
+        self.assertEqual(device.reads, 6)
+
+    def test_end(self):
+        """Make sure playback loops, or times out at the end if told to."""
+
+        reports = [(0, (4, 4)), (1, (3, 2, 3, 254, 0, 0))]
+
+        looping = self.device(reports)
+        self.assertEqual(
+            [len(looping.read()) for i in range(3)], [2, 6, 2]
+        )
+
+        once = self.device(reports, loop=False)
+        once.read()
+        once.read()
+        self.assertRaises(usb.core.USBError, once.read)
+
+        once.rewind()
+        self.assertEqual(list(once.read()), [4, 4])
+
+    def test_capture(self):
+        """Make sure captured traffic plays back as recorded."""
+
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, "scale.cap")
+
+        with CaptureWriter(path) as capture:
+            for timestamp, data in waveform(empty=0.1, settle=0.1, hold=0.1):
+                capture.write(data, timestamp)
+
+        reports = capture_reports(path)
+        device = self.device(reports, loop=False)
+        self.assertEqual(
+            [tuple(device.read()) for i in range(len(reports))],
+            [data for timestamp, data in reports]
+        )
+
+    def test_replay_bus(self):
+        """Make sure a bus of replaying scales can be found and read."""
+
+        usb_lib = replay_bus(300, waveform(hold=0))
+        manager = ScaleManager(lookup=mocks.usb_ids.USB_IDS, usb_lib=usb_lib)
+        devices = manager.find_all()
+
+        self.assertEqual(len(devices), 300)
+        self.assertEqual(
+            len(set((device.bus, device.address) for device in devices)), 300
+        )
+        self.assertEqual(list(devices[-1].read()), [4, 4])
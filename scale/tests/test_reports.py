@@ -0,0 +1,202 @@
+import sys
+import unittest
+from array import array
+from reports import ReportFactory, ReportCache, decode, decode_batch, \
+        WEIGHT_UNITS, DATA_REPORT, WEIGHT_LIMIT_REPORT
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None # Python 3.4+ only.
+
+class TestReportFactory(unittest.TestCase):
+    def test_twos_comp(self):
+        """Make sure scaling exponents are read as signed bytes."""
+
+        self.assertEqual(ReportFactory.twos_comp(254), -2)
+        self.assertEqual(ReportFactory.twos_comp(128), -128)
+        self.assertEqual(ReportFactory.twos_comp(1), 1)
+        self.assertEqual(ReportFactory.twos_comp(127), 127)
+
+    def test_calc_weight(self):
+        """Make sure weights are scaled by a power of ten."""
+
+        self.assertEqual(ReportFactory.calc_weight(254, 254, 1), 5.10)
+        self.assertEqual(ReportFactory.calc_weight(1, 5, 0), 50)
+
+class TestDecode(unittest.TestCase):
+    # Reports of every type, the data reports recorded from a Mettler Toledo PS60.
+    REPORTS = [
+        [1, 1, 3, 0, 0, 0],
+        [2, 3, 0, 0, 0, 0],
+        [3, 2, 12, 254, 0, 0],
+        [3, 4, 12, 254, 254, 1],
+        [3, 2, 3, 254, 0, 0],
+        [3, 4, 3, 254, 194, 0],
+        [4, 4],
+        [5, 12, 255, 10, 0, 0],
+        [6, 1, 2, 3, 4, 0],
+    ]
+
+    def test_matches_build(self):
+        """Make sure decoding agrees with ReportFactory.build."""
+
+        for report in self.REPORTS:
+            data = array('B', report)
+            self.assertEqual(decode(data), ReportFactory.build(data))
+
+    def test_every_exponent(self):
+        """Make sure weights are scaled exactly like calc_weight does."""
+
+        for exponent in range(256):
+            data = array('B', [3, 4, 3, exponent, 0x39, 0x30])
+            self.assertEqual(
+                decode(data).weight,
+                ReportFactory.calc_weight(exponent, 0x39, 0x30)
+            )
+
+    def test_unknown_codes(self):
+        """Make sure unknown report ids and codes decode to None."""
+
+        self.assertEqual(decode(array('B', [0x42, 0, 0, 0, 0, 0])), None)
+        report = decode(array('B', [3, 0x20, 0x20, 0, 1, 0]))
+        self.assertEqual((report.status, report.unit), (None, None))
+
+    def test_buffers(self):
+        """Make sure any buffer of byte values decodes without copying."""
+
+        data = bytearray([3, 4, 3, 254, 194, 0])
+        report = decode(data)
+        self.assertIs(report.raw, data)
+        self.assertEqual(report.weight, 1.94)
+        self.assertEqual(report.unit, WEIGHT_UNITS[3])
+
+    @unittest.skipIf(sys.version_info < (3,), "memoryview yields str on Python 2")
+    def test_memoryview(self):
+        """Make sure a memoryview over PyUSB's array is decoded in place."""
+
+        data = memoryview(array('B', [3, 4, 12, 254, 254, 1]))
+        self.assertEqual(decode(data).weight, 5.10)
+
+class TestReportCache(unittest.TestCase):
+    def test_decode(self):
+        """Make sure the cache decodes the bytes read like decode does."""
+
+        buffer = array('B', [3, 4, 12, 254, 254, 1, 0, 0])
+        report = ReportCache().decode(buffer, 6)
+        self.assertEqual(report, decode(buffer[:6]))
+
+    def test_shared(self):
+        """Make sure identical reports decode to the same object."""
+
+        cache = ReportCache()
+        buffer = array('B', [3, 4, 12, 254, 254, 1, 0, 0])
+        report = cache.decode(buffer, 6)
+
+        # Bytes past the report's length are left over from earlier reads.
+        buffer[6] = 99
+        self.assertIs(cache.decode(buffer, 6), report)
+
+        buffer[:2] = array('B', [4, 4])
+        self.assertEqual(cache.decode(buffer, 2).type, 4)
+
+    def test_raw_is_a_copy(self):
+        """Make sure reports do not hold on to the buffer read into."""
+
+        buffer = array('B', [3, 4, 12, 254, 254, 1])
+        report = ReportCache().decode(buffer, 6)
+        buffer[4] = 0
+        self.assertIsNot(report.raw, buffer)
+        self.assertEqual(report.raw[4], 254)
+
+    def test_size(self):
+        """Make sure the cache never holds more than `size` reports."""
+
+        cache = ReportCache(size=2)
+        for weight in range(5):
+            cache.decode(array('B', [3, 4, 12, 254, weight, 0]), 6)
+        self.assertLessEqual(len(cache._reports), 2)
+
+    def test_prefix(self):
+        """Make sure a report is not mistaken for a longer one it starts."""
+
+        cache = ReportCache()
+        buffer = array('B', [4, 4, 12, 254, 254, 1])
+        self.assertEqual(len(cache.decode(buffer, 2).raw), 2)
+        self.assertEqual(len(cache.decode(buffer, 6).raw), 6)
+        self.assertEqual(len(cache.decode(buffer, 2).raw), 2)
+
+    @unittest.skipUnless(hasattr(tracemalloc, "reset_peak"),
+            "requires tracemalloc.reset_peak")
+    def test_no_allocations(self):
+        """Make sure decoding a report seen before only allocates its lookup key."""
+
+        cache = ReportCache()
+        buffer = array('B', [3, 4, 12, 254, 254, 1, 0, 0])
+        cache.decode(buffer, 6)
+
+        tracemalloc.start()
+        try:
+            # Counting stays among the small integers Python never allocates.
+            count = 0
+            current = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            while count < 200:
+                cache.decode(buffer, 6)
+                count += 1
+            after, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        # A slice and a bytes key at a time, however many reports are read.
+        self.assertEqual(after, current)
+        self.assertLess(peak - current, 256)
+
+@unittest.skipUnless(numpy, "requires NumPy")
+class TestDecodeBatch(unittest.TestCase):
+    def setUp(self):
+        self.reports = [
+            report + [0] * (6 - len(report)) for report in TestDecode.REPORTS
+        ]
+        self.buffer = bytearray(sum(self.reports, []))
+
+    def test_columns(self):
+        """Make sure the columns agree with decoding reports one by one."""
+
+        batch = decode_batch(self.buffer)
+        self.assertEqual(len(batch), len(self.reports))
+
+        for row, report in enumerate(self.reports):
+            decoded = decode(array('B', report))
+            self.assertEqual(batch.type[row], report[0])
+            if report[0] in (DATA_REPORT, WEIGHT_LIMIT_REPORT):
+                self.assertEqual(batch.weight[row], decoded.weight)
+                self.assertEqual(WEIGHT_UNITS[batch.unit[row]], decoded.unit)
+            else:
+                self.assertTrue(numpy.isnan(batch.weight[row]))
+
+        self.assertEqual(list(batch.status[2:4]), [2, 4])
+
+    def test_rows(self):
+        """Make sure rows decode lazily into the usual named tuples."""
+
+        batch = decode_batch(numpy.array(self.reports, dtype=numpy.uint8))
+        self.assertEqual(batch[3], decode(array('B', self.reports[3])))
+        self.assertEqual(len(list(batch)), len(self.reports))
+
+    def test_no_copy(self):
+        """Make sure the buffer is viewed rather than copied."""
+
+        batch = decode_batch(self.buffer)
+        self.buffer[3 * 6 + 4] = 0
+        self.assertEqual(batch.raw[3, 4], 0)
+
+    def test_partial_report(self):
+        """Make sure a truncated buffer is rejected."""
+
+        self.assertRaises(ValueError, decode_batch, self.buffer[:-1])
@@ -1,8 +1,10 @@
 import unittest
+import usb.core
 import mocks
+from mocks.replay import READY, ReplayDevice, data_report
 from scale_manager import ScaleManager
-from scale import Scale
-from reports import WEIGHT_UNITS
+from scale import Scale, DRAIN_INTERVALS
+from reports import WEIGHT_UNITS, IN_MOTION, STABLE_WEIGHT
 
 KILOS = WEIGHT_UNITS[0x3]
 POUNDS = WEIGHT_UNITS[0xC]
@@ -70,6 +72,14 @@ class TestScale(unittest.TestCase):
         )
         self.assertEqual(scale.device, None)
 
+    def test_device_constructor(self):
+        """Make sure a passed-in device is wrapped instead of searched for."""
+
+        device = self.manager.usb.devices[3]
+        scale = Scale(device=device, device_manager=self.manager)
+        self.assertIs(scale.device, device)
+        self.assertIn("Fake Device of Some Other Stripe", scale.name)
+
     def test_weigh_0_lb(self):
         """Make sure the scale properly weighs zero pounds."""
         with Scale(device_manager=self.manager) as scale:
@@ -101,3 +111,78 @@ class TestScale(unittest.TestCase):
             weighing = scale.weigh(endpoint=self.endpoint)
             self.assertEqual(weighing.weight, 1.94)
             self.assertEqual(weighing.unit, KILOS)
+
+class QuietDevice(mocks.usb_lib.MockDevice):
+    """A scale with no report waiting, sending the next one when read."""
+
+    timeouts = ()
+
+    def read(self, endpoint, size_or_buffer, timeout=None):
+        if timeout is not None:
+            self.timeouts += (timeout,)
+            raise usb.core.USBError("Operation timed out", errno=110)
+        return mocks.usb_lib.MockDevice.read(
+            self, endpoint, size_or_buffer, timeout
+        )
+
+class TestReadLatest(unittest.TestCase):
+    def scale(self, device):
+        manager = ScaleManager(
+            lookup=mocks.usb_ids.USB_IDS,
+            usb_lib=mocks.usb_lib.MockUSBLib(devices=[device])
+        )
+        return Scale(device_manager=manager)
+
+    def test_newest_data_report(self):
+        """Make sure it skips every report waiting but the newest data report."""
+
+        device = ReplayDevice(mocks.usb_ids.FAKE_VDR, mocks.usb_ids.SCALE, [
+            (0, READY), (0, data_report(1.0, IN_MOTION)),
+            (0, READY), (0, data_report(1.94, STABLE_WEIGHT)),
+            (0, READY),
+        ], loop=False)
+
+        latest = self.scale(device).read_latest()
+        self.assertEqual(latest.report.weight, 1.94)
+        self.assertEqual(latest.discarded, 4)
+
+    def test_nothing_waiting(self):
+        """Make sure it waits for the next data report when none is waiting."""
+
+        device = QuietDevice(mocks.usb_ids.FAKE_VDR, mocks.usb_ids.SCALE)
+        latest = self.scale(device).read_latest()
+        self.assertEqual(latest.report.weight, 0)
+        self.assertEqual(latest.discarded, 1)
+
+        # The drain waits long enough for the host to poll the scale.
+        self.assertEqual(device.timeouts, (DRAIN_INTERVALS * 10,))
+
+    def test_max_reports(self):
+        """Make sure a scale that never runs out of reports is drained only so far."""
+
+        device = mocks.usb_lib.MockDevice(
+            mocks.usb_ids.FAKE_VDR, mocks.usb_ids.SCALE
+        )
+        latest = self.scale(device).read_latest(max_reports=5)
+        self.assertEqual(latest.report.unit, POUNDS)
+        self.assertEqual(latest.discarded, 4)
+
+    def test_errors(self):
+        """Make sure errors other than timeouts are raised."""
+
+        device = mocks.usb_lib.MockDevice(
+            mocks.usb_ids.FAKE_VDR, mocks.usb_ids.SCALE
+        )
+        scale = self.scale(device)
+        device.fail_on("read", usb.core.USBError("No such device", errno=19))
+        self.assertRaises(usb.core.USBError, scale.read_latest)
+
+    def test_weigh(self):
+        """Make sure weighing can skip a previous item's stable weight."""
+
+        device = ReplayDevice(mocks.usb_ids.FAKE_VDR, mocks.usb_ids.SCALE, [
+            (0, READY), (0, data_report(5.0, STABLE_WEIGHT)),
+            (0, READY), (0, data_report(1.94, STABLE_WEIGHT)),
+        ], loop=False)
+
+        self.assertEqual(self.scale(device).weigh(latest=True).weight, 1.94)
@@ -55,3 +55,64 @@ class TestScaleManagerFind(unittest.TestCase):
             model="DNE"
         )
         self.assertEqual(device, None)
+
+    def test_find_all(self):
+        """Make sure it finds every scale by default."""
+
+        devices = self.manager.find_all()
+        self.assertEqual(
+            [(device.idVendor, device.idProduct) for device in devices],
+            [(mocks.usb_ids.FAUX_MFR, mocks.usb_ids.SCALE),
+             (mocks.usb_ids.FAKE_VDR, mocks.usb_ids.SCALE)]
+        )
+
+    def test_find_all_vendor(self):
+        """Make sure it finds every device by a manufacturer."""
+
+        devices = self.manager.find_all(manufacturer="Fake Vendor")
+        self.assertEqual(len(devices), 2)
+        self.assertEqual(self.manager.find_all(model="DNE"), [])
+
+    def test_find_ignores_case(self):
+        """Make sure names are matched ignoring case."""
+
+        device = self.manager.find(manufacturer="fake vendor", model="FAKE SCALE")
+        self.assertEqual(device.idVendor, mocks.usb_ids.FAKE_VDR)
+        self.assertEqual(device.idProduct, mocks.usb_ids.SCALE)
+
+    def test_find_prefix(self):
+        """Make sure a name prefix finds the device it starts."""
+
+        device = self.manager.find(model="Fake Device")
+        self.assertEqual(device.idVendor, mocks.usb_ids.FAKE_VDR)
+        self.assertEqual(device.idProduct, mocks.usb_ids.OTHER)
+
+    def test_find_pushes_ids_down(self):
+        """Make sure names are turned into ids before enumerating the bus."""
+
+        calls = []
+        usb = self.manager.usb
+        find = usb.find
+
+        def spy(**kwargs):
+            calls.append(kwargs)
+            return find(**kwargs)
+
+        usb.find = spy
+        self.manager.find(manufacturer="Faux Manufacturer", model="Faux Scale")
+        self.assertEqual(calls, [{
+            "find_all": True,
+            "idVendor": mocks.usb_ids.FAUX_MFR,
+            "idProduct": mocks.usb_ids.SCALE
+        }])
+
+        self.assertEqual(self.manager.find(model="DNE"), None)
+        self.assertEqual(len(calls), 1)
+
+    def test_matches(self):
+        """Make sure `matches` agrees with `find`."""
+
+        scale, other = self.manager.usb.devices[2:4]
+        self.assertTrue(self.manager.matches(scale))
+        self.assertFalse(self.manager.matches(other))
+        self.assertTrue(self.manager.matches(other, manufacturer="Fake Vendor"))
@@ -0,0 +1,58 @@
+import unittest
+from threading import Thread
+from readings import monotonic
+from scheduler import PollScheduler
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+class TestPollScheduler(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.scheduler = PollScheduler(backoff=0.1, max_interval=1.0,
+                factor=2, active_period=10, clock=self.clock)
+
+    def test_backoff(self):
+        """Make sure unchanged readings back off exponentially, up to a cap."""
+
+        intervals = [self.scheduler.update(False) for i in range(6)]
+        self.assertEqual(intervals, [0.1, 0.2, 0.4, 0.8, 1.0, 1.0])
+
+    def test_changes(self):
+        """Make sure a changing weight is read at full rate."""
+
+        for i in range(3):
+            self.scheduler.update(False)
+        self.assertEqual(self.scheduler.update(True), 0)
+        self.assertEqual(self.scheduler.update(False), 0.1)
+
+    def test_active(self):
+        """Make sure clients keep the scheduler at full rate for a while."""
+
+        self.scheduler.update(False)
+        self.scheduler.touch()
+        self.assertEqual(self.scheduler.interval, 0)
+        self.assertTrue(self.scheduler.active)
+        self.assertEqual(self.scheduler.update(False), 0)
+
+        self.clock.now = 10
+        self.assertFalse(self.scheduler.active)
+        self.assertEqual(self.scheduler.update(False), 0.1)
+
+    def test_wake(self):
+        """Make sure waking cuts a wait short."""
+
+        scheduler = PollScheduler(backoff=30)
+        scheduler.update(False)
+        thread = Thread(target=scheduler.wait)
+        start = monotonic()
+        thread.start()
+        scheduler.wake()
+        thread.join(5)
+
+        self.assertFalse(thread.is_alive())
+        self.assertTrue(monotonic() - start < 5)
@@ -0,0 +1,88 @@
+import unittest
+import usb.core
+import mocks
+from scale_manager import ScaleManager
+from scale import Scale
+from session import ScaleSession, CONNECTED, DISCONNECTED, ERROR
+
+class TestScaleSession(unittest.TestCase):
+    def setUp(self):
+        self.manager = ScaleManager(
+            lookup=mocks.usb_ids.USB_IDS,
+            usb_lib=mocks.usb_lib.MockUSBLib()
+        )
+        self.endpoint = mocks.usb_lib.MockEndpoint(0, 0)
+        self.scales = []
+        self.statuses = []
+
+    def factory(self):
+        scale = Scale(device_manager=self.manager)
+        self.scales.append(scale)
+        return scale
+
+    def on_status(self, state, message):
+        self.statuses.append(state)
+
+    def test_stays_connected(self):
+        """Make sure many readings share a single connection."""
+
+        session = ScaleSession(self.factory)
+        for _ in range(5):
+            weighing = session.weigh(endpoint=self.endpoint)
+            self.assertEqual(weighing.weight, 0)
+
+        self.assertEqual(len(self.scales), 1)
+        self.assertEqual(self.scales[0].device.resets, 0)
+        self.assertEqual(session.state, CONNECTED)
+
+    def test_reconnects_after_error(self):
+        """Make sure an I/O error releases the scale and the next read reconnects."""
+
+        session = ScaleSession(self.factory, on_status=self.on_status)
+        session.weigh(endpoint=self.endpoint)
+        device = self.scales[0].device
+
+        device.fail_on("read", IOError("No such device"))
+        self.assertRaises(IOError, session.weigh, endpoint=self.endpoint)
+        self.assertFalse(session.connected)
+        self.assertEqual(session.state, ERROR)
+        self.assertEqual(device.resets, 1)
+
+        device.fail_on("read")
+        weighing = session.weigh(endpoint=self.endpoint)
+        self.assertEqual(weighing.weight, 0)
+        self.assertEqual(len(self.scales), 2)
+        self.assertEqual(self.statuses[-1], CONNECTED)
+
+    def test_timeout_keeps_scale(self):
+        """Make sure a read timing out leaves the scale claimed."""
+
+        session = ScaleSession(self.factory, on_status=self.on_status)
+        session.weigh(endpoint=self.endpoint)
+        device = self.scales[0].device
+
+        device.fail_on("read", usb.core.USBError("Operation timed out", errno=110))
+        self.assertRaises(usb.core.USBError, session.read, endpoint=self.endpoint)
+        self.assertTrue(session.connected)
+        self.assertEqual(session.state, CONNECTED)
+        self.assertEqual(device.resets, 0)
+
+        device.fail_on("read")
+        self.assertEqual(session.weigh(endpoint=self.endpoint).weight, 0)
+        self.assertEqual(len(self.scales), 1)
+
+    def test_no_scale(self):
+        """Make sure a missing scale leaves the session disconnected."""
+
+        session = ScaleSession(lambda: None)
+        self.assertEqual(session.weigh(endpoint=self.endpoint), None)
+        self.assertEqual(session.state, DISCONNECTED)
+
+    def test_close_is_idempotent(self):
+        """Make sure the device is only reset once however often it is released."""
+
+        with ScaleSession(self.factory) as session:
+            scale = session.scale
+
+        scale.disconnect()
+        self.assertEqual(scale.device.resets, 1)
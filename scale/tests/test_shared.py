@@ -0,0 +1,253 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from multiprocessing import Process
+from threading import Event, Thread
+from registry import ScaleSnapshot
+from reports import DataReport, DATA_REPORT, STATUSES, STABLE_WEIGHT
+from session import CONNECTED
+from shared import (OwnerLock, SharedError, SharedPublisher, SharedSnapshots,
+        VERSION, HEADER)
+
+STABLE = STATUSES[STABLE_WEIGHT]
+
+def snapshot(weight, seq, tare=0):
+    report = DataReport(DATA_REPORT, None, STABLE, "kilogram", weight)
+    return ScaleSnapshot(report, tare, CONNECTED, seq, 1000.0 + seq)
+
+def publish_forever(path, count):
+    # Publishes snapshots whose tare always equals their weight.
+    shared = SharedSnapshots(path)
+    for seq in range(1, count + 1):
+        shared.publish("001-004", snapshot(seq / 100.0, seq, seq / 100.0))
+
+class FakeWorker(object):
+    def __init__(self):
+        self.calls = []
+
+    def set_tare(self):
+        self.calls.append("set_tare")
+
+    def clear_tare(self):
+        self.calls.append("clear_tare")
+
+    def wake(self):
+        self.calls.append("wake")
+
+class FakeRegistry(object):
+    def __init__(self, workers):
+        self.workers = workers
+
+    def ids(self):
+        return list(self.workers)
+
+    def get(self, id=None):
+        return self.workers.get(id)
+
+class TestSharedSnapshots(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "snapshots")
+        self.owner = SharedSnapshots(self.path)
+        self.owner.claim()
+        self.reader = SharedSnapshots(self.path)
+
+    def tearDown(self):
+        self.owner.close()
+        self.reader.close()
+        shutil.rmtree(self.directory)
+
+    def test_publish(self):
+        """Make sure other mappings see the snapshots published."""
+
+        self.assertIsNone(self.reader.get())
+        self.owner.publish("001-004", ScaleSnapshot(None, 0, CONNECTED, 0, None))
+        self.owner.publish("001-005", snapshot(1.94, 7, tare=0.5))
+
+        self.assertEqual(self.reader.ids(), ["001-004", "001-005"])
+        self.assertEqual(self.reader.get(), (None, 0, CONNECTED, 0, None))
+
+        shared = self.reader.get("001-005")
+        self.assertEqual(shared, snapshot(1.94, 7, tare=0.5))
+        self.assertAlmostEqual(shared.weight, 1.44)
+        self.assertEqual(self.reader.owner, os.getpid())
+
+        self.owner.remove("001-004")
+        self.assertEqual(self.reader.ids(), ["001-005"])
+        self.assertEqual(self.reader.get().seq, 7)
+
+    def test_full(self):
+        """Make sure publishing more scales than there are slots fails."""
+
+        owner = SharedSnapshots(os.path.join(self.directory, "small"), slots=1)
+        owner.publish("001-004", snapshot(1, 1))
+        self.assertRaises(SharedError, owner.publish, "001-005", snapshot(1, 1))
+        self.assertRaises(SharedError, SharedSnapshots, owner.path, slots=2)
+        owner.close()
+
+    def test_reset(self):
+        """Make sure the owner can make over a file of another layout."""
+
+        self.owner.publish("001-004", snapshot(1, 1))
+        self.assertRaises(SharedError, SharedSnapshots, self.path, slots=2)
+
+        owner = SharedSnapshots(self.path, slots=2, reset=True)
+        self.assertEqual(owner.owner, 0)
+        self.assertIsNone(owner.get())
+        owner.claim()
+        owner.publish("001-005", snapshot(2, 1))
+        reader = SharedSnapshots(self.path, slots=2)
+        self.assertEqual(reader.ids(), ["001-005"])
+        reader.close()
+        owner.close()
+
+    def test_torn_write(self):
+        """Make sure a slot left half-written is not read."""
+
+        self.owner.publish("001-004", snapshot(1, 1))
+        VERSION.pack_into(self.owner._map, HEADER.size, 3)
+        self.assertRaises(SharedError, self.reader.get)
+
+        # The next owner clears it.
+        self.owner.claim()
+        self.assertIsNone(self.reader.get())
+
+    def test_concurrent(self):
+        """Make sure readers never see a snapshot being written."""
+
+        writer = Process(target=publish_forever, args=(self.path, 20000))
+        writer.start()
+        try:
+            seen = 0
+            while writer.is_alive() or not seen:
+                shared = self.reader.get()
+                if shared is not None:
+                    self.assertEqual(shared.report.weight, shared.tare)
+                    self.assertAlmostEqual(shared.tare * 100, shared.seq)
+                    seen += 1
+        finally:
+            writer.join(10)
+
+        self.assertEqual(self.reader.get().seq, 20000)
+
+    def test_stale(self):
+        """Make sure snapshots are not read once the owner stops beating."""
+
+        reader = SharedSnapshots(self.path, stale_after=0.05)
+        self.addCleanup(reader.close)
+        self.owner.publish("001-004", snapshot(1.0, 1))
+        self.assertEqual(reader.get().seq, 1)
+
+        time.sleep(0.1)
+        self.assertTrue(reader.stale)
+        self.assertIsNone(reader.get())
+        self.assertIsNone(reader.wait_since(seq=0, timeout=0.02))
+        self.assertEqual(self.reader.get().seq, 1)
+
+        self.owner.beat()
+        self.assertEqual(reader.wait_since(seq=0, timeout=0.02).seq, 1)
+
+    def test_wait_for_change(self):
+        """Make sure waiting returns once the weight changes."""
+
+        self.owner.publish("001-004", snapshot(1.0, 1))
+        self.assertEqual(self.reader.wait_for_change(seq=0).seq, 1)
+        self.assertIsNone(self.reader.wait_for_change(seq=1, timeout=0.02))
+
+        # Newer readings of the same weight are not a change, even once the
+        # reading waited from was overwritten, but they are new readings.
+        self.owner.publish("001-004", snapshot(1.0, 2))
+        self.assertIsNone(self.reader.wait_for_change(seq=1, timeout=0.02))
+        self.assertEqual(self.reader.wait_since(seq=1, timeout=0.02).seq, 2)
+
+        # Neither are changes of the tare or state alone.
+        self.owner.publish("001-004", snapshot(1.0, 2, tare=1.0))
+        self.assertIsNone(self.reader.wait_for_change(seq=1, timeout=0.02))
+
+        self.owner.publish("001-004", snapshot(2.0, 3))
+        self.owner.publish("001-004", snapshot(2.0, 4))
+        self.assertEqual(self.reader.wait_for_change(seq=1, timeout=0.02).seq, 4)
+        self.assertIsNone(self.reader.wait_for_change(seq=3, timeout=0.02))
+
+    def test_wait_for_change_blocks(self):
+        """Make sure waiting blocks until a later reading changes the weight."""
+
+        self.owner.publish("001-004", snapshot(1.0, 1))
+        waiting = Event()
+
+        def publish():
+            waiting.wait(5)
+            self.owner.publish("001-004", snapshot(1.0, 2))
+            time.sleep(0.02)
+            self.owner.publish("001-004", snapshot(2.0, 3))
+
+        # The thread only publishes once the wait has read reading 1.
+        find = self.reader._find
+        def found(id):
+            fields = find(id)
+            waiting.set()
+            return fields
+        self.reader._find = found
+
+        thread = Thread(target=publish)
+        thread.start()
+        try:
+            self.assertEqual(self.reader.wait_for_change(seq=1, timeout=5).seq, 3)
+        finally:
+            waiting.set()
+            thread.join(5)
+
+    def test_requests(self):
+        """Make sure the owner's workers act on other processes' requests."""
+
+        worker = FakeWorker()
+        publisher = SharedPublisher(FakeRegistry({"001-004": worker}),
+                self.owner)
+        self.owner.publish("001-004", snapshot(1.0, 1))
+        self.owner.publish("001-005", snapshot(1.0, 1))
+
+        publisher.poll()
+        self.assertEqual(worker.calls, [])
+
+        self.assertTrue(self.reader.request_tare())
+        self.assertTrue(self.reader.wake("001-004"))
+        self.assertFalse(self.reader.request_clear_tare("002-001"))
+        publisher.poll()
+        self.assertEqual(worker.calls, ["set_tare", "wake"])
+
+        # Scales the registry no longer has are removed.
+        self.assertEqual(self.reader.ids(), ["001-004"])
+
+    def test_publisher_thread(self):
+        """Make sure the publisher thread stops and can be joined."""
+
+        publisher = SharedPublisher(FakeRegistry({}), self.owner,
+                interval=0.01)
+        publisher.start()
+        publisher.stop()
+        publisher.join(5)
+        self.assertFalse(publisher.is_alive())
+        self.assertGreater(self.reader.heartbeat, 0)
+
+class TestOwnerLock(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "lock")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_exclusive(self):
+        """Make sure only one holder at a time gets the lock."""
+
+        first, second = OwnerLock(self.path), OwnerLock(self.path)
+        self.assertTrue(first.acquire())
+        self.assertTrue(first.acquire())
+        self.assertFalse(second.acquire())
+        self.assertFalse(second.held)
+
+        first.release()
+        self.assertTrue(second.acquire())
+        second.release()
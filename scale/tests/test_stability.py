@@ -0,0 +1,123 @@
+import random
+import unittest
+import mocks
+from mocks.replay import ReplayDevice, data_report, waveform, READY
+from reports import decode, STATUSES, ZERO_WEIGHT, IN_MOTION, STABLE_WEIGHT
+from scale import Scale
+from scale_manager import ScaleManager
+from stability import StabilityFilter
+
+def report(counts, status=IN_MOTION, unit=0x3, exponent=-2):
+    return decode(data_report(counts * 10.0 ** exponent, status, unit, exponent))
+
+class TestStabilityFilter(unittest.TestCase):
+    def test_window(self):
+        """Make sure the weight is stable once the window settles."""
+
+        stability = StabilityFilter(window=3, tolerance=1)
+        results = [stability.update(report(counts))
+                for counts in [100, 180, 195, 194, 195, 194, 210]]
+
+        self.assertEqual(results,
+                [False, False, False, False, True, True, False])
+        self.assertEqual(stability.spread, 16)
+
+    def test_statistics(self):
+        """Make sure windowed statistics match a direct computation."""
+
+        stability = StabilityFilter(window=7)
+        rng = random.Random(1)
+        values = [rng.randint(0, 500) for i in range(200)]
+
+        for i, value in enumerate(values):
+            stability.update(report(value))
+            window = values[max(0, i - 6):i + 1]
+            mean = sum(window) / float(len(window))
+            variance = sum((x - mean) ** 2 for x in window) / len(window)
+
+            self.assertEqual(stability.spread, max(window) - min(window))
+            self.assertAlmostEqual(stability.mean, mean)
+            self.assertAlmostEqual(stability.variance, variance)
+
+    def test_max_deviation(self):
+        """Make sure a standard deviation limit can reject a settled window."""
+
+        loose = StabilityFilter(window=4, tolerance=4)
+        strict = StabilityFilter(window=4, tolerance=4, max_deviation=1)
+
+        for counts in [100, 104, 100, 104]:
+            loose.update(report(counts))
+            strict.update(report(counts))
+
+        self.assertTrue(loose.stable)
+        self.assertFalse(strict.stable)
+
+    def test_unit_change(self):
+        """Make sure weights in another unit start a new window."""
+
+        stability = StabilityFilter(window=2)
+        stability.update(report(100, unit=0x3))
+        self.assertTrue(stability.update(report(100, unit=0x3)))
+        self.assertFalse(stability.update(report(100, unit=0xC)))
+
+    def test_filter(self):
+        """Make sure statuses are overruled both ways, faults are not."""
+
+        stability = StabilityFilter(window=2)
+
+        early = stability.filter(report(0, status=IN_MOTION))
+        self.assertEqual(early.status, STATUSES[IN_MOTION])
+
+        zero = stability.filter(report(0, status=IN_MOTION))
+        self.assertEqual(zero.status, STATUSES[ZERO_WEIGHT])
+
+        false = stability.filter(report(50, status=STABLE_WEIGHT))
+        self.assertEqual(false.status, STATUSES[IN_MOTION])
+        self.assertEqual(false.weight, 0.5)
+
+        fault = stability.filter(report(50, status=0x6))
+        self.assertEqual(fault.status, STATUSES[0x6])
+
+        status = decode([4, 4])
+        self.assertIs(stability.filter(status), status)
+
+    def test_weigh(self):
+        """Make sure `weigh` can return before the scale reports stability."""
+
+        reports = [(0, data) for data in (
+            READY, data_report(1.90, IN_MOTION),
+            READY, data_report(1.94, IN_MOTION),
+            READY, data_report(1.94, IN_MOTION),
+            READY, data_report(1.94, IN_MOTION),
+            READY, data_report(1.94, STABLE_WEIGHT),
+        )]
+        device = ReplayDevice(mocks.usb_ids.FAKE_VDR, mocks.usb_ids.SCALE,
+                reports, loop=False)
+        manager = ScaleManager(
+            lookup=mocks.usb_ids.USB_IDS,
+            usb_lib=mocks.usb_lib.MockUSBLib(devices=[device])
+        )
+        endpoint = mocks.usb_lib.MockEndpoint(0, 0)
+
+        with Scale(device_manager=manager) as scale:
+            weighing = scale.weigh(endpoint=endpoint,
+                    stability=StabilityFilter(window=2))
+            self.assertEqual(weighing.weight, 1.94)
+            self.assertEqual(weighing.status, STATUSES[STABLE_WEIGHT])
+            self.assertEqual(device.reads, 6)
+
+    def test_weigh_waveform(self):
+        """Make sure the settling oscillation is not taken for stability."""
+
+        device = ReplayDevice(mocks.usb_ids.FAKE_VDR, mocks.usb_ids.SCALE,
+                waveform(empty=0), loop=False)
+        manager = ScaleManager(
+            lookup=mocks.usb_ids.USB_IDS,
+            usb_lib=mocks.usb_lib.MockUSBLib(devices=[device])
+        )
+        endpoint = mocks.usb_lib.MockEndpoint(0, 0)
+
+        with Scale(device_manager=manager) as scale:
+            weighing = scale.weigh(endpoint=endpoint, max_attempts=200,
+                    stability=StabilityFilter(window=8))
+            self.assertEqual(weighing.weight, 1.94)
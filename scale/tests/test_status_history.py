@@ -0,0 +1,54 @@
+import unittest
+from status_history import StatusHistory
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        self.now += 1
+        return self.now
+
+class TestStatusHistory(unittest.TestCase):
+    def setUp(self):
+        self.history = StatusHistory("connecting", size=3, clock=FakeClock())
+
+    def test_deduplication(self):
+        """Make sure a recurring message is counted rather than repeated."""
+
+        for i in range(100):
+            self.history.record("error", "Pipe error")
+            self.history.record("error", "Timeout")
+
+        self.assertEqual(self.history.messages(), ["Pipe error", "Timeout"])
+        entries = self.history.entries()
+        self.assertEqual([entry["count"] for entry in entries], [100, 100])
+        self.assertEqual(entries[0]["first_seen"], 1002)
+        self.assertEqual(entries[0]["last_seen"], 1200)
+
+    def test_bounded(self):
+        """Make sure the least recently seen messages are forgotten first."""
+
+        for message in ["a", "b", "c", "a", "d"]:
+            self.history.record("error", message)
+
+        self.assertEqual(len(self.history), 3)
+        self.assertEqual(self.history.messages(), ["c", "a", "d"])
+        self.assertEqual(self.history.messages(limit=2), ["a", "d"])
+
+    def test_status_change(self):
+        """Make sure messages are shown under the status they came with."""
+
+        self.history.record("error", "Pipe error")
+        self.history.record("connected", "Connected to Fake Scale")
+        self.assertEqual(self.history.snapshot(), {
+            "status": "connected", "messages": ["Connected to Fake Scale"]
+        })
+
+        # An error seen before the scale connected is not current again
+        # until it recurs.
+        self.history.record("error")
+        self.assertEqual(self.history.messages(), [])
+        self.history.record("error", "Pipe error")
+        self.assertEqual(self.history.messages(), ["Pipe error"])
+        self.assertEqual(self.history.entries()[-1]["count"], 2)
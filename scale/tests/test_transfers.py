@@ -0,0 +1,159 @@
+import unittest
+import usb.core
+import mocks
+from array import array
+from scale import Scale
+from scale_manager import ScaleManager
+from transfers import TransferQueue, ETIMEDOUT, ENODEV
+
+ZERO_KG = [3, 2, 3, 254, 0, 0]
+KG_1_94 = [3, 4, 3, 254, 194, 0]
+READY = [4, 4]
+
+class TestTransferQueue(unittest.TestCase):
+    def setUp(self):
+        self.device = mocks.usb_lib.MockDevice(
+            mocks.usb_ids.FAKE_VDR, mocks.usb_ids.SCALE
+        )
+        self.endpoint = mocks.usb_lib.MockEndpoint(0x81, 8)
+        self.libusb = mocks.libusb1.MockLibUSB1()
+
+    def open(self, depth=4, backlog=256):
+        queue = TransferQueue(self.device, self.endpoint, depth=depth,
+                backlog=backlog, libusb=self.libusb)
+        self.addCleanup(queue.close)
+        return queue.open()
+
+    def test_submits_depth_transfers(self):
+        """Make sure `depth` transfers are waiting for the scale once opened."""
+
+        queue = self.open(depth=3)
+        self.assertTrue(self.libusb.claimed)
+        self.assertEqual(queue.submitted, 3)
+        self.assertEqual(len(self.libusb.pending), 3)
+        self.assertEqual(
+            [transfer.endpoint for transfer in self.libusb.transfers],
+            [0x81] * 3
+        )
+
+    def test_reports_in_order(self):
+        """Make sure reports are read in the order they arrived."""
+
+        self.libusb.reports.extend([READY, ZERO_KG, READY, KG_1_94, READY])
+        queue = self.open(depth=2)
+
+        self.assertEqual(
+            [queue.read(timeout=0.1) for i in range(5)],
+            [array('B', report)
+                for report in [READY, ZERO_KG, READY, KG_1_94, READY]]
+        )
+        self.assertEqual(queue.received, 5)
+
+    def test_recycles_transfers(self):
+        """Make sure completed transfers are resubmitted, not replaced."""
+
+        self.libusb.reports.extend([ZERO_KG] * 10)
+        queue = self.open(depth=2)
+        for i in range(10):
+            queue.read(timeout=0.1)
+
+        self.assertEqual(len(self.libusb.transfers), 2)
+        self.assertEqual(queue.submitted, 2)
+        self.assertEqual(
+            sum(transfer.submissions for transfer in self.libusb.transfers),
+            12
+        )
+
+    def test_timeout(self):
+        """Make sure it raises a timeout error when no report arrives."""
+
+        queue = self.open()
+        with self.assertRaises(usb.core.USBError) as raised:
+            queue.read(timeout=0.02)
+        self.assertEqual(raised.exception.errno, ETIMEDOUT)
+
+    def test_zero_timeout(self):
+        """Make sure a zero timeout still returns a report that has arrived."""
+
+        self.libusb.reports.append(KG_1_94)
+        queue = self.open()
+        self.assertEqual(queue.read(timeout=0), array('B', KG_1_94))
+
+        with self.assertRaises(usb.core.USBError) as raised:
+            queue.read(timeout=0)
+        self.assertEqual(raised.exception.errno, ETIMEDOUT)
+
+    def test_failed_transfer(self):
+        """Make sure a failed transfer is raised once the reports before it are read."""
+
+        self.libusb.reports.extend([ZERO_KG, self.libusb.TRANSFER_NO_DEVICE])
+        queue = self.open(depth=2)
+
+        self.assertEqual(queue.read(timeout=0.1), array('B', ZERO_KG))
+        with self.assertRaises(usb.core.USBError) as raised:
+            queue.read(timeout=0.1)
+        self.assertEqual(raised.exception.errno, ENODEV)
+
+    def test_timed_out_transfer(self):
+        """Make sure a transfer timing out is simply resubmitted."""
+
+        self.libusb.reports.extend([self.libusb.TRANSFER_TIMED_OUT, KG_1_94])
+        queue = self.open(depth=1)
+
+        self.assertEqual(queue.read(timeout=0.1), array('B', KG_1_94))
+        self.assertEqual(queue.submitted, 1)
+
+    def test_backlog(self):
+        """Make sure the oldest reports are dropped beyond the backlog."""
+
+        self.libusb.reports.extend([[3, 2, 3, 254, i, 0] for i in range(6)])
+        queue = self.open(depth=2, backlog=3)
+
+        queue._context.handleEventsTimeout(0)
+        self.assertEqual(queue.received, 6)
+        self.assertEqual(queue.dropped, 3)
+        self.assertEqual(queue.read(timeout=0.1)[4], 3)
+
+    def test_close(self):
+        """Make sure closing cancels every transfer and releases the scale."""
+
+        queue = self.open()
+        queue.close()
+
+        self.assertEqual(queue.submitted, 0)
+        self.assertFalse(self.libusb.pending)
+        self.assertFalse(self.libusb.claimed)
+        self.assertTrue(self.libusb.closed)
+
+    def test_no_device(self):
+        """Make sure opening fails when the scale is not on the bus."""
+
+        self.libusb.address = 2
+        queue = TransferQueue(self.device, self.endpoint, libusb=self.libusb)
+        with self.assertRaises(usb.core.USBError) as raised:
+            queue.open()
+        self.assertEqual(raised.exception.errno, ENODEV)
+        self.assertTrue(self.libusb.closed)
+
+    def test_scale(self):
+        """Make sure a Scale reads through its transfer queue."""
+
+        self.libusb.reports.extend([READY, KG_1_94])
+        manager = ScaleManager(
+            lookup=mocks.usb_ids.USB_IDS,
+            usb_lib=mocks.usb_lib.MockUSBLib()
+        )
+        scale = Scale(device=self.device, device_manager=manager,
+            transfers=lambda device, endpoint: TransferQueue(
+                device, endpoint, libusb=self.libusb).open()
+        )
+
+        self.assertEqual(scale.weigh().weight, 1.94)
+        self.assertTrue(self.libusb.claimed)
+
+        scale.disconnect()
+        self.assertFalse(self.libusb.claimed)
+        self.assertTrue(self.libusb.closed)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,116 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+import mocks
+import usb_ids
+import usb_ids_db
+from name_index import NameIndex
+from scale_manager import ScaleManager
+from usb_ids_db import UsbIdDatabase, compile_lookup, load
+
+class TestUsbIdDatabase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.path = os.path.join(self.directory, "usb_ids.bin")
+        compile_lookup(mocks.usb_ids.USB_IDS, self.path)
+        self.db = UsbIdDatabase(self.path)
+        self.addCleanup(self.db.close)
+
+    def test_lookup(self):
+        """Make sure names are found the same way as in the dictionary."""
+
+        vendor = self.db[mocks.usb_ids.FAKE_VDR]
+        self.assertEqual(vendor["name"], "Fake Vendor")
+        self.assertEqual(vendor[mocks.usb_ids.SCALE], "Fake Scale")
+        self.assertIn(mocks.usb_ids.OTHER, vendor)
+        self.assertNotIn(0x1234, vendor)
+        self.assertRaises(KeyError, lambda: vendor[0x1234])
+        self.assertNotIn(0x1234, self.db)
+        self.assertRaises(KeyError, lambda: self.db[0x1234])
+        self.assertEqual(sorted(self.db), sorted(mocks.usb_ids.USB_IDS))
+
+    def test_scale_manager(self):
+        """Make sure ScaleManager works on top of the compiled table."""
+
+        manager = ScaleManager(
+            lookup=self.db,
+            usb_lib=mocks.usb_lib.MockUSBLib()
+        )
+        device = manager.find(manufacturer="Fake Vendor", model="Fake Scale")
+        self.assertEqual(device.idVendor, mocks.usb_ids.FAKE_VDR)
+        self.assertEqual(manager.get_model(device), "Fake Scale")
+
+    def test_name_index(self):
+        """Make sure the compiled name index finds what a NameIndex finds."""
+
+        lookup = dict(mocks.usb_ids.USB_IDS)
+        lookup[0x0005] = {"name": "Fake Vendor, Without Products"}
+        lookup[0x0006] = {0x0001: "Nameless Scale"}
+        path = os.path.join(self.directory, "names.bin")
+        compile_lookup(lookup, path)
+        db = UsbIdDatabase(path)
+        self.addCleanup(db.close)
+
+        index, expected = db.name_index(), NameIndex(lookup)
+        self.assertIs(db.name_index(), index)
+        self.assertEqual(index.candidates(), expected.candidates())
+        for name in ("Fake Vendor", "fake", "F", "Nameless", "DNE"):
+            self.assertEqual(index.vendors(name), expected.vendors(name))
+        for name in ("Fake Scale", "fake", "Faux D", "NAMELESS SCALE", "DNE"):
+            self.assertEqual(index.products(name), expected.products(name))
+
+        manager = ScaleManager(lookup=db, usb_lib=mocks.usb_lib.MockUSBLib())
+        self.assertIs(manager.index, index)
+
+    def test_full_table(self):
+        """Make sure every entry of USB_IDS survives compilation."""
+
+        path = os.path.join(self.directory, "full.bin")
+        compile_lookup(usb_ids.USB_IDS, path)
+        db = UsbIdDatabase(path)
+        self.addCleanup(db.close)
+
+        self.assertEqual(len(db), len(usb_ids.USB_IDS))
+        for vendor_id, products in usb_ids.USB_IDS.items():
+            for product_id, name in products.items():
+                if isinstance(name, int):
+                    name = "%x" % name
+                self.assertEqual(db[vendor_id][product_id], name)
+
+    def test_load_rebuilds_stale_table(self):
+        """Make sure `load` builds the table when it is missing or stale."""
+
+        source = os.path.join(self.directory, "usb_ids.py")
+        open(source, "w").close()
+        path = os.path.join(self.directory, "built.bin")
+
+        db = load(path, source)
+        self.addCleanup(db.close)
+        self.assertTrue(os.path.exists(path))
+        self.assertIn(0x046d, db)
+        self.assertIs(load(path, source), db)
+
+        built = os.path.getmtime(path)
+        later = time.time() + 10
+        os.utime(source, (later, later))
+        usb_ids_db._loaded.clear()
+        load(path, source).close()
+        self.assertNotEqual(os.path.getmtime(path), built)
+
+    def test_load_rebuilds_old_format(self):
+        """Make sure `load` rebuilds a table built by an older version."""
+
+        source = os.path.join(self.directory, "usb_ids.py")
+        open(source, "w").close()
+        path = os.path.join(self.directory, "old.bin")
+        with open(path, "wb") as handle:
+            handle.write(b"USBIDS1\0" + b"\0" * 8)
+        later = time.time() + 10
+        os.utime(path, (later, later))
+
+        db = load(path, source)
+        self.addCleanup(db.close)
+        self.assertIn(0x046d, db)
@@ -0,0 +1,209 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# vim: set fileencoding=utf-8 :
+from array import array
+from collections import deque
+import usb.core
+from readings import monotonic
+
+# errno values PyUSB gives the errors TransferQueue raises.
+ETIMEDOUT = 110
+ENODEV = 19
+
+class TransferQueue(object):
+    """Keeps asynchronous interrupt transfers queued on a scale's endpoint."""
+
+    def __init__(self, device, endpoint, depth=4, backlog=256, libusb=None):
+        """
+        Reads the interrupt-IN `endpoint` of `device`, both PyUSB
+        objects, with `depth` libusb transfers always submitted, so the
+        scale has somewhere to put a report whenever it sends one, even
+        while the previous one is being decoded. Each transfer is
+        submitted again, with the same buffer, as soon as it completes.
+
+        Reports are handed out by `read` in the order they arrived. At
+        most `backlog` of them wait to be read; beyond that the oldest
+        are dropped, and counted in `dropped`.
+
+        Requires python-libusb1; see `available`. `libusb` is the usb1
+        module, for testing.
+
+        """
+        self._device = device
+        self._address = endpoint.bEndpointAddress
+        self._length = endpoint.wMaxPacketSize
+        self._depth = depth
+        self._libusb = libusb
+        self._context = None
+        self._handle = None
+        self._transfers = []
+        self._submitted = 0
+        self._reports = deque(maxlen=backlog)
+        self._received = 0
+        self._read = 0
+        self._error = None
+        self._closing = False
+
+
+    ### Read-only public properties ###
+
+    @property
+    def depth(self):
+        return self._depth
+
+    @property
+    def submitted(self):
+        """How many transfers are waiting for the scale right now."""
+        return self._submitted
+
+    @property
+    def received(self):
+        """How many reports arrived since `open`."""
+        return self._received
+
+    @property
+    def dropped(self):
+        """How many reports were dropped because nobody read them in time."""
+        return max(0, self._received - len(self._reports) - self._read)
+
+
+    ### Public methods ###
+
+    @staticmethod
+    def available():
+        """Returns True if python-libusb1 is installed."""
+        try:
+            import usb1
+        except ImportError:
+            return False
+        return True
+
+    def open(self):
+        """Claims the scale's interface and submits the transfers."""
+        libusb = self._libusb
+        if libusb is None:
+            import usb1 as libusb
+            self._libusb = libusb
+
+        self._closing = False
+        self._context = libusb.USBContext()
+        try:
+            self._handle = self._open_device()
+            self._handle.claimInterface(0)
+
+            for i in range(self._depth):
+                transfer = self._handle.getTransfer()
+                transfer.setInterrupt(self._address, self._length,
+                        callback=self._completed, timeout=0)
+                self._transfers.append(transfer)
+
+            for transfer in self._transfers:
+                transfer.submit()
+                self._submitted += 1
+        except Exception:
+            self.close()
+            raise
+
+        return self
+
+    def read(self, timeout=1):
+        """
+        Returns the oldest report not read yet, as an array of bytes,
+        waiting up to `timeout` seconds for one to arrive. Raises
+        usb.core.USBError if it does not, or if the transfers failed.
+
+        """
+        deadline = monotonic() + timeout
+        handled = False
+
+        while not self._reports:
+            if self._error is not None:
+                raise self._error
+
+            # Even without time left, transfers already completed are
+            # handled once, so a zero timeout reads without waiting.
+            remaining = deadline - monotonic()
+            if handled and remaining <= 0:
+                raise usb.core.USBError("Operation timed out", errno=ETIMEDOUT)
+            self._context.handleEventsTimeout(max(remaining, 0))
+            handled = True
+
+        self._read += 1
+        return self._reports.popleft()
+
+    def close(self):
+        """Cancels the transfers and releases the scale's interface."""
+        self._closing = True
+        for transfer in self._transfers:
+            try:
+                transfer.cancel()
+            except Exception:
+                pass # It was not submitted.
+
+        # Cancelled transfers are only done once their callbacks ran.
+        deadline = monotonic() + 1
+        while self._submitted and monotonic() < deadline:
+            self._context.handleEventsTimeout(0.1)
+        self._transfers = []
+
+        if self._handle is not None:
+            try:
+                self._handle.releaseInterface(0)
+            except Exception:
+                pass # The scale is gone.
+            self._handle.close()
+            self._handle = None
+
+        if self._context is not None:
+            self._context.close()
+            self._context = None
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, type, value, traceback):
+        self.close()
+
+
+    ### Private methods ###
+
+    def _open_device(self):
+        bus, address = self._device.bus, self._device.address
+        for device in self._context.getDeviceList(skip_on_error=True):
+            if device.getBusNumber() == bus and \
+                    device.getDeviceAddress() == address:
+                return device.open()
+        raise usb.core.USBError("No such device", errno=ENODEV)
+
+    def _completed(self, transfer):
+        # Called by libusb, from `handleEventsTimeout`, as each transfer
+        # completes; transfers on one endpoint complete in the order they
+        # were submitted.
+        libusb = self._libusb
+        status = transfer.getStatus()
+
+        if status == libusb.TRANSFER_COMPLETED:
+            length = transfer.getActualLength()
+            self._reports.append(array('B', transfer.getBuffer()[:length]))
+            self._received += 1
+
+        failed = status not in (libusb.TRANSFER_COMPLETED,
+                libusb.TRANSFER_TIMED_OUT, libusb.TRANSFER_CANCELLED)
+
+        if self._closing or failed or status == libusb.TRANSFER_CANCELLED:
+            self._submitted -= 1
+            if failed and self._error is None:
+                self._error = usb.core.USBError(
+                    "Transfer failed with status %s" % status,
+                    errno=ENODEV if status == libusb.TRANSFER_NO_DEVICE
+                        else None
+                )
+            return
+
+        # Recycle the transfer, and its buffer, straight away.
+        try:
+            transfer.submit()
+        except Exception as e:
+            self._submitted -= 1
+            if self._error is None:
+                self._error = e
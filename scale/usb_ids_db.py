@@ -0,0 +1,419 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# vim: set fileencoding=utf-8 :
+"""
+Compiles the `usb_ids.USB_IDS` dictionary into a compact binary file and
+reads it back through `mmap`, so looking up a name neither imports the
+22k-line dictionary literal nor keeps it in memory.
+
+The file is laid out as follows, all integers little-endian:
+
+    header          "USBIDS2\\0", vendor count V, product count P, named
+                    vendor count N and scale count S (uint32)
+    vendor ids      V x uint16, sorted, padded to a multiple of 4 bytes
+    first products  (V + 1) x uint32; vendor i owns products
+                    [first[i], first[i + 1])
+    product ids     P x uint16, sorted per vendor, padded to 4 bytes
+    name offsets    (V + P + 1) x uint32 into the name blob; name i spans
+                    [offset[i], offset[i + 1]). Vendor names come first.
+    vendors by name N x uint32 indices of the vendors with a name, sorted
+                    by lowercased name
+    products by name
+                    P x uint32 indices of the products, sorted by
+                    lowercased name
+    scales          S x uint32 indices of the products with " Scale" in
+                    their name, sorted
+    name blob       UTF-8 names, back to back
+
+The last three sections are the reverse index `ScaleManager` resolves
+names with; see `UsbIdDatabase.name_index`.
+
+Run this module to (re)build `usb_ids.bin` next to it:
+
+    python usb_ids_db.py [output path]
+
+"""
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from name_index import NameIndex
+
+MAGIC = b"USBIDS2\0"
+HEADER = struct.Struct("<8sIIII")
+ID = struct.Struct("<H")
+INDEX = struct.Struct("<I")
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "usb_ids.bin")
+SOURCE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "usb_ids.py")
+
+def _padded(size):
+    return size + (-size % 4)
+
+def _encode(name):
+    # A handful of entries in USB_IDS were converted to integer literals
+    # (e.g. Nokia's "5510" became 0x5510); restore their original text.
+    if isinstance(name, int):
+        name = "%x" % name
+    if not isinstance(name, bytes):
+        name = name.encode("utf-8")
+    return name
+
+def _decode(name):
+    # Names are native strings, just like in USB_IDS.
+    if str is bytes:
+        return name
+    return name.decode("utf-8")
+
+def compile_lookup(lookup, path=DEFAULT_PATH):
+    """
+    Writes `lookup`, a dictionary in the format `ScaleManager` expects,
+    to `path` in the binary format described above. The file is replaced
+    atomically, so readers never see a partial file.
+
+    """
+    vendor_ids = sorted(lookup)
+    product_ids = []
+    first_products = []
+    names = []
+    named_vendors = []
+
+    for vendor_id in vendor_ids:
+        products = lookup[vendor_id]
+        if "name" in products:
+            named_vendors.append(len(names))
+        names.append(_encode(products.get("name", "")))
+        first_products.append(len(product_ids))
+        for product_id in sorted(key for key in products if key != "name"):
+            product_ids.append(product_id)
+
+    first_products.append(len(product_ids))
+
+    for vendor_id in vendor_ids:
+        products = lookup[vendor_id]
+        for product_id in sorted(key for key in products if key != "name"):
+            names.append(_encode(products[product_id]))
+
+    offsets = [0]
+    for name in names:
+        offsets.append(offsets[-1] + len(name))
+
+    # Names compare as lowercased UTF-8 bytes, the same on Python 2 and 3.
+    vendor_count = len(vendor_ids)
+    products = range(len(product_ids))
+    named_vendors.sort(key=lambda index: (names[index].lower(), index))
+    models = sorted(products,
+            key=lambda index: (names[vendor_count + index].lower(), index))
+    scales = [index for index in products
+            if b" Scale" in names[vendor_count + index]]
+
+    def ids(values):
+        data = struct.pack("<%dH" % len(values), *values)
+        return data + b"\0" * (-len(data) % 4)
+
+    def indices(values):
+        return struct.pack("<%dI" % len(values), *values)
+
+    directory = os.path.dirname(os.path.abspath(path))
+    handle, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+
+    try:
+        with os.fdopen(handle, "wb") as out:
+            out.write(HEADER.pack(MAGIC, vendor_count, len(product_ids),
+                    len(named_vendors), len(scales)))
+            out.write(ids(vendor_ids))
+            out.write(indices(first_products))
+            out.write(ids(product_ids))
+            out.write(indices(offsets))
+            out.write(indices(named_vendors))
+            out.write(indices(models))
+            out.write(indices(scales))
+            out.write(b"".join(names))
+        os.chmod(temp_path, 0o644)
+        os.rename(temp_path, path)
+    except Exception:
+        os.remove(temp_path)
+        raise
+
+    return path
+
+# Tables returned by `load`, keyed by path.
+_loaded = {}
+
+def load(path=DEFAULT_PATH, source_path=SOURCE_PATH):
+    """
+    Returns a UsbIdDatabase for `path`, building it from
+    `usb_ids.USB_IDS` first if it is missing, older than `source_path` or
+    of another format. Falls back to returning `usb_ids.USB_IDS` itself if the file cannot
+    be written.
+
+    The table is only opened once per path; later calls return it again.
+
+    """
+    if path in _loaded:
+        return _loaded[path]
+
+    try:
+        stale = os.path.getmtime(path) < os.path.getmtime(source_path)
+    except OSError:
+        stale = not os.path.exists(path)
+
+    if not stale:
+        try:
+            _loaded[path] = UsbIdDatabase(path)
+            return _loaded[path]
+        except ValueError:
+            pass # Built by an older version.
+
+    import usb_ids
+    try:
+        compile_lookup(usb_ids.USB_IDS, path)
+    except (IOError, OSError):
+        _loaded[path] = usb_ids.USB_IDS
+        return usb_ids.USB_IDS
+
+    _loaded[path] = UsbIdDatabase(path)
+    return _loaded[path]
+
+class VendorView(object):
+    """One vendor's entry in a UsbIdDatabase, read like a USB_IDS value."""
+
+    __slots__ = ("_db", "_index")
+
+    def __init__(self, db, index):
+        self._db = db
+        self._index = index
+
+    def __contains__(self, key):
+        return key == "name" or self._db._product_index(self._index, key) >= 0
+
+    def __getitem__(self, key):
+        if key == "name":
+            return self._db._name(self._index)
+        index = self._db._product_index(self._index, key)
+        if index < 0:
+            raise KeyError(key)
+        return self._db._name(self._db.vendor_count + index)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __iter__(self):
+        yield "name"
+        db = self._db
+        first, last = db._products(self._index)
+        for index in range(first, last):
+            yield db._product_id(index)
+
+    def __len__(self):
+        first, last = self._db._products(self._index)
+        return last - first + 1
+
+    def items(self):
+        return [(key, self[key]) for key in self]
+
+class UsbIdDatabase(object):
+    """Memory-mapped, read-only USB ID table built by `compile_lookup`."""
+
+    def __init__(self, path=DEFAULT_PATH):
+        """
+        Opens the table at `path`. It supports the `lookup[vid][pid]` and
+        `lookup[vid]["name"]` lookups ScaleManager makes, along with `in`,
+        `get` and iteration, finding ids by binary search over the mapped
+        file.
+
+        """
+        with open(path, "rb") as handle:
+            self._map = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if self._map[:len(MAGIC)] != MAGIC:
+            self._map.close()
+            raise ValueError("%s is not a compiled USB ID table" % path)
+        magic, vendors, products, named, scales = \
+                HEADER.unpack_from(self._map, 0)
+
+        self.vendor_count = vendors
+        self.product_count = products
+        self._named_count = named
+        self._scale_count = scales
+        self._vendor_ids = HEADER.size
+        self._first_products = self._vendor_ids + _padded(2 * vendors)
+        self._product_ids = self._first_products + 4 * (vendors + 1)
+        self._offsets = self._product_ids + _padded(2 * products)
+        self._vendors_by_name = self._offsets + 4 * (vendors + products + 1)
+        self._products_by_name = self._vendors_by_name + 4 * named
+        self._scales = self._products_by_name + 4 * products
+        self._names = self._scales + 4 * scales
+        self._name_index = None
+
+
+    ### Public methods ###
+
+    def __contains__(self, vendor_id):
+        return self._vendor_index(vendor_id) >= 0
+
+    def __getitem__(self, vendor_id):
+        index = self._vendor_index(vendor_id)
+        if index < 0:
+            raise KeyError(vendor_id)
+        return VendorView(self, index)
+
+    def get(self, vendor_id, default=None):
+        try:
+            return self[vendor_id]
+        except KeyError:
+            return default
+
+    def __iter__(self):
+        for index in range(self.vendor_count):
+            yield ID.unpack_from(self._map, self._vendor_ids + 2 * index)[0]
+
+    def __len__(self):
+        return self.vendor_count
+
+    def items(self):
+        return [(vendor_id, self[vendor_id]) for vendor_id in self]
+
+    def name_index(self):
+        """
+        Returns the NameIndex of the table. It searches the sections the
+        table was compiled with in place, so it costs next to nothing to
+        get and keeps nothing but the set of scales in memory.
+
+        """
+        if self._name_index is None:
+            self._name_index = CompiledNameIndex(self)
+        return self._name_index
+
+    def close(self):
+        self._map.close()
+
+
+    ### Private methods ###
+
+    def _search(self, key, base, first, last):
+        """Binary search for uint16 `key` in entries [first, last) at `base`."""
+        if not isinstance(key, int) or not 0 <= key <= 0xFFFF:
+            return -1
+
+        data = self._map
+        while first < last:
+            middle = (first + last) // 2
+            value = ID.unpack_from(data, base + 2 * middle)[0]
+            if value < key:
+                first = middle + 1
+            elif value > key:
+                last = middle
+            else:
+                return middle
+        return -1
+
+    def _vendor_index(self, vendor_id):
+        return self._search(vendor_id, self._vendor_ids, 0, self.vendor_count)
+
+    def _products(self, vendor_index):
+        base = self._first_products + 4 * vendor_index
+        return struct.unpack_from("<II", self._map, base)
+
+    def _product_index(self, vendor_index, product_id):
+        first, last = self._products(vendor_index)
+        return self._search(product_id, self._product_ids, first, last)
+
+    def _product_id(self, index):
+        return ID.unpack_from(self._map, self._product_ids + 2 * index)[0]
+
+    def _name(self, index):
+        return _decode(self._name_bytes(index))
+
+    def _name_bytes(self, index):
+        start, end = struct.unpack_from("<II", self._map, self._offsets + 4 * index)
+        return self._map[self._names + start:self._names + end]
+
+    def _vendor_of(self, product_index):
+        """Returns the index of the vendor owning product `product_index`."""
+        # The last vendor whose first product is not after it; vendors
+        # without products share their first product with the next one.
+        first, last = 0, self.vendor_count
+        while last - first > 1:
+            middle = (first + last) // 2
+            if INDEX.unpack_from(self._map,
+                    self._first_products + 4 * middle)[0] <= product_index:
+                first = middle
+            else:
+                last = middle
+        return first
+
+    def _pair(self, product_index):
+        """Returns the (vendor id, product id) pair of a product."""
+        vendor_index = self._vendor_of(product_index)
+        return (
+            ID.unpack_from(self._map, self._vendor_ids + 2 * vendor_index)[0],
+            self._product_id(product_index),
+        )
+
+    def _find_names(self, base, count, names, name):
+        """
+        Like `name_index._search`: returns the entries [0, count) at `base`,
+        indices of names from `names` on, whose name equals `name` ignoring
+        case, or else those whose name starts with it.
+
+        """
+        key = _encode(name).lower()
+        data = self._map
+        first, last = 0, count
+        while first < last:
+            middle = (first + last) // 2
+            index = INDEX.unpack_from(data, base + 4 * middle)[0]
+            if self._name_bytes(names + index).lower() < key:
+                first = middle + 1
+            else:
+                last = middle
+
+        exact = []
+        prefixed = []
+        while first < count:
+            index = INDEX.unpack_from(data, base + 4 * first)[0]
+            lowered = self._name_bytes(names + index).lower()
+            if lowered == key:
+                exact.append(index)
+            elif lowered.startswith(key):
+                prefixed.append(index)
+            else:
+                break
+            first += 1
+
+        return exact or prefixed
+
+class CompiledNameIndex(NameIndex):
+    """A NameIndex searching a UsbIdDatabase's compiled reverse index."""
+
+    def __init__(self, db):
+        self._db = db
+        self._scales = frozenset(
+            db._pair(INDEX.unpack_from(db._map, db._scales + 4 * i)[0])
+            for i in range(db._scale_count)
+        )
+
+    def vendors(self, manufacturer):
+        db = self._db
+        return set(
+            ID.unpack_from(db._map, db._vendor_ids + 2 * index)[0]
+            for index in db._find_names(db._vendors_by_name, db._named_count,
+                0, manufacturer)
+        )
+
+    def products(self, model):
+        db = self._db
+        return set(
+            db._pair(index)
+            for index in db._find_names(db._products_by_name,
+                db.product_count, db.vendor_count, model)
+        )
+
+if __name__ == "__main__":
+    import usb_ids
+    print(compile_lookup(usb_ids.USB_IDS, *sys.argv[1:2]))